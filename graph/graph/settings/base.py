@@ -45,6 +45,48 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Resolved auth tokens are cached, see `users.auth.resolve_auth_token`, only with a cache shared by all workers, e.g.
+# redis://host:6379/2, so that revoking a token takes effect in every one of them at once.
+AUTH_TOKEN_CACHE_LOCATION = os.environ.get('AUTH_TOKEN_CACHE_LOCATION')
+if AUTH_TOKEN_CACHE_LOCATION:
+    CACHES['auth_tokens'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': AUTH_TOKEN_CACHE_LOCATION,
+        'TIMEOUT': 60 * 60,
+    }
+
+# Serialized graph payloads, shared by all workers on the box and keyed by the graph data version and the day,
+# see `people.utils.graph_snapshot`
+GRAPH_SNAPSHOT_DIR = os.environ.get('GRAPH_SNAPSHOT_CACHE_DIR', '/tmp/graph-snapshots')
+GRAPH_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+GRAPH_SNAPSHOT_MAX_ENTRIES = 64
+
+# Decoded sessions are cached, see `users.sessions`, only with a cache shared by all workers, e.g. redis://host:6379/1.
+# A per-process cache would keep serving sessions deleted or changed by other workers until they expire.
+SESSION_CACHE_LOCATION = os.environ.get('SESSION_CACHE_LOCATION')
+if SESSION_CACHE_LOCATION:
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': SESSION_CACHE_LOCATION,
+    }
+    SESSION_ENGINE = 'users.sessions'
+    SESSION_CACHE_ALIAS = 'sessions'
+# Per-process LRU of recently used sessions, see `users.sessions`
+SESSION_LRU_SIZE = 1024
+SESSION_LRU_TIMEOUT = 5
+# Saves that only push the session expiry further are written to the database once it lags behind by this many seconds
+SESSION_EXPIRY_WRITE_BEHIND = 5 * 60
+
+# Apology mail reads are recorded in bulk, see `people.utils.read_receipts`
+READ_RECEIPT_BUFFER_SIZE = 500
+READ_RECEIPT_FLUSH_INTERVAL = 5
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
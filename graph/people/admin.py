@@ -6,7 +6,6 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import Q, Exists, OuterRef
 from django.http import HttpResponseRedirect
 from django.template.response import TemplateResponse
 from django.urls import reverse, re_path
@@ -14,7 +13,8 @@ from django.utils.translation import gettext_lazy as _
 
 from people.models import Person, Group, Relationship, RelationshipStatus, PersonNote, RelationshipStatusNote, \
     GroupMembership, ManagementAuthority, ContactEmail
-from people.utils.mail import send_mass_html_mail
+from people.utils.adjacency import get_adjacency
+from users.models import Outbox
 
 
 class BaseNoteInlineForm(forms.ModelForm):
@@ -76,22 +76,38 @@ class PersonAgeFilter(admin.SimpleListFilter):
         return queryset
 
 
-class PersonCurrentStatusFilter(admin.SimpleListFilter):
+class PersonStatusFlagsFilter(admin.SimpleListFilter):
+    """
+    Filters by the `flag_lookup` of the denormalized `PersonStatusFlags`, which are kept up to date outside of requests.
+    """
+    flag_lookup = None
+
+    def flag_value(self, value):
+        return [int(value)]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            flag = self.flag_value(self.value())
+        except (KeyError, ValueError):
+            return queryset.none()
+        return queryset.filter(**{f'status_flags__{self.flag_lookup}': flag})
+
+
+class PersonCurrentStatusFilter(PersonStatusFlagsFilter):
     title = _('Has current relationship with status')
     parameter_name = 'current_status'
+    flag_lookup = 'current_statuses__contains'
 
     def lookups(self, request, model_admin):
         return RelationshipStatus.StatusChoices.choices
 
-    def queryset(self, request, queryset):
-        if self.value():
-            return queryset.has_relationship_status([self.value()])
-        return queryset
-
 
-class PersonDatingStatusFilter(admin.SimpleListFilter):
+class PersonDatingStatusFilter(PersonStatusFlagsFilter):
     title = _('Current dating status')
     parameter_name = 'dating_status'
+    flag_lookup = 'romantic'
 
     def lookups(self, request, model_admin):
         return (
@@ -99,12 +115,17 @@ class PersonDatingStatusFilter(admin.SimpleListFilter):
             ('romantic', 'In a romantic relationship')
         )
 
-    def queryset(self, request, queryset):
-        if self.value() == 'single':
-            return queryset.single()
-        if self.value() == 'romantic':
-            return queryset.in_romantic_relationship()
-        return queryset
+    def flag_value(self, value):
+        return {'single': False, 'romantic': True}[value]
+
+
+class PersonGroupFilter(PersonStatusFlagsFilter):
+    title = _('group')
+    parameter_name = 'group'
+    flag_lookup = 'group_ids__contains'
+
+    def lookups(self, request, model_admin):
+        return Group.objects.values_list('pk', 'name')
 
 
 site.login_template = 'people/admin/login.html'
@@ -132,7 +153,7 @@ class PersonAdmin(UserAdmin):
         'id', 'email', 'first_name', 'last_name', 'apology_status', 'nickname', 'birth_date', 'date_joined', 'last_login', 'visible')
     search_fields = ('first_name', 'last_name', 'nickname', 'email')
     list_filter = (
-        'apology_status', PersonAgeFilter, PersonCurrentStatusFilter, PersonDatingStatusFilter, 'gender', 'visible', 'memberships__group', ('email', admin.EmptyFieldListFilter))
+        'apology_status', PersonAgeFilter, PersonCurrentStatusFilter, PersonDatingStatusFilter, 'gender', 'visible', PersonGroupFilter, ('email', admin.EmptyFieldListFilter))
     inlines = (GroupMembershipInline,)
     exclude = ('notes',)
     change_list_template = 'people/admin/person_changelist.html'
@@ -142,16 +163,12 @@ class PersonAdmin(UserAdmin):
     @admin.action(description='Issue apology email')
     @transaction.atomic
     def issue_apology(self, request, queryset):
-        mails = []
-        for person in queryset:
-            msg = person.construct_apology_mail()
-            if msg:
-                mails.append(msg)
+        mails = queryset.construct_apology_mails()
 
-        sent = send_mass_html_mail(mails)
+        queued = Outbox.objects.enqueue_mass_html(mails)
 
         queryset.update(apology_status=Person.ApologyStatus.SENT)
-        messages.success(request, f'Successfully sent {sent} mails')
+        messages.success(request, f'Successfully queued {len(queued)} mails')
 
     def get_queryset(self, request):
         qs = get_user_model().qs
@@ -199,29 +216,31 @@ class RelationshipAdmin(admin.ModelAdmin):
             if form.is_valid():
                 parent_1, parent_2 = form.cleaned_data['parent_1'], form.cleaned_data['parent_2']
                 child = form.cleaned_data['child']
-                for parent in (parent_1, parent_2):
-                    if not parent:
-                        continue
-
-                    parent_child_relationship = Relationship.objects.get_or_create_for_people(parent, child)
-
+                parents = [parent for parent in (parent_1, parent_2) if parent]
+                # Other children of the parents, read before the child becomes one of them
+                adjacency = get_adjacency()
+                sibling_ids = {
+                    sibling_id
+                    for parent in parents
+                    for sibling_id in adjacency.neighbor_ids(parent.pk, RelationshipStatus.StatusChoices.PARENT_CHILD)
+                }
+                sibling_ids.discard(child.pk)
+
+                parent_child_relationships = Relationship.objects.bulk_get_or_create_for_people(
+                    (parent, child) for parent in parents
+                )
+                for parent_child_relationship in parent_child_relationships:
                     RelationshipStatus.objects.create(
                         relationship=parent_child_relationship,
                         status=RelationshipStatus.StatusChoices.PARENT_CHILD,
                         date_start=child.birth_date
                     )
 
-                siblings = Person.qs.filter(
-                    Exists(
-                        Relationship.objects.filter(
-                            (Q(first_person=OuterRef('pk')) & (Q(second_person=parent_1) | Q(second_person=parent_2))) |
-                            (Q(second_person=OuterRef('pk')) & (Q(first_person=parent_1) | Q(first_person=parent_2))),
-                            statuses__status=RelationshipStatus.StatusChoices.PARENT_CHILD
-                        )
-                    )
+                siblings = list(Person.qs.filter(pk__in=sibling_ids))
+                sibling_relationships = Relationship.objects.bulk_get_or_create_for_people(
+                    (sibling, child) for sibling in siblings
                 )
-                for sibling in siblings:
-                    sibling_relationship = Relationship.objects.get_or_create_for_people(sibling, child)
+                for sibling, sibling_relationship in zip(siblings, sibling_relationships):
                     RelationshipStatus.objects.create(
                         relationship=sibling_relationship,
                         status=RelationshipStatus.StatusChoices.SIBLING,
@@ -335,8 +354,7 @@ class AddChildForm(forms.Form):
                 continue
 
             if RelationshipStatus.objects.filter(
-                    Q(relationship__first_person=parent, relationship__second_person=child) |
-                    Q(relationship__second_person=parent, relationship__first_person=child),
+                    relationship__in=Relationship.objects.between(parent, child),
                     status=RelationshipStatus.StatusChoices.PARENT_CHILD
             ).exists():
                 self.add_error('child', f'{parent_1.name} and {child.name} are already a parent and child')
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class PeopleConfig(AppConfig):
+    name = 'people'
+
+    def ready(self):
+        from people import signals  # noqa: F401
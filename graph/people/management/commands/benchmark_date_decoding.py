@@ -0,0 +1,58 @@
+import timeit
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from people.models import GroupMembership, Person, RelationshipStatus
+from people.utils.variable_res_date import decode, parse
+
+DATE_COLUMNS = (
+    (Person, 'birth_date'),
+    (Person, 'death_date'),
+    (GroupMembership, 'date_started'),
+    (GroupMembership, 'date_ended'),
+    (RelationshipStatus, 'date_start'),
+    (RelationshipStatus, 'date_end'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Compares the regular expression parser and the cached fixed-offset decoder on the stored date columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs, the best one is reported')
+
+    def handle(self, *args, **options):
+        values = []
+        for model, column in DATE_COLUMNS:
+            values.extend(self.raw_strings(model, column))
+        if not values:
+            raise CommandError('There are no dates to decode')
+
+        def run_parse():
+            for value in values:
+                parse(value)
+
+        def run_decode_cold():
+            decode.cache_clear()
+            for value in values:
+                decode(value)
+
+        def run_decode_warm():
+            for value in values:
+                decode(value)
+
+        self.stdout.write(f'{len(values)} dates, {len(set(values))} distinct')
+        for name, run in (('regex parse', run_parse), ('decode, cold cache', run_decode_cold),
+                          ('decode, warm cache', run_decode_warm)):
+            best = min(timeit.repeat(run, number=1, repeat=options['repeat']))
+            self.stdout.write(f'{name:>20}: {best * 1000:8.2f} ms, {best / len(values) * 1e9:8.0f} ns per date')
+
+    @staticmethod
+    def raw_strings(model, column):
+        # The strings as they come from the database, before `from_db_value`
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {column} FROM {model._meta.db_table} WHERE {column} IS NOT NULL ORDER BY {model._meta.pk.column}'
+            )
+            return [value for value, in cursor.fetchall()]
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from people.models import GraphChange, GraphDataVersion
+
+
+class Command(BaseCommand):
+    help = 'Removes old entries of the graph change log, clients behind the compacted version get a full graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=30, help='Keep changes younger than this many days')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        old_changes = GraphChange.objects.filter(date_created__lt=timezone.now() - timedelta(days=options['keep_days']))
+        compacted_version = old_changes.aggregate(version=Max('version'))['version']
+        if compacted_version is None:
+            self.stdout.write('Nothing to compact')
+            return
+
+        GraphDataVersion.objects.filter(
+            pk=GraphDataVersion.SINGLETON_PK, compacted_version__lt=compacted_version
+        ).update(compacted_version=compacted_version)
+        deleted, _ = GraphChange.objects.filter(version__lte=compacted_version).delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} changes up to version {compacted_version}'))
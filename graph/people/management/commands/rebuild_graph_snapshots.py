@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand, CommandError
+
+from people.models import GraphDataVersion
+from people.utils import graph_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Builds the serialized graph snapshots for the current data version and stores them in the snapshot cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshots', nargs='*', help='Snapshots to rebuild, all of them by default')
+        parser.add_argument('--invalidate', action='store_true',
+                            help='Bump the graph data version first, discarding every cached snapshot')
+
+    def handle(self, *args, **options):
+        unknown = set(options['snapshots']) - (
+            set(graph_snapshot.SNAPSHOT_BUILDERS) - graph_snapshot.PARAMETRIZED_SNAPSHOTS
+        )
+        if unknown:
+            raise CommandError(f'Unknown snapshots: {", ".join(sorted(unknown))}')
+
+        if options['invalidate']:
+            GraphDataVersion.objects.bump()
+
+        version = graph_snapshot.rebuild(options['snapshots'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt graph snapshots for data version {version}'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management import BaseCommand
+
+from people.models import GraphEdgeStatus
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the materialized view of the visible graph edges and their statuses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocking', action='store_true',
+                            help='Lock the view for reads during the refresh, needed when it has never been populated')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running, refreshing the view whenever the graph data version has changed')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between checks of the graph data version when watching')
+
+    def handle(self, *args, **options):
+        if not options['watch']:
+            GraphEdgeStatus.objects.refresh(concurrently=not options['blocking'])
+            self.report()
+            return
+
+        # However many changes are made in the meantime, the view is refreshed at most once per interval
+        while True:
+            if GraphEdgeStatus.objects.refresh_if_stale(concurrently=not options['blocking']):
+                self.report()
+            time.sleep(options['interval'])
+
+    def report(self):
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed graph edges at data version {GraphEdgeStatus.objects.view_version()}'
+        ))
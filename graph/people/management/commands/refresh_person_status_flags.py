@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+
+from people.models import PersonStatusFlags
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the current relationship statuses and memberships of people the admin filters by, run daily'
+
+    def handle(self, *args, **options):
+        PersonStatusFlags.objects.refresh()
+        version, date = PersonStatusFlags.objects.refreshed_at() or (None, None)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed person status flags at data version {version} for {date}'))
@@ -0,0 +1,49 @@
+from django.core.mail import get_connection
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from people.models import Person
+from people.utils.apology_mail import APOLOGY_CHUNK_SIZE, iter_apology_mail_chunks
+from people.utils.mail import send_mass_html_mail
+from users.models import Outbox
+
+
+class Command(BaseCommand):
+    help = 'Renders the apology mails of the people who have not been sent one yet in parallel and queues them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=APOLOGY_CHUNK_SIZE,
+                            help='Number of people fetched and rendered at once')
+        parser.add_argument('--processes', type=int, help='Number of rendering processes, one per CPU by default')
+        parser.add_argument('--all', action='store_true', help='Include the people that have been sent one already')
+        parser.add_argument('--send', action='store_true',
+                            help='Send the mails right away instead of queueing them in the outbox')
+
+    def handle(self, *args, **options):
+        people = Person.qs.order_by('pk')
+        if not options['all']:
+            people = people.filter(apology_status=Person.ApologyStatus.UNSENT)
+        total = people.count()
+
+        # Every chunk is marked as soon as its mails are out, a failed run is resumed where it stopped. People that
+        # cannot be reached are not marked, so that they get their mail once they have a contact.
+        connection = get_connection() if options['send'] else None
+        done = 0
+        try:
+            if connection:
+                # Kept open for all the chunks
+                connection.open()
+            for pks, mails in iter_apology_mail_chunks(people, options['chunk_size'], options['processes']):
+                if connection:
+                    done += send_mass_html_mail(mails, batch_size=options['chunk_size'], connection=connection)
+                    Person.qs.filter(pk__in=pks).update(apology_status=Person.ApologyStatus.SENT)
+                else:
+                    with transaction.atomic():
+                        done += len(Outbox.objects.enqueue_mass_html(mails))
+                        Person.qs.filter(pk__in=pks).update(apology_status=Person.ApologyStatus.SENT)
+                self.stdout.write(f'{done} mails for {total} people')
+        finally:
+            if connection:
+                connection.close()
+
+        self.stdout.write(self.style.SUCCESS(f'{"Sent" if options["send"] else "Queued"} {done} mails'))
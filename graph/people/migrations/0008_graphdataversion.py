@@ -0,0 +1,26 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+def create_singleton(apps, schema_editor):
+    GraphDataVersion = apps.get_model('people', 'GraphDataVersion')
+    GraphDataVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0007_person_apology_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphDataVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0, verbose_name='version')),
+            ],
+        ),
+        migrations.RunPython(create_singleton, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0008_graphdataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='graphdataversion',
+            name='date_updated',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='date updated'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0009_graphdataversion_date_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(db_index=True, verbose_name='version')),
+                ('action', models.IntegerField(choices=[(1, 'Created'), (2, 'Updated'), (3, 'Deleted')], verbose_name='action')),
+                ('node', models.IntegerField(blank=True, null=True, verbose_name='node')),
+                ('edge', models.IntegerField(blank=True, null=True, verbose_name='edge')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='date created')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='graphdataversion',
+            name='compacted_version',
+            field=models.BigIntegerField(default=0, verbose_name='compacted version'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+from django.db import migrations
+
+# Generated companion columns of the variable resolution date columns, with indexes over the earliest and latest days.
+# The SQL is spelled out so that the migration does not change with the field code.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0010_graphchange'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                """
+                ALTER TABLE people_person
+                    ADD COLUMN birth_date_earliest date GENERATED ALWAYS AS (make_date(nullif(substr(birth_date, 1, 4)::integer, 0), greatest(substr(birth_date, 6, 2)::integer, 1), greatest(substr(birth_date, 9, 2)::integer, 1))) STORED,
+                    ADD COLUMN birth_date_latest date GENERATED ALWAYS AS (CASE WHEN substr(birth_date, 6, 2) = '00' THEN make_date(nullif(substr(birth_date, 1, 4)::integer, 0), 12, 31) WHEN substr(birth_date, 9, 2) = '00' THEN (make_date(nullif(substr(birth_date, 1, 4)::integer, 0), substr(birth_date, 6, 2)::integer, 1) + interval '1 month')::date - 1 ELSE make_date(nullif(substr(birth_date, 1, 4)::integer, 0), substr(birth_date, 6, 2)::integer, substr(birth_date, 9, 2)::integer) END) STORED,
+                    ADD COLUMN birth_date_precision smallint GENERATED ALWAYS AS (CASE WHEN birth_date IS NULL THEN 0 WHEN substr(birth_date, 6, 2) = '00' THEN 1 WHEN substr(birth_date, 9, 2) = '00' THEN 2 ELSE 3 END) STORED
+                """,
+                'CREATE INDEX people_person_birth_date_earliest_idx ON people_person (birth_date_earliest)',
+                'CREATE INDEX people_person_birth_date_latest_idx ON people_person (birth_date_latest)',
+            ],
+            'ALTER TABLE people_person DROP COLUMN birth_date_earliest, DROP COLUMN birth_date_latest, DROP COLUMN birth_date_precision',
+        ),
+        migrations.RunSQL(
+            [
+                """
+                ALTER TABLE people_person
+                    ADD COLUMN death_date_earliest date GENERATED ALWAYS AS (make_date(nullif(substr(death_date, 1, 4)::integer, 0), greatest(substr(death_date, 6, 2)::integer, 1), greatest(substr(death_date, 9, 2)::integer, 1))) STORED,
+                    ADD COLUMN death_date_latest date GENERATED ALWAYS AS (CASE WHEN substr(death_date, 6, 2) = '00' THEN make_date(nullif(substr(death_date, 1, 4)::integer, 0), 12, 31) WHEN substr(death_date, 9, 2) = '00' THEN (make_date(nullif(substr(death_date, 1, 4)::integer, 0), substr(death_date, 6, 2)::integer, 1) + interval '1 month')::date - 1 ELSE make_date(nullif(substr(death_date, 1, 4)::integer, 0), substr(death_date, 6, 2)::integer, substr(death_date, 9, 2)::integer) END) STORED,
+                    ADD COLUMN death_date_precision smallint GENERATED ALWAYS AS (CASE WHEN death_date IS NULL THEN 0 WHEN substr(death_date, 6, 2) = '00' THEN 1 WHEN substr(death_date, 9, 2) = '00' THEN 2 ELSE 3 END) STORED
+                """,
+                'CREATE INDEX people_person_death_date_earliest_idx ON people_person (death_date_earliest)',
+                'CREATE INDEX people_person_death_date_latest_idx ON people_person (death_date_latest)',
+            ],
+            'ALTER TABLE people_person DROP COLUMN death_date_earliest, DROP COLUMN death_date_latest, DROP COLUMN death_date_precision',
+        ),
+        migrations.RunSQL(
+            [
+                """
+                ALTER TABLE people_relationshipstatus
+                    ADD COLUMN date_start_earliest date GENERATED ALWAYS AS (make_date(nullif(substr(date_start, 1, 4)::integer, 0), greatest(substr(date_start, 6, 2)::integer, 1), greatest(substr(date_start, 9, 2)::integer, 1))) STORED,
+                    ADD COLUMN date_start_latest date GENERATED ALWAYS AS (CASE WHEN substr(date_start, 6, 2) = '00' THEN make_date(nullif(substr(date_start, 1, 4)::integer, 0), 12, 31) WHEN substr(date_start, 9, 2) = '00' THEN (make_date(nullif(substr(date_start, 1, 4)::integer, 0), substr(date_start, 6, 2)::integer, 1) + interval '1 month')::date - 1 ELSE make_date(nullif(substr(date_start, 1, 4)::integer, 0), substr(date_start, 6, 2)::integer, substr(date_start, 9, 2)::integer) END) STORED,
+                    ADD COLUMN date_start_precision smallint GENERATED ALWAYS AS (CASE WHEN date_start IS NULL THEN 0 WHEN substr(date_start, 6, 2) = '00' THEN 1 WHEN substr(date_start, 9, 2) = '00' THEN 2 ELSE 3 END) STORED
+                """,
+                'CREATE INDEX people_relationshipstatus_date_start_earliest_idx ON people_relationshipstatus (date_start_earliest)',
+                'CREATE INDEX people_relationshipstatus_date_start_latest_idx ON people_relationshipstatus (date_start_latest)',
+            ],
+            'ALTER TABLE people_relationshipstatus DROP COLUMN date_start_earliest, DROP COLUMN date_start_latest, DROP COLUMN date_start_precision',
+        ),
+        migrations.RunSQL(
+            [
+                """
+                ALTER TABLE people_relationshipstatus
+                    ADD COLUMN date_end_earliest date GENERATED ALWAYS AS (make_date(nullif(substr(date_end, 1, 4)::integer, 0), greatest(substr(date_end, 6, 2)::integer, 1), greatest(substr(date_end, 9, 2)::integer, 1))) STORED,
+                    ADD COLUMN date_end_latest date GENERATED ALWAYS AS (CASE WHEN substr(date_end, 6, 2) = '00' THEN make_date(nullif(substr(date_end, 1, 4)::integer, 0), 12, 31) WHEN substr(date_end, 9, 2) = '00' THEN (make_date(nullif(substr(date_end, 1, 4)::integer, 0), substr(date_end, 6, 2)::integer, 1) + interval '1 month')::date - 1 ELSE make_date(nullif(substr(date_end, 1, 4)::integer, 0), substr(date_end, 6, 2)::integer, substr(date_end, 9, 2)::integer) END) STORED,
+                    ADD COLUMN date_end_precision smallint GENERATED ALWAYS AS (CASE WHEN date_end IS NULL THEN 0 WHEN substr(date_end, 6, 2) = '00' THEN 1 WHEN substr(date_end, 9, 2) = '00' THEN 2 ELSE 3 END) STORED
+                """,
+                'CREATE INDEX people_relationshipstatus_date_end_earliest_idx ON people_relationshipstatus (date_end_earliest)',
+                'CREATE INDEX people_relationshipstatus_date_end_latest_idx ON people_relationshipstatus (date_end_latest)',
+            ],
+            'ALTER TABLE people_relationshipstatus DROP COLUMN date_end_earliest, DROP COLUMN date_end_latest, DROP COLUMN date_end_precision',
+        ),
+        migrations.RunSQL(
+            [
+                """
+                ALTER TABLE people_groupmembership
+                    ADD COLUMN date_started_earliest date GENERATED ALWAYS AS (make_date(nullif(substr(date_started, 1, 4)::integer, 0), greatest(substr(date_started, 6, 2)::integer, 1), greatest(substr(date_started, 9, 2)::integer, 1))) STORED,
+                    ADD COLUMN date_started_latest date GENERATED ALWAYS AS (CASE WHEN substr(date_started, 6, 2) = '00' THEN make_date(nullif(substr(date_started, 1, 4)::integer, 0), 12, 31) WHEN substr(date_started, 9, 2) = '00' THEN (make_date(nullif(substr(date_started, 1, 4)::integer, 0), substr(date_started, 6, 2)::integer, 1) + interval '1 month')::date - 1 ELSE make_date(nullif(substr(date_started, 1, 4)::integer, 0), substr(date_started, 6, 2)::integer, substr(date_started, 9, 2)::integer) END) STORED,
+                    ADD COLUMN date_started_precision smallint GENERATED ALWAYS AS (CASE WHEN date_started IS NULL THEN 0 WHEN substr(date_started, 6, 2) = '00' THEN 1 WHEN substr(date_started, 9, 2) = '00' THEN 2 ELSE 3 END) STORED
+                """,
+                'CREATE INDEX people_groupmembership_date_started_earliest_idx ON people_groupmembership (date_started_earliest)',
+                'CREATE INDEX people_groupmembership_date_started_latest_idx ON people_groupmembership (date_started_latest)',
+            ],
+            'ALTER TABLE people_groupmembership DROP COLUMN date_started_earliest, DROP COLUMN date_started_latest, DROP COLUMN date_started_precision',
+        ),
+        migrations.RunSQL(
+            [
+                """
+                ALTER TABLE people_groupmembership
+                    ADD COLUMN date_ended_earliest date GENERATED ALWAYS AS (make_date(nullif(substr(date_ended, 1, 4)::integer, 0), greatest(substr(date_ended, 6, 2)::integer, 1), greatest(substr(date_ended, 9, 2)::integer, 1))) STORED,
+                    ADD COLUMN date_ended_latest date GENERATED ALWAYS AS (CASE WHEN substr(date_ended, 6, 2) = '00' THEN make_date(nullif(substr(date_ended, 1, 4)::integer, 0), 12, 31) WHEN substr(date_ended, 9, 2) = '00' THEN (make_date(nullif(substr(date_ended, 1, 4)::integer, 0), substr(date_ended, 6, 2)::integer, 1) + interval '1 month')::date - 1 ELSE make_date(nullif(substr(date_ended, 1, 4)::integer, 0), substr(date_ended, 6, 2)::integer, substr(date_ended, 9, 2)::integer) END) STORED,
+                    ADD COLUMN date_ended_precision smallint GENERATED ALWAYS AS (CASE WHEN date_ended IS NULL THEN 0 WHEN substr(date_ended, 6, 2) = '00' THEN 1 WHEN substr(date_ended, 9, 2) = '00' THEN 2 ELSE 3 END) STORED
+                """,
+                'CREATE INDEX people_groupmembership_date_ended_earliest_idx ON people_groupmembership (date_ended_earliest)',
+                'CREATE INDEX people_groupmembership_date_ended_latest_idx ON people_groupmembership (date_ended_latest)',
+            ],
+            'ALTER TABLE people_groupmembership DROP COLUMN date_ended_earliest, DROP COLUMN date_ended_latest, DROP COLUMN date_ended_precision',
+        ),
+    ]
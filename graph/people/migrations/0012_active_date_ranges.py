@@ -0,0 +1,70 @@
+from django.db import migrations
+
+# Generated active date ranges of relationship statuses and group memberships, see `ActiveRangeField`, with GiST
+# indexes led by the key column when the btree_gist extension is available. Generated columns can not refer to each
+# other, so the bounds are computed from the date strings again. The SQL is spelled out so that the migration does not
+# change with the field code.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0011_date_companion_columns'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                """
+                ALTER TABLE people_relationshipstatus ADD COLUMN date_range daterange GENERATED ALWAYS AS (
+                    CASE WHEN make_date(nullif(substr(date_end, 1, 4)::integer, 0), greatest(substr(date_end, 6, 2)::integer, 1), greatest(substr(date_end, 9, 2)::integer, 1))
+                        < make_date(nullif(substr(date_start, 1, 4)::integer, 0), greatest(substr(date_start, 6, 2)::integer, 1), greatest(substr(date_start, 9, 2)::integer, 1))
+                    THEN 'empty'::daterange
+                    ELSE daterange(
+                        make_date(nullif(substr(date_start, 1, 4)::integer, 0), greatest(substr(date_start, 6, 2)::integer, 1), greatest(substr(date_start, 9, 2)::integer, 1)),
+                        make_date(nullif(substr(date_end, 1, 4)::integer, 0), greatest(substr(date_end, 6, 2)::integer, 1), greatest(substr(date_end, 9, 2)::integer, 1)),
+                        '[]'
+                    ) END
+                ) STORED
+                """,
+                """
+                DO $$ BEGIN
+                    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist') THEN
+                        CREATE EXTENSION IF NOT EXISTS btree_gist;
+                        CREATE INDEX people_relationshipstatus_date_range_idx ON people_relationshipstatus USING gist (relationship_id, date_range);
+                    ELSE
+                        CREATE INDEX people_relationshipstatus_date_range_idx ON people_relationshipstatus USING gist (date_range);
+                    END IF;
+                END $$
+                """,
+            ],
+            'ALTER TABLE people_relationshipstatus DROP COLUMN date_range',
+        ),
+        migrations.RunSQL(
+            [
+                """
+                ALTER TABLE people_groupmembership ADD COLUMN date_range daterange GENERATED ALWAYS AS (
+                    CASE WHEN make_date(nullif(substr(date_ended, 1, 4)::integer, 0), greatest(substr(date_ended, 6, 2)::integer, 1), greatest(substr(date_ended, 9, 2)::integer, 1))
+                        < make_date(nullif(substr(date_started, 1, 4)::integer, 0), greatest(substr(date_started, 6, 2)::integer, 1), greatest(substr(date_started, 9, 2)::integer, 1))
+                    THEN 'empty'::daterange
+                    ELSE daterange(
+                        make_date(nullif(substr(date_started, 1, 4)::integer, 0), greatest(substr(date_started, 6, 2)::integer, 1), greatest(substr(date_started, 9, 2)::integer, 1)),
+                        make_date(nullif(substr(date_ended, 1, 4)::integer, 0), greatest(substr(date_ended, 6, 2)::integer, 1), greatest(substr(date_ended, 9, 2)::integer, 1)),
+                        '[]'
+                    ) END
+                ) STORED
+                """,
+                """
+                DO $$ BEGIN
+                    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist') THEN
+                        CREATE EXTENSION IF NOT EXISTS btree_gist;
+                        CREATE INDEX people_groupmembership_date_range_idx ON people_groupmembership USING gist (person_id, date_range);
+                    ELSE
+                        CREATE INDEX people_groupmembership_date_range_idx ON people_groupmembership USING gist (date_range);
+                    END IF;
+                END $$
+                """,
+            ],
+            'ALTER TABLE people_groupmembership DROP COLUMN date_range',
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:25
+
+from django.db import migrations, models
+import people.utils.variable_res_date
+
+# Relationship.objects.for_graph_serialization() with its prefetched recent_statuses
+CREATE_VIEW_SQL = """
+CREATE MATERIALIZED VIEW people_graphedgestatus AS
+SELECT
+    COALESCE(s.id, -r.id) AS id,
+    r.id AS relationship_id,
+    r.first_person_id,
+    r.second_person_id,
+    s.id AS relationship_status_id,
+    s.status,
+    s.date_start,
+    s.date_start_earliest,
+    s.date_start_latest,
+    s.date_start_precision,
+    s.date_end,
+    s.date_end_earliest,
+    s.date_end_latest,
+    s.date_end_precision,
+    COALESCE((SELECT version FROM people_graphdataversion WHERE id = 1), 0) AS version
+FROM people_relationship r
+JOIN people_person first_person ON first_person.id = r.first_person_id AND first_person.visible
+JOIN people_person second_person ON second_person.id = r.second_person_id AND second_person.visible
+LEFT JOIN people_relationshipstatus s ON s.relationship_id = r.id AND s.visible AND s.confirmed_by = 3
+WHERE EXISTS (SELECT 1 FROM people_relationshipstatus v WHERE v.relationship_id = r.id AND v.visible)
+AND EXISTS (SELECT 1 FROM people_relationshipstatus c WHERE c.relationship_id = r.id AND c.confirmed_by = 3)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0012_active_date_ranges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphEdgeStatus',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.IntegerField(choices=[(1, 'Blood relatives'), (2, 'Siblings'), (3, 'Parent-child'), (4, 'Married'), (5, 'Engaged'), (6, 'Dating'), (7, 'Rumour')], null=True, verbose_name='status')),
+                ('date_start', people.utils.variable_res_date.VariableResolutionDateField(blank=True, null=True, verbose_name='date start')),
+                ('date_end', people.utils.variable_res_date.VariableResolutionDateField(blank=True, null=True, verbose_name='date end')),
+                ('version', models.BigIntegerField(verbose_name='version')),
+            ],
+            options={
+                'db_table': 'people_graphedgestatus',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            [
+                CREATE_VIEW_SQL,
+                # Required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+                'CREATE UNIQUE INDEX people_graphedgestatus_id_idx ON people_graphedgestatus (id)',
+                'CREATE INDEX people_graphedgestatus_relationship_idx '
+                'ON people_graphedgestatus (relationship_id, date_start DESC, relationship_status_id)',
+            ],
+            'DROP MATERIALIZED VIEW people_graphedgestatus',
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+
+def merge_reversed_pairs(apps, schema_editor):
+    """
+    Folds every relationship into the older one of the same two people in the other order, moving its statuses (and
+    their notes with them) over, so that the pair can be made unique.
+    """
+    Relationship = apps.get_model('people', 'Relationship')
+    RelationshipStatus = apps.get_model('people', 'RelationshipStatus')
+    GraphDataVersion = apps.get_model('people', 'GraphDataVersion')
+    GraphChange = apps.get_model('people', 'GraphChange')
+
+    reversed_pair = Relationship.objects.filter(
+        first_person=OuterRef('second_person'), second_person=OuterRef('first_person'), pk__lt=OuterRef('pk')
+    )
+    merged = dict(
+        Relationship.objects.annotate(kept=Subquery(reversed_pair.values('pk')[:1]))
+        .filter(kept__isnull=False).values_list('pk', 'kept')
+    )
+    if not merged:
+        return
+
+    for pk, kept in merged.items():
+        RelationshipStatus.objects.filter(relationship_id=pk).update(relationship_id=kept)
+    Relationship.objects.filter(pk__in=merged).delete()
+
+    # Graph clients drop the merged edges and reload the ones they were folded into
+    GraphDataVersion.objects.filter(pk=1).update(version=F('version') + 1, date_updated=timezone.now())
+    version = GraphDataVersion.objects.get(pk=1).version
+    GraphChange.objects.bulk_create(
+        [GraphChange(version=version, action=3, edge=pk) for pk in merged] +
+        [GraphChange(version=version, action=2, edge=kept) for kept in set(merged.values())]
+    )
+
+    # Deferred foreign key checks of the moved statuses would block the ALTER TABLE below
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0013_graphedgestatus'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_reversed_pairs, migrations.RunPython.noop),
+        migrations.RunSQL(
+            [
+                'ALTER TABLE people_relationship '
+                'ADD COLUMN min_person_id integer '
+                'GENERATED ALWAYS AS (LEAST(first_person_id, second_person_id)) STORED, '
+                'ADD COLUMN max_person_id integer '
+                'GENERATED ALWAYS AS (GREATEST(first_person_id, second_person_id)) STORED',
+                'CREATE UNIQUE INDEX people_relationship_person_pair_uniq '
+                'ON people_relationship (min_person_id, max_person_id)',
+            ],
+            'ALTER TABLE people_relationship DROP COLUMN min_person_id, DROP COLUMN max_person_id',
+        ),
+    ]
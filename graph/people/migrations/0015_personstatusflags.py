@@ -0,0 +1,36 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:49
+
+from django.conf import settings
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0014_relationship_person_pair'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonStatusFlags',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='status_flags', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='person')),
+                ('current_statuses', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(choices=[(1, 'Blood relatives'), (2, 'Siblings'), (3, 'Parent-child'), (4, 'Married'), (5, 'Engaged'), (6, 'Dating'), (7, 'Rumour')]), default=list, size=None, verbose_name='current statuses')),
+                ('romantic', models.BooleanField(db_index=True, default=False, verbose_name='in a romantic relationship')),
+                ('group_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None, verbose_name='groups')),
+                ('version', models.BigIntegerField(verbose_name='version')),
+                ('date', models.DateField(verbose_name='date')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='personstatusflags',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['current_statuses'], name='people_flags_statuses_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='personstatusflags',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['group_ids'], name='people_flags_groups_idx'),
+        ),
+    ]
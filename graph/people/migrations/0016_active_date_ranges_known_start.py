@@ -0,0 +1,120 @@
+from django.db import migrations
+
+# Records with an unknown start are not known to have started, their active date ranges are empty rather than unbounded
+# below. Dropping the generated columns drops their indexes too, both are created again.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0015_personstatusflags'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                'ALTER TABLE people_relationshipstatus DROP COLUMN date_range',
+                """
+                ALTER TABLE people_relationshipstatus ADD COLUMN date_range daterange GENERATED ALWAYS AS (
+                    CASE WHEN make_date(nullif(substr(date_start, 1, 4)::integer, 0), greatest(substr(date_start, 6, 2)::integer, 1), greatest(substr(date_start, 9, 2)::integer, 1)) IS NULL
+                        OR make_date(nullif(substr(date_end, 1, 4)::integer, 0), greatest(substr(date_end, 6, 2)::integer, 1), greatest(substr(date_end, 9, 2)::integer, 1))
+                        < make_date(nullif(substr(date_start, 1, 4)::integer, 0), greatest(substr(date_start, 6, 2)::integer, 1), greatest(substr(date_start, 9, 2)::integer, 1))
+                    THEN 'empty'::daterange
+                    ELSE daterange(
+                        make_date(nullif(substr(date_start, 1, 4)::integer, 0), greatest(substr(date_start, 6, 2)::integer, 1), greatest(substr(date_start, 9, 2)::integer, 1)),
+                        make_date(nullif(substr(date_end, 1, 4)::integer, 0), greatest(substr(date_end, 6, 2)::integer, 1), greatest(substr(date_end, 9, 2)::integer, 1)),
+                        '[]'
+                    ) END
+                ) STORED
+                """,
+                """
+                DO $$ BEGIN
+                    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist') THEN
+                        CREATE EXTENSION IF NOT EXISTS btree_gist;
+                        CREATE INDEX people_relationshipstatus_date_range_idx ON people_relationshipstatus USING gist (relationship_id, date_range);
+                    ELSE
+                        CREATE INDEX people_relationshipstatus_date_range_idx ON people_relationshipstatus USING gist (date_range);
+                    END IF;
+                END $$
+                """,
+            ],
+            [
+                'ALTER TABLE people_relationshipstatus DROP COLUMN date_range',
+                """
+                ALTER TABLE people_relationshipstatus ADD COLUMN date_range daterange GENERATED ALWAYS AS (
+                    CASE WHEN make_date(nullif(substr(date_end, 1, 4)::integer, 0), greatest(substr(date_end, 6, 2)::integer, 1), greatest(substr(date_end, 9, 2)::integer, 1))
+                        < make_date(nullif(substr(date_start, 1, 4)::integer, 0), greatest(substr(date_start, 6, 2)::integer, 1), greatest(substr(date_start, 9, 2)::integer, 1))
+                    THEN 'empty'::daterange
+                    ELSE daterange(
+                        make_date(nullif(substr(date_start, 1, 4)::integer, 0), greatest(substr(date_start, 6, 2)::integer, 1), greatest(substr(date_start, 9, 2)::integer, 1)),
+                        make_date(nullif(substr(date_end, 1, 4)::integer, 0), greatest(substr(date_end, 6, 2)::integer, 1), greatest(substr(date_end, 9, 2)::integer, 1)),
+                        '[]'
+                    ) END
+                ) STORED
+                """,
+                """
+                DO $$ BEGIN
+                    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist') THEN
+                        CREATE EXTENSION IF NOT EXISTS btree_gist;
+                        CREATE INDEX people_relationshipstatus_date_range_idx ON people_relationshipstatus USING gist (relationship_id, date_range);
+                    ELSE
+                        CREATE INDEX people_relationshipstatus_date_range_idx ON people_relationshipstatus USING gist (date_range);
+                    END IF;
+                END $$
+                """,
+            ],
+        ),
+        migrations.RunSQL(
+            [
+                'ALTER TABLE people_groupmembership DROP COLUMN date_range',
+                """
+                ALTER TABLE people_groupmembership ADD COLUMN date_range daterange GENERATED ALWAYS AS (
+                    CASE WHEN make_date(nullif(substr(date_started, 1, 4)::integer, 0), greatest(substr(date_started, 6, 2)::integer, 1), greatest(substr(date_started, 9, 2)::integer, 1)) IS NULL
+                        OR make_date(nullif(substr(date_ended, 1, 4)::integer, 0), greatest(substr(date_ended, 6, 2)::integer, 1), greatest(substr(date_ended, 9, 2)::integer, 1))
+                        < make_date(nullif(substr(date_started, 1, 4)::integer, 0), greatest(substr(date_started, 6, 2)::integer, 1), greatest(substr(date_started, 9, 2)::integer, 1))
+                    THEN 'empty'::daterange
+                    ELSE daterange(
+                        make_date(nullif(substr(date_started, 1, 4)::integer, 0), greatest(substr(date_started, 6, 2)::integer, 1), greatest(substr(date_started, 9, 2)::integer, 1)),
+                        make_date(nullif(substr(date_ended, 1, 4)::integer, 0), greatest(substr(date_ended, 6, 2)::integer, 1), greatest(substr(date_ended, 9, 2)::integer, 1)),
+                        '[]'
+                    ) END
+                ) STORED
+                """,
+                """
+                DO $$ BEGIN
+                    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist') THEN
+                        CREATE EXTENSION IF NOT EXISTS btree_gist;
+                        CREATE INDEX people_groupmembership_date_range_idx ON people_groupmembership USING gist (person_id, date_range);
+                    ELSE
+                        CREATE INDEX people_groupmembership_date_range_idx ON people_groupmembership USING gist (date_range);
+                    END IF;
+                END $$
+                """,
+            ],
+            [
+                'ALTER TABLE people_groupmembership DROP COLUMN date_range',
+                """
+                ALTER TABLE people_groupmembership ADD COLUMN date_range daterange GENERATED ALWAYS AS (
+                    CASE WHEN make_date(nullif(substr(date_ended, 1, 4)::integer, 0), greatest(substr(date_ended, 6, 2)::integer, 1), greatest(substr(date_ended, 9, 2)::integer, 1))
+                        < make_date(nullif(substr(date_started, 1, 4)::integer, 0), greatest(substr(date_started, 6, 2)::integer, 1), greatest(substr(date_started, 9, 2)::integer, 1))
+                    THEN 'empty'::daterange
+                    ELSE daterange(
+                        make_date(nullif(substr(date_started, 1, 4)::integer, 0), greatest(substr(date_started, 6, 2)::integer, 1), greatest(substr(date_started, 9, 2)::integer, 1)),
+                        make_date(nullif(substr(date_ended, 1, 4)::integer, 0), greatest(substr(date_ended, 6, 2)::integer, 1), greatest(substr(date_ended, 9, 2)::integer, 1)),
+                        '[]'
+                    ) END
+                ) STORED
+                """,
+                """
+                DO $$ BEGIN
+                    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist') THEN
+                        CREATE EXTENSION IF NOT EXISTS btree_gist;
+                        CREATE INDEX people_groupmembership_date_range_idx ON people_groupmembership USING gist (person_id, date_range);
+                    ELSE
+                        CREATE INDEX people_groupmembership_date_range_idx ON people_groupmembership USING gist (date_range);
+                    END IF;
+                END $$
+                """,
+            ],
+        ),
+    ]
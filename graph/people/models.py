@@ -1,4 +1,6 @@
-from typing import List, Optional
+import datetime
+from functools import partial
+from typing import List, Optional, Tuple
 
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
@@ -6,8 +8,10 @@ from django.contrib import auth
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser, PermissionsMixin
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.mail import send_mail
-from django.db import models
+from django.db import connection, models, transaction
 from django.db.models import Prefetch, Q, F, Exists, OuterRef, QuerySet, Case, When, Value
 from django.db.models.functions import Coalesce
 from django.template.loader import get_template
@@ -15,10 +19,29 @@ from django.utils import timezone
 from django.utils.html import strip_tags
 from django.utils.translation import gettext_lazy as _
 
-from people.utils.variable_res_date import VariableResolutionDateField
+from people.utils.variable_res_date import ActiveRangeField, CompanionFieldMixin, VariableResolutionDateField
 from users.models import Token
 
 
+APOLOGY_MAIL_TEMPLATE = 'people/email/notice_and_apology.html'
+
+
+def choice_label(instance: models.Model, field_name: str):
+    # Unlike `get_FOO_display`, keeps lazy labels lazy
+    value = getattr(instance, field_name)
+    return dict(instance._meta.get_field(field_name).flatchoices).get(value, value)
+
+
+def render_apology_mail(context: dict, recipients: List[str], template=None) -> tuple:
+    """
+    Mail tuple for `send_mass_html_mail` of the context of `Person.get_apology_mail_context`.
+    """
+    html_message = (template or get_template(APOLOGY_MAIL_TEMPLATE)).render(context)
+    plain_message = strip_tags(html_message)
+
+    return ('Trojsten Graf - informačný mail', plain_message, html_message, None, recipients)
+
+
 class ExportableEnum:
     pass
 
@@ -40,12 +63,22 @@ class BaseNote(models.Model):
         abstract = True
 
 
+def person_pair(person_1, person_2) -> Tuple[int, int]:
+    """
+    Canonical key of an unordered pair of people or their ids, the lesser id first.
+    """
+    pk_1, pk_2 = getattr(person_1, 'pk', person_1), getattr(person_2, 'pk', person_2)
+    return (pk_1, pk_2) if pk_1 <= pk_2 else (pk_2, pk_1)
+
+
 class RelationshipQuerySet(models.QuerySet):
+    def between(self, person_1, person_2):
+        min_pk, max_pk = person_pair(person_1, person_2)
+        return self.filter(min_person_id=min_pk, max_person_id=max_pk)
+
     def get_or_create_for_people(self, person_1, person_2, defaults=None):
         try:
-            return Relationship.objects.get(
-                Q(first_person=person_1, second_person=person_2) | Q(second_person=person_1, first_person=person_2)
-            )
+            return Relationship.objects.between(person_1, person_2).get()
         except Relationship.DoesNotExist:
             defaults = defaults or {}
             return Relationship.objects.create(
@@ -54,6 +87,40 @@ class RelationshipQuerySet(models.QuerySet):
                 **defaults
             )
 
+    def bulk_get_or_create_for_people(self, pairs, defaults=None) -> List['Relationship']:
+        """
+        `get_or_create_for_people` of every pair of people, returning the relationships in the order of the pairs.
+        Existing relationships are read by a single query, the missing ones are inserted at once and logged as
+        graph changes, as `post_save` is not sent for them.
+        """
+        pairs = list(pairs)
+        keys = [person_pair(person_1, person_2) for person_1, person_2 in pairs]
+        if not keys:
+            return []
+
+        # Rows of every combination of the lesser and the greater ids, only the wanted pairs are kept
+        relationships = {
+            (relationship.min_person_id, relationship.max_person_id): relationship
+            for relationship in Relationship.objects.filter(
+                min_person_id__in={min_pk for min_pk, _ in keys}, max_person_id__in={max_pk for _, max_pk in keys}
+            )
+        }
+
+        missing = {}
+        for key, (person_1, person_2) in zip(keys, pairs):
+            if key not in relationships and key not in missing:
+                missing[key] = Relationship(
+                    first_person_id=getattr(person_1, 'pk', person_1),
+                    second_person_id=getattr(person_2, 'pk', person_2),
+                    **(defaults or {})
+                )
+        if missing:
+            created = Relationship.objects.bulk_create(missing.values())
+            GraphChange.objects.record(created, GraphChange.Actions.CREATED)
+            relationships.update(zip(missing, created))
+
+        return [relationships[key] for key in keys]
+
     def with_people(self):
         return self.select_related('first_person', 'second_person')
 
@@ -89,18 +156,36 @@ class RelationshipQuerySet(models.QuerySet):
         return self.prefetch_related(
             Prefetch(
                 'statuses',
-                queryset=RelationshipStatus.objects.visible().confirmed().order_by('relationship', '-date_start'),
+                queryset=RelationshipStatus.objects.visible().confirmed().order_by('relationship', '-date_start', 'pk'),
                 to_attr='recent_statuses'
             )
         )
 
     def for_graph_serialization(self, people):
-        return self.with_people().for_people(people).with_recent_statuses().visible().confirmed()
+        return self.with_people().for_people(people).with_recent_statuses().visible().confirmed().order_by('pk')
+
+
+class PersonPairField(CompanionFieldMixin, models.IntegerField):
+    """
+    The lesser or the greater of the ids of the people in a relationship, generated by the database. Together they
+    are the canonical key of the unordered pair, unique across relationships.
+    """
+
+    def __init__(self, pick, *args, **kwargs):
+        self.pick = pick
+        super().__init__(None, *args, **kwargs)
+
+    def value_from_instance(self, instance):
+        if instance.first_person_id is None or instance.second_person_id is None:
+            return None
+        return self.pick(instance.first_person_id, instance.second_person_id)
 
 
 class Relationship(models.Model):
     first_person = models.ForeignKey('people.Person', related_name='relationships_as_first', on_delete=models.CASCADE, verbose_name=_('first person'))
     second_person = models.ForeignKey('people.Person', related_name='relationships_as_second', on_delete=models.CASCADE, verbose_name=_('second person'))
+    min_person_id = PersonPairField(min, verbose_name=_('lesser person id'))
+    max_person_id = PersonPairField(max, verbose_name=_('greater person id'))
 
     objects = RelationshipQuerySet.as_manager()
 
@@ -126,7 +211,7 @@ class RelationshipStatusQuerySet(models.QuerySet):
         return self.filter(Q(relationship__first_person=OuterRef('pk')) | Q(relationship__second_person=OuterRef('pk')))
 
     def for_date(self, date):
-        return self.filter(date_start__lte=date).exclude(date_end__lt=date)
+        return self.filter(date_range__contains=date)
 
     def current(self):
         return self.for_date(timezone.localdate())
@@ -188,6 +273,7 @@ class RelationshipStatus(models.Model):
 
     date_start = VariableResolutionDateField(null=True, blank=True, verbose_name=_('date start'))
     date_end = VariableResolutionDateField(null=True, blank=True, verbose_name=_('date end'))
+    date_range = ActiveRangeField('date_start', 'date_end', verbose_name=_('date range'))
 
     confirmed_by = models.IntegerField(choices=ConfirmationBy.choices, default=ConfirmationBy.NONE, verbose_name=_('confirmed by'))
     visible = models.BooleanField(default=False, verbose_name=_('visible'))
@@ -337,16 +423,16 @@ class PersonQuerySet(models.QuerySet):
     def in_age_range(self, age_years_from: Optional[int] = None, age_years_to: Optional[int] = None) -> QuerySet:
         qs = self
         if age_years_from:
-            qs = qs.filter(birth_date__lte=timezone.localdate() - relativedelta(years=age_years_from))
+            qs = qs.filter(birth_date_earliest__lte=timezone.localdate() - relativedelta(years=age_years_from))
         if age_years_to:
-            qs = qs.filter(birth_date__gte=timezone.localdate() - relativedelta(years=age_years_to))
+            qs = qs.filter(birth_date_earliest__gte=timezone.localdate() - relativedelta(years=age_years_to))
         return qs
 
     def with_visible_memberships(self):
         return self.prefetch_related(
             Prefetch(
                 'memberships',
-                queryset=GroupMembership.objects.filter(visible=True),
+                queryset=GroupMembership.objects.filter(visible=True).order_by('-date_started', 'pk'),
                 to_attr='visible_memberships'
             )
         )
@@ -354,6 +440,39 @@ class PersonQuerySet(models.QuerySet):
     def for_graph_serialization(self):
         return self.filter(visible=True).with_visible_memberships().order_by('pk')
 
+    def with_apology_mail_data(self):
+        """
+        Prefetches everything `Person.render_apology_mail` needs, in a constant number of queries.
+        """
+        statuses = Prefetch('statuses', queryset=RelationshipStatus.objects.order_by('date_start'))
+        return self.prefetch_related(
+            Prefetch('contacts', queryset=ContactEmail.objects.order_by('-sure_its_active'), to_attr='apology_contacts'),
+            Prefetch('memberships', queryset=GroupMembership.objects.select_related('group'),
+                     to_attr='apology_memberships'),
+            Prefetch('relationships_as_first', queryset=Relationship.objects.select_related(
+                'second_person').prefetch_related(statuses).order_by('pk'), to_attr='apology_relationships_1'),
+            Prefetch('relationships_as_second', queryset=Relationship.objects.select_related(
+                'first_person').prefetch_related(statuses).order_by('pk'), to_attr='apology_relationships_2'),
+            # Managed people in the default ordering of people
+            Prefetch('subjects', queryset=ManagementAuthority.objects.select_related('subject').order_by(
+                '-subject__birth_date'), to_attr='apology_subjects'),
+        )
+
+    def prepare_apology_mails(self) -> List[Tuple['Person', Token]]:
+        """
+        The people that can be reached, with everything `Person.render_apology_mail` needs, and their auth tokens.
+        """
+        people = [person for person in self.with_apology_mail_data() if person.get_apology_mail_recipients()]
+        tokens = Token.objects.get_or_create_for_users([person.pk for person in people], Token.Types.AUTH)
+        return [(person, tokens[person.pk]) for person in people]
+
+    def construct_apology_mails(self) -> list:
+        """
+        Mail tuples for `send_mass_html_mail` of the people that can be reached.
+        """
+        template = get_template(APOLOGY_MAIL_TEMPLATE)
+        return [person.render_apology_mail(token, template) for person, token in self.prepare_apology_mails()]
+
 
 class Person(AbstractBaseUser, PermissionsMixin):
     class Genders(ExportableEnum, models.IntegerChoices):
@@ -411,7 +530,7 @@ class Person(AbstractBaseUser, PermissionsMixin):
 
     @property
     def auth_token(self):
-        return Token.objects.filter(type=Token.Types.AUTH, valid=True, user=self).first()
+        return Token.objects.usable().filter(type=Token.Types.AUTH, user=self).first()
 
     def __str__(self):
         if self.first_name and self.last_name:
@@ -426,50 +545,76 @@ class Person(AbstractBaseUser, PermissionsMixin):
             return
         self.email = self.__class__.objects.normalize_email(self.email)
 
+    def mark_apology_read(self):
+        # Writes only the changed column, which does not change the graph (see `people.signals.is_graph_change`)
+        if self.apology_status != Person.ApologyStatus.READ:
+            self.apology_status = Person.ApologyStatus.READ
+            self.save(update_fields=['apology_status'])
+
     def email_user(self, subject, message, from_email=None, **kwargs):
         send_mail(subject, message, from_email, [self.email], **kwargs)
 
     def construct_apology_mail(self):
-        if self.email is not None:
-            contact_emails = [self.email]
-        else:
-            all_contacts = list(ContactEmail.objects.filter(person=self).order_by('-sure_its_active'))
-            if len(all_contacts) == 0:
-                return None
-
-            if all_contacts[0].sure_its_active:
-                contact_emails = [all_contacts[0].email]
-            else:
-                contact_emails = [x.email for x in all_contacts]
-
-        auth_token, created = Token.objects.get_or_create(user=self, type=Token.Types.AUTH, token=Token.get_random_token())
-
-        group_memberships = GroupMembership.objects.select_related('group').filter(person=self)
+        mails = Person.qs.filter(pk=self.pk).construct_apology_mails()
+        return mails[0] if mails else None
 
-        relationships = Relationship.objects.filter(Q(first_person=self) | Q(second_person=self))
-
-        managed_people = Person.qs.filter(
-            Exists(ManagementAuthority.objects.filter(manager=self, subject=OuterRef('pk')))
-        )
-
-        html_message = get_template('people/email/notice_and_apology.html').render(
-            {
-                'token': auth_token.token,
-                'person': self,
-                'group_memberships': list(group_memberships),
-                'relationships': [
-                    (
-                        r.first_person.name if r.second_person == self else r.second_person.name,
-                        RelationshipStatus.objects.filter(relationship=r).order_by('date_start')
-                    )
-                    for r in relationships
-                ],
-                'managed_people': managed_people
+    def get_apology_mail_recipients(self) -> List[str]:
+        # The people of `PersonQuerySet.with_apology_mail_data` only
+        if self.email is not None:
+            return [self.email]
+        if not self.apology_contacts:
+            return []
+        if self.apology_contacts[0].sure_its_active:
+            return [self.apology_contacts[0].email]
+        return [contact.email for contact in self.apology_contacts]
+
+    def get_apology_mail_context(self, auth_token: Token) -> dict:
+        """
+        The context of the apology mail template as plain data, cheap to pass to other processes. Labels of choices
+        are left lazy, they are translated in the language of the template. The people of
+        `PersonQuerySet.with_apology_mail_data` only.
+        """
+        def status_context(status: RelationshipStatus):
+            return {
+                'get_status_display': choice_label(status, 'status'),
+                'date_start': status.date_start,
+                'date_end': status.date_end,
             }
-        )
-        plain_message = strip_tags(html_message)
 
-        return ('Trojsten Graf - informačný mail', plain_message, html_message, None, contact_emails)
+        managed_people = {
+            authority.subject_id: {'pk': authority.subject_id, 'name': authority.subject.name}
+            for authority in self.apology_subjects
+        }
+
+        return {
+            'token': auth_token.token,
+            'person': {
+                'first_name': self.first_name,
+                'last_name': self.last_name,
+                'maiden_name': self.maiden_name,
+                'birth_date': self.birth_date,
+                'death_date': self.death_date,
+                'get_gender_display': choice_label(self, 'gender'),
+            },
+            'group_memberships': [
+                {'group': {'name': gm.group.name}, 'date_started': gm.date_started, 'date_ended': gm.date_ended}
+                for gm in self.apology_memberships
+            ],
+            'relationships': [
+                (r.second_person.name, [status_context(status) for status in r.statuses.all()])
+                for r in self.apology_relationships_1
+            ] + [
+                (r.first_person.name, [status_context(status) for status in r.statuses.all()])
+                for r in self.apology_relationships_2
+            ],
+            'managed_people': list(managed_people.values()),
+        }
+
+    def render_apology_mail(self, auth_token: Token, template=None):
+        # The people of `PersonQuerySet.with_apology_mail_data` only
+        return render_apology_mail(
+            self.get_apology_mail_context(auth_token), self.get_apology_mail_recipients(), template
+        )
 
     class Meta:
         verbose_name = _("person")
@@ -512,6 +657,12 @@ class GroupMembershipNote(BaseNote):
 
 
 class GroupMembershipQuerySet(models.QuerySet):
+    def for_date(self, date):
+        return self.filter(date_range__contains=date)
+
+    def current(self):
+        return self.for_date(timezone.localdate())
+
     def with_duration(self):
         return self.annotate(
             duration=Coalesce(F('date_ended'), timezone.localdate()) - Coalesce(F('date_started'),
@@ -525,6 +676,7 @@ class GroupMembership(models.Model):
 
     date_started = VariableResolutionDateField(null=True, blank=True, verbose_name=_('date start'))
     date_ended = VariableResolutionDateField(null=True, blank=True, verbose_name=_('date end'))
+    date_range = ActiveRangeField('date_started', 'date_ended', verbose_name=_('date range'))
 
     visible = models.BooleanField(default=False, verbose_name=_('visible'))
 
@@ -549,3 +701,270 @@ class ContactEmail(models.Model):
 
     class Meta:
         unique_together = ('person', 'email')
+
+
+class GraphDataVersionQuerySet(models.QuerySet):
+    def current(self) -> int:
+        return self.filter(pk=GraphDataVersion.SINGLETON_PK).values_list('version', flat=True).first() or 0
+
+    def current_with_date(self):
+        return self.filter(pk=GraphDataVersion.SINGLETON_PK).values_list('version', 'date_updated').first() or (0, None)
+
+    def compacted_version(self) -> int:
+        return self.filter(pk=GraphDataVersion.SINGLETON_PK).values_list('compacted_version', flat=True).first() or 0
+
+    def bump(self) -> int:
+        """
+        Increments the version and returns the new one. A single statement, so that concurrent writers never get the
+        version of one another.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {self.model._meta.db_table} SET version = version + 1, date_updated = %s '
+                f'WHERE id = %s RETURNING version',
+                [timezone.now(), GraphDataVersion.SINGLETON_PK]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else 0
+
+
+class GraphDataVersion(models.Model):
+    SINGLETON_PK = 1
+
+    version = models.BigIntegerField(default=0, verbose_name=_('version'))
+    date_updated = models.DateTimeField(default=timezone.now, verbose_name=_('date updated'))
+    # Changes up to and including this version have been removed from the change log
+    compacted_version = models.BigIntegerField(default=0, verbose_name=_('compacted version'))
+
+    objects = GraphDataVersionQuerySet.as_manager()
+
+    def __str__(self):
+        return f'Graph data version {self.version}'
+
+
+class GraphChangeQuerySet(models.QuerySet):
+    @staticmethod
+    def affected_node_and_edge(instance):
+        if isinstance(instance, Person):
+            return instance.pk, None
+        if isinstance(instance, GroupMembership):
+            return instance.person_id, None
+        if isinstance(instance, Relationship):
+            return None, instance.pk
+        if isinstance(instance, RelationshipStatus):
+            return None, instance.relationship_id
+        return None, None
+
+    def record(self, instances, action):
+        """
+        Bumps the graph data version and logs the nodes and edges affected by the given instances under it.
+        Instances that are not serialized as a node or an edge only bump the version.
+        """
+        version = GraphDataVersion.objects.bump()
+        changes = []
+        for instance in instances:
+            node, edge = self.affected_node_and_edge(instance)
+            if node is not None or edge is not None:
+                changes.append(GraphChange(version=version, action=action, node=node, edge=edge))
+        self.bulk_create(changes, batch_size=500)
+        return version
+
+    def since(self, version: int):
+        return self.filter(version__gt=version)
+
+
+class GraphChange(models.Model):
+    class Actions(models.IntegerChoices):
+        CREATED = 1, _('Created')
+        UPDATED = 2, _('Updated')
+        DELETED = 3, _('Deleted')
+
+    version = models.BigIntegerField(db_index=True, verbose_name=_('version'))
+    action = models.IntegerField(choices=Actions.choices, verbose_name=_('action'))
+
+    # Plain ids rather than foreign keys, deletions have to outlive the deleted rows
+    node = models.IntegerField(null=True, blank=True, verbose_name=_('node'))
+    edge = models.IntegerField(null=True, blank=True, verbose_name=_('edge'))
+
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name=_('date created'))
+
+    objects = GraphChangeQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.get_action_display()} {"node" if self.node else "edge"} #{self.node or self.edge} at version {self.version}'
+
+
+class GraphEdgeStatusQuerySet(models.QuerySet):
+    def view_version(self) -> Optional[int]:
+        """
+        Graph data version the view was refreshed at, None when it is empty.
+        """
+        return self.values_list('version', flat=True).first()
+
+    def refresh(self, concurrently=True):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'REFRESH MATERIALIZED VIEW {"CONCURRENTLY " if concurrently else ""}{self.model._meta.db_table}'
+            )
+
+    def refresh_if_stale(self, concurrently=True) -> bool:
+        """
+        Refreshes the view unless it is at the current graph data version already, returns whether it did.
+        """
+        if self.view_version() == GraphDataVersion.objects.current():
+            return False
+        self.refresh(concurrently)
+        return True
+
+
+class GraphEdgeStatus(models.Model):
+    """
+    Row of a materialized view of the edges of the graph: the visible, confirmed statuses of relationships between
+    visible people that have a visible and a confirmed status, and a single row without a status for such
+    relationships none of whose statuses is both. The view is refreshed outside of requests by
+    `refresh_graph_edges --watch` once the graph data version moves past it, however the graph was changed. Until then
+    the edges are read from the tables, see `row_serializers.iter_graph_edges`.
+    """
+    # The status, or for relationships without one the negated relationship
+    id = models.BigIntegerField(primary_key=True)
+    relationship = models.ForeignKey('people.Relationship', related_name='+', on_delete=models.DO_NOTHING,
+                                     db_constraint=False, verbose_name=_('relationship'))
+    first_person = models.ForeignKey('people.Person', related_name='+', on_delete=models.DO_NOTHING,
+                                     db_constraint=False, verbose_name=_('first person'))
+    second_person = models.ForeignKey('people.Person', related_name='+', on_delete=models.DO_NOTHING,
+                                      db_constraint=False, verbose_name=_('second person'))
+    relationship_status = models.ForeignKey('people.RelationshipStatus', related_name='+', null=True,
+                                            on_delete=models.DO_NOTHING, db_constraint=False,
+                                            verbose_name=_('relationship status'))
+
+    status = models.IntegerField(choices=RelationshipStatus.StatusChoices.choices, null=True, verbose_name=_('status'))
+    date_start = VariableResolutionDateField(null=True, blank=True, verbose_name=_('date start'))
+    date_end = VariableResolutionDateField(null=True, blank=True, verbose_name=_('date end'))
+
+    # Graph data version at the time of the refresh
+    version = models.BigIntegerField(verbose_name=_('version'))
+
+    objects = GraphEdgeStatusQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = 'people_graphedgestatus'
+
+
+# Person.qs.has_relationship_status() and the memberships of every person, as of the given date
+# Key of the advisory lock serializing refreshes of `PersonStatusFlags`
+STATUS_FLAGS_LOCK_ID = 0x7065_6f70
+
+REFRESH_STATUS_FLAGS_SQL = """
+INSERT INTO people_personstatusflags (person_id, current_statuses, romantic, group_ids, version, date)
+SELECT
+    p.id,
+    COALESCE(s.statuses, '{}'),
+    COALESCE(s.statuses && %(romantic)s::integer[], false),
+    COALESCE(g.group_ids, '{}'),
+    %(version)s,
+    %(date)s
+FROM people_person p
+LEFT JOIN (
+    SELECT person_id, array_agg(DISTINCT status ORDER BY status) AS statuses
+    FROM (
+        SELECT r.first_person_id AS person_id, s.status
+        FROM people_relationshipstatus s JOIN people_relationship r ON r.id = s.relationship_id
+        WHERE s.date_range @> %(date)s::date
+            AND (%(people)s::integer[] IS NULL OR r.first_person_id = ANY(%(people)s::integer[]))
+        UNION ALL
+        SELECT r.second_person_id, s.status
+        FROM people_relationshipstatus s JOIN people_relationship r ON r.id = s.relationship_id
+        WHERE s.date_range @> %(date)s::date
+            AND (%(people)s::integer[] IS NULL OR r.second_person_id = ANY(%(people)s::integer[]))
+    ) current_statuses
+    GROUP BY person_id
+) s ON s.person_id = p.id
+LEFT JOIN (
+    SELECT person_id, array_agg(DISTINCT group_id ORDER BY group_id) AS group_ids
+    FROM people_groupmembership
+    WHERE %(people)s::integer[] IS NULL OR person_id = ANY(%(people)s::integer[])
+    GROUP BY person_id
+) g ON g.person_id = p.id
+WHERE %(people)s::integer[] IS NULL OR p.id = ANY(%(people)s::integer[])
+ORDER BY p.id
+ON CONFLICT (person_id) DO UPDATE SET
+    current_statuses = EXCLUDED.current_statuses,
+    romantic = EXCLUDED.romantic,
+    group_ids = EXCLUDED.group_ids,
+    version = EXCLUDED.version,
+    date = EXCLUDED.date
+"""
+
+
+class PersonStatusFlagsQuerySet(models.QuerySet):
+    def refreshed_at(self) -> Optional[Tuple[int, datetime.date]]:
+        """
+        Graph data version and date of the last refresh, None when it has never been refreshed.
+        """
+        return self.values_list('version', 'date').first()
+
+    def refresh(self, people: Optional[List[int]] = None, date: Optional[datetime.date] = None):
+        """
+        Rewrites the flags of the given people, of everyone by default. Refreshes wait for one another, so that they
+        never upsert the same rows at once.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [STATUS_FLAGS_LOCK_ID])
+            cursor.execute(REFRESH_STATUS_FLAGS_SQL, {
+                'romantic': [
+                    RelationshipStatus.StatusChoices.DATING, RelationshipStatus.StatusChoices.ENGAGED,
+                    RelationshipStatus.StatusChoices.MARRIED,
+                ],
+                'people': None if people is None else sorted(set(people)),
+                'version': GraphDataVersion.objects.current(),
+                'date': date or timezone.localdate(),
+            })
+
+    @staticmethod
+    def affected_people(instance) -> List[int]:
+        if isinstance(instance, Person):
+            return [instance.pk]
+        if isinstance(instance, GroupMembership):
+            return [instance.person_id]
+        if isinstance(instance, Relationship):
+            return [instance.first_person_id, instance.second_person_id]
+        if isinstance(instance, RelationshipStatus):
+            return [instance.relationship.first_person_id, instance.relationship.second_person_id]
+        return []
+
+    def refresh_on_commit(self, instances):
+        """
+        Refreshes the flags of the people affected by the given instances once the current transaction commits.
+        """
+        people = [person for instance in instances for person in self.affected_people(instance)]
+        if people:
+            transaction.on_commit(partial(self.refresh, people))
+
+
+class PersonStatusFlags(models.Model):
+    """
+    Current relationship statuses and memberships of a person, denormalized so that the admin filters of people are
+    index lookups rather than subqueries over all statuses. The rows of the people affected by a change are rewritten
+    once it commits, see `people.signals`, and everyone's by the daily `refresh_person_status_flags` command, as
+    statuses start and end with the date.
+    """
+    person = models.OneToOneField('people.Person', primary_key=True, related_name='status_flags',
+                                  on_delete=models.CASCADE, verbose_name=_('person'))
+
+    current_statuses = ArrayField(models.IntegerField(choices=RelationshipStatus.StatusChoices.choices),
+                                  default=list, verbose_name=_('current statuses'))
+    romantic = models.BooleanField(default=False, db_index=True, verbose_name=_('in a romantic relationship'))
+    group_ids = ArrayField(models.IntegerField(), default=list, verbose_name=_('groups'))
+
+    # Graph data version and date at the time the row was last rewritten
+    version = models.BigIntegerField(verbose_name=_('version'))
+    date = models.DateField(verbose_name=_('date'))
+
+    objects = PersonStatusFlagsQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['current_statuses'], name='people_flags_statuses_idx'),
+            GinIndex(fields=['group_ids'], name='people_flags_groups_idx'),
+        ]
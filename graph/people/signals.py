@@ -0,0 +1,65 @@
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+
+from people.models import (
+    Person, GraphDataVersion, GraphChange, GraphEdgeStatus, Group, GroupMembership, PersonStatusFlags, Relationship,
+    RelationshipStatus,
+)
+
+GRAPH_MODELS = frozenset(
+    model for model in apps.get_app_config('people').get_models()
+    if model not in (GraphDataVersion, GraphChange, GraphEdgeStatus, PersonStatusFlags)
+)
+
+# Models whose changes affect the `PersonStatusFlags` of the people they belong to
+STATUS_FLAGS_MODELS = (Person, GroupMembership, Relationship, RelationshipStatus)
+
+# Saves touching only these columns (logins, password changes, mail campaigns) never change the graph
+PERSON_NON_GRAPH_FIELDS = frozenset(
+    ('last_login', 'password', 'email', 'apology_status', 'is_active', 'is_staff', 'is_superuser', 'date_joined')
+)
+
+
+def is_graph_change(sender, update_fields=None):
+    if sender is Person and update_fields is not None:
+        return not set(update_fields) <= PERSON_NON_GRAPH_FIELDS
+    return True
+
+
+def record_graph_change_on_save(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    if raw or not is_graph_change(sender, update_fields):
+        return
+
+    if sender is Group and not created:
+        # Group names and categories are serialized into the memberships of every member
+        GraphChange.objects.record(GroupMembership.objects.filter(group=instance), GraphChange.Actions.UPDATED)
+    else:
+        GraphChange.objects.record(
+            [instance], GraphChange.Actions.CREATED if created else GraphChange.Actions.UPDATED
+        )
+
+
+def record_graph_change_on_delete(sender, instance, **kwargs):
+    GraphChange.objects.record([instance], GraphChange.Actions.DELETED)
+
+
+for model in GRAPH_MODELS:
+    post_save.connect(record_graph_change_on_save, sender=model)
+    post_delete.connect(record_graph_change_on_delete, sender=model)
+
+
+def refresh_status_flags_on_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not is_graph_change(sender, update_fields):
+        return
+    PersonStatusFlags.objects.refresh_on_commit([instance])
+
+
+def refresh_status_flags_on_delete(sender, instance, **kwargs):
+    if sender is not Person:
+        # Flags of a deleted person are deleted along with them
+        PersonStatusFlags.objects.refresh_on_commit([instance])
+
+
+for model in STATUS_FLAGS_MODELS:
+    post_save.connect(refresh_status_flags_on_save, sender=model)
+    post_delete.connect(refresh_status_flags_on_delete, sender=model)
@@ -1,3 +1,927 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin import site as admin_site
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Exists, F, OuterRef, Q
+from django.core import mail
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
+from rest_framework.renderers import JSONRenderer
+
+from people import serializers as v1_serializers
+from people.admin import PersonAdmin
+from people.models import (
+    ContactEmail, GraphChange, GraphDataVersion, GraphEdgeStatus, Person, PersonStatusFlags, Group, GroupMembership,
+    ManagementAuthority, Relationship, RelationshipStatus
+)
+from people.utils.variable_res_date import (
+    VariableDate, decode, get_precision, to_epoch_day, parse, timedelta, timedeltas
+)
+from people.views.graph import build_graph_data_snapshot
+from people.views.graph_v2.columnar import build_columnar_snapshot
+from people.views.graph_v2.common import RelationshipSerializer
+from people.views.graph_v2.people import PeopleSerializer, build_people_snapshot
+from people.views.graph_v2.relationships import build_relationships_snapshot
+from people.utils import graph_index, graph_snapshot
+from people.utils.adjacency import Adjacency
+from people.utils.apology_mail import iter_apology_mails
+from people.utils.graph_index import GraphIndex
+from people.utils.intervals import coverage
+from people.utils.mail import send_mass_html_mail
+from people.utils.read_receipts import ReadReceiptBuffer
+from people.views.graph_v2 import graph_filter
+from people.views.graph_v2.row_serializers import (
+    iter_edges, iter_graph_edges, iter_view_edges, serialize_people, serialize_relationships
+)
+from people.views.graph_v2.time_travel import iter_people_at, iter_relationships_at
+from users.models import Outbox, Token
+
+
+class GraphDataTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ksp = Group.objects.create(name='KSP', category=Group.Categories.SEMINAR)
+        gymko = Group.objects.create(name='Gymko', category=Group.Categories.HIGH_SCHOOL)
+
+        cls.alice = Person.objects.create(
+            email='alice@example.com', first_name='Alica', last_name='Nováková', maiden_name='Malá',
+            gender=Person.Genders.FEMALE, birth_date=VariableDate(1990, 0, 0), visible=True
+        )
+        cls.bob = Person.objects.create(
+            email='bob@example.com', first_name='Bob', last_name='Veľký', nickname='bobo',
+            gender=Person.Genders.MALE, birth_date=VariableDate(1989, 5, 0), visible=True
+        )
+        cls.carol = Person.objects.create(
+            first_name='Carol', last_name='Stará', gender=Person.Genders.OTHER,
+            birth_date=VariableDate(1930, 0, 0), death_date=VariableDate(2015, 3, 0), visible=True
+        )
+        cls.hidden = Person.objects.create(first_name='Hidden', last_name='Person', visible=False)
+
+        GroupMembership.objects.create(person=cls.alice, group=ksp, date_started=VariableDate(2005, 9, 0),
+                                       date_ended=VariableDate(2009, 0, 0), visible=True)
+        GroupMembership.objects.create(person=cls.alice, group=gymko, date_started=VariableDate(2005, 9, 0),
+                                       visible=True)
+        GroupMembership.objects.create(person=cls.bob, group=ksp, date_started=VariableDate(2004, 0, 0),
+                                       visible=False)
+
+        dating = Relationship.objects.create(first_person=cls.alice, second_person=cls.bob)
+        RelationshipStatus.objects.create(relationship=dating, status=RelationshipStatus.StatusChoices.DATING,
+                                          date_start=VariableDate(2008, 2, 0), date_end=VariableDate(2012, 0, 0),
+                                          confirmed_by=RelationshipStatus.ConfirmationBy.BOTH, visible=True)
+        RelationshipStatus.objects.create(relationship=dating, status=RelationshipStatus.StatusChoices.MARRIED,
+                                          date_start=VariableDate(2012, 0, 0),
+                                          confirmed_by=RelationshipStatus.ConfirmationBy.BOTH, visible=True)
+        RelationshipStatus.objects.create(relationship=dating, status=RelationshipStatus.StatusChoices.RUMOUR,
+                                          date_start=VariableDate(2007, 0, 0),
+                                          confirmed_by=RelationshipStatus.ConfirmationBy.NONE, visible=True)
+
+        family = Relationship.objects.create(first_person=cls.carol, second_person=cls.alice)
+        RelationshipStatus.objects.create(relationship=family, status=RelationshipStatus.StatusChoices.BLOOD_RELATIVE,
+                                          date_start=VariableDate(1990, 0, 0), date_end=VariableDate(2015, 3, 0),
+                                          confirmed_by=RelationshipStatus.ConfirmationBy.BOTH, visible=True)
+
+        hidden = Relationship.objects.create(first_person=cls.hidden, second_person=cls.bob)
+        RelationshipStatus.objects.create(relationship=hidden, status=RelationshipStatus.StatusChoices.SIBLING,
+                                          date_start=VariableDate(1989, 5, 0),
+                                          confirmed_by=RelationshipStatus.ConfirmationBy.BOTH, visible=True)
+
+
+class RowSerializerParityTestCase(GraphDataTestCase):
+    def test_people(self):
+        people = Person.qs.for_graph_serialization()
+        self.assertEqual(
+            JSONRenderer().render(serialize_people(people)),
+            CamelCaseJSONRenderer().render(PeopleSerializer(people, many=True).data)
+        )
+
+    def test_people_subset(self):
+        people = Person.qs.for_graph_serialization().filter(pk__in=[self.bob.pk, self.hidden.pk])
+        self.assertEqual(
+            JSONRenderer().render(serialize_people(people)),
+            CamelCaseJSONRenderer().render(PeopleSerializer(people, many=True).data)
+        )
+
+    def test_relationships(self):
+        relationships = Relationship.objects.for_graph_serialization(Person.qs.for_graph_serialization())
+        self.assertEqual(len(relationships), 2)
+        self.assertEqual(
+            JSONRenderer().render(serialize_relationships(relationships)),
+            CamelCaseJSONRenderer().render(RelationshipSerializer(relationships, many=True).data)
+        )
+
+
+class StreamedSnapshotTestCase(GraphDataTestCase):
+    def test_graph_data(self):
+        people = Person.qs.for_graph_serialization()
+        relationships = Relationship.objects.for_graph_serialization(people).exclude(
+            Exists(
+                RelationshipStatus.objects.filter(relationship=OuterRef('pk')).filter(
+                    Q(date_start__contains='-00') | Q(date_end__contains='-00'))
+            )
+        )
+        expected = json.dumps({
+            'nodes': v1_serializers.PeopleSerializer(people, many=True).data,
+            'edges': v1_serializers.RelationshipSerializer(relationships, many=True).data
+        }, cls=DjangoJSONEncoder).encode()
+        self.assertEqual(b''.join(build_graph_data_snapshot()), expected)
+
+    def test_people(self):
+        people = Person.qs.for_graph_serialization()
+        self.assertEqual(
+            b''.join(build_people_snapshot()),
+            CamelCaseJSONRenderer().render(PeopleSerializer(people, many=True).data)
+        )
+
+    def test_relationships(self):
+        relationships = Relationship.objects.for_graph_serialization(Person.qs.for_graph_serialization())
+        self.assertEqual(
+            b''.join(build_relationships_snapshot()),
+            CamelCaseJSONRenderer().render(RelationshipSerializer(relationships, many=True).data)
+        )
+
+
+class TemporarySnapshotDirMixin:
+    # Versions are reused by every test, each starts without any stored snapshots
+    def setUp(self):
+        super().setUp()
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+        self.snapshot_dir = snapshot_dir.name
+        settings_override = self.settings(GRAPH_SNAPSHOT_DIR=self.snapshot_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class SnapshotStoreTestCase(TemporarySnapshotDirMixin, GraphDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.version = GraphDataVersion.objects.current()
+        self.today = timezone.localdate()
+        self.key = graph_snapshot.cache_key('people', self.version, self.today)
+
+    def test_cached_for_the_day(self):
+        payload = graph_snapshot.get('people', self.version, self.today)
+        with self.assertNumQueries(0):
+            self.assertEqual(graph_snapshot.get('people', self.version, self.today), payload)
+
+        # Ages and open-ended durations are counted up to the day, the next day needs a new snapshot
+        with CaptureQueriesContext(connection) as queries:
+            graph_snapshot.get('people', self.version, self.today + datetime.timedelta(days=1))
+        self.assertTrue(queries.captured_queries)
+
+    def test_counted_up_to_the_keyed_day(self):
+        # A build running past midnight still counts up to the day it is stored for
+        day = datetime.date(2020, 1, 1)
+        for name, builder in (('people', build_people_snapshot), ('relationships', build_relationships_snapshot)):
+            payload = graph_snapshot.get(name, self.version, day)
+            self.assertEqual(payload, b''.join(builder(day)))
+            self.assertNotEqual(payload, b''.join(builder(self.today)))
+
+    def test_stored_once_complete(self):
+        chunks = graph_snapshot.iter_snapshot('people', self.version, self.today)
+        payload = next(chunks)
+        self.assertIsNone(graph_snapshot.open_snapshot(self.key))
+        # Other workers wait for this build rather than starting their own
+        self.assertFalse(graph_snapshot.lock(self.key))
+        payload += b''.join(chunks)
+        self.assertEqual(payload, b''.join(build_people_snapshot()))
+
+        response = graph_snapshot.get_response('people', self.version, self.today)
+        self.assertEqual(b''.join(response.streaming_content), payload)
+        self.assertEqual(int(response['Content-Length']), len(payload))
+        # Neither the temporary file nor the lock are left behind
+        self.assertEqual(os.listdir(self.snapshot_dir), [os.path.basename(graph_snapshot.snapshot_path(self.key))])
+
+    def test_not_stored_when_stopped(self):
+        chunks = graph_snapshot.iter_snapshot('people', self.version, self.today)
+        next(chunks)
+        chunks.close()
+        self.assertIsNone(graph_snapshot.open_snapshot(self.key))
+        self.assertEqual(os.listdir(self.snapshot_dir), [])
+
+    def test_waits_for_build_elsewhere(self):
+        self.assertTrue(graph_snapshot.lock(self.key))
+
+        def finish_build():
+            time.sleep(0.2)
+            with open(graph_snapshot.snapshot_path(self.key), 'wb') as file:
+                file.write(b'[]')
+            graph_snapshot.unlock(self.key)
+
+        thread = threading.Thread(target=finish_build)
+        thread.start()
+        with self.assertNumQueries(0):
+            self.assertEqual(graph_snapshot.get('people', self.version, self.today), b'[]')
+        thread.join()
+
+    def test_build_elsewhere_times_out(self):
+        self.assertTrue(graph_snapshot.lock(self.key))
+        with mock.patch.object(graph_snapshot, 'SNAPSHOT_BUILD_TIMEOUT', 0.2):
+            self.assertEqual(graph_snapshot.get('people', self.version, self.today), b''.join(build_people_snapshot()))
+        self.assertIsNone(graph_snapshot.open_snapshot(self.key))
+
+        # The lock of a build that has taken too long is broken by the next miss
+        os.utime(graph_snapshot.lock_path(self.key), (0, 0))
+        self.assertTrue(graph_snapshot.lock(self.key))
+
+    def test_prune(self):
+        for day in range(3):
+            graph_snapshot.get('people', self.version, self.today + datetime.timedelta(days=day))
+        with override_settings(GRAPH_SNAPSHOT_MAX_ENTRIES=2):
+            graph_snapshot.get('people', self.version, self.today + datetime.timedelta(days=3))
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 2)
+
+    def test_revalidated_the_next_day(self):
+        self.client.force_login(self.alice)
+        with translation.override('en'):
+            url = reverse('graph_people')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        with mock.patch('people.utils.graph_snapshot.timezone.localdate', return_value=tomorrow):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ColumnarSnapshotTestCase(TemporarySnapshotDirMixin, GraphDataTestCase):
+    @staticmethod
+    def encode_date(value):
+        if value is None:
+            return None, 0
+        date = parse(f'{value["year"]:04}-{value["month"]:02}-{value["day"]:02}')
+        return to_epoch_day(date), get_precision(date)
+
+    @staticmethod
+    def rows(table, start=0, stop=None):
+        columns = list(table)
+        return [dict(zip(columns, values)) for values in zip(*table.values())][start:stop]
+
+    def test_matches_row_serializers(self):
+        payload = json.loads(b''.join(build_columnar_snapshot()))
+        people = serialize_people(Person.qs.for_graph_serialization())
+        relationships = serialize_relationships(
+            Relationship.objects.for_graph_serialization(Person.qs.for_graph_serialization())
+        )
+
+        nodes = self.rows(payload['nodes'])
+        groups = self.rows(payload['groups'])
+        self.assertEqual(len(nodes), len(people))
+        self.assertEqual(len(groups), 2)
+        for index, (node, person) in enumerate(zip(nodes, people)):
+            self.assertEqual(node['id'], person['id'])
+            self.assertEqual(node['firstName'], person['firstName'])
+            self.assertEqual(node['nickname'], person['nickname'])
+            self.assertEqual((node['birthDate'], node['birthDatePrecision']), self.encode_date(person['birthDate']))
+            self.assertEqual((node['deathDate'], node['deathDatePrecision']), self.encode_date(person['deathDate']))
+            offsets = payload['nodes']['membershipOffsets']
+            memberships = self.rows(payload['memberships'], offsets[index], offsets[index + 1])
+            self.assertEqual(
+                [(groups[membership['group']]['id'], membership['dateStarted'], membership['dateStartedPrecision'])
+                 for membership in memberships],
+                [(membership['groupId'], *self.encode_date(membership['dateStarted']))
+                 for membership in person['memberships']]
+            )
+
+        offsets = payload['edges']['statusOffsets']
+        edges = self.rows(payload['edges'])
+        self.assertEqual(len(edges), len(relationships))
+        for index, (edge, relationship) in enumerate(zip(edges, relationships)):
+            self.assertEqual(nodes[edge['source']]['id'], relationship['source'])
+            self.assertEqual(nodes[edge['target']]['id'], relationship['target'])
+            statuses = self.rows(payload['statuses'], offsets[index], offsets[index + 1])
+            self.assertEqual(
+                [(status['status'], status['dateStart'], status['dateEnd']) for status in statuses],
+                [(status['status'], self.encode_date(status['dateStart'])[0], self.encode_date(status['dateEnd'])[0])
+                 for status in relationship['statuses']]
+            )
+
+    def test_endpoint(self):
+        self.client.force_login(self.alice)
+        with translation.override('en'):
+            columnar_url, people_url = reverse('graph_columnar'), reverse('graph_people')
+        response = self.client.get(columnar_url)
+        self.assertEqual(response['Content-Type'], graph_snapshot.COLUMNAR_MEDIA_TYPE)
+        self.assertEqual(b''.join(response.streaming_content), b''.join(build_columnar_snapshot()))
+
+        # The whole graph is only served by its own endpoint, never in place of the people
+        self.assertEqual(self.client.get(people_url, HTTP_ACCEPT=graph_snapshot.COLUMNAR_MEDIA_TYPE).status_code, 406)
+        self.assertIsInstance(json.loads(b''.join(self.client.get(people_url).streaming_content)), list)
+
+
+
+class TimeTravelTestCase(TemporarySnapshotDirMixin, GraphDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = GraphIndex.build()
+
+    def people_at(self, at):
+        return {person['id']: person for person in iter_people_at(self.index, at)}
+
+    def relationships_at(self, at):
+        return {(relationship['source'], relationship['target']): relationship
+                for relationship in iter_relationships_at(self.index, at)}
+
+    def test_people(self):
+        people = self.people_at(datetime.date(1989, 12, 31))
+        self.assertEqual(set(people), {self.bob.pk, self.carol.pk})
+        self.assertIsNone(people[self.carol.pk]['deathDate'])
+        self.assertEqual(people[self.carol.pk]['age']['years'], 59)
+
+        alice = self.people_at(datetime.date(2006, 1, 1))[self.alice.pk]
+        self.assertEqual(len(alice['memberships']), 2)
+        self.assertIsNone(alice['memberships'][0]['dateEnded'])
+        self.assertEqual(alice['memberships'][0]['duration']['months'], 4)
+
+        self.assertEqual(
+            self.people_at(datetime.date(2020, 1, 1))[self.carol.pk]['deathDate'],
+            {'year': 2015, 'month': 3, 'day': 0}
+        )
+
+    def test_current_status(self):
+        couple = (self.alice.pk, self.bob.pk)
+        family = (self.carol.pk, self.alice.pk)
+
+        relationships = self.relationships_at(datetime.date(2007, 6, 1))
+        self.assertEqual(set(relationships), {family})
+
+        relationships = self.relationships_at(datetime.date(2010, 1, 1))
+        self.assertEqual(relationships[couple]['currentStatus']['status'], RelationshipStatus.StatusChoices.DATING)
+        self.assertFalse(relationships[couple]['currentStatus']['isEnded'])
+        self.assertIsNone(relationships[couple]['currentStatus']['dateEnd'])
+        self.assertEqual(len(relationships[couple]['statuses']), 1)
+
+        relationships = self.relationships_at(datetime.date(2016, 1, 1))
+        self.assertEqual(relationships[couple]['currentStatus']['status'], RelationshipStatus.StatusChoices.MARRIED)
+        self.assertEqual([status['status'] for status in relationships[couple]['statuses']], [
+            RelationshipStatus.StatusChoices.MARRIED, RelationshipStatus.StatusChoices.DATING
+        ])
+        self.assertTrue(relationships[family]['currentStatus']['isEnded'])
+
+    def test_matches_current_graph(self):
+        today = datetime.date.today()
+        relationships = serialize_relationships(
+            Relationship.objects.for_graph_serialization(Person.qs.for_graph_serialization())
+        )
+        relationships_at = list(iter_relationships_at(self.index, today))
+        for relationship in relationships_at:
+            del relationship['currentStatus']
+        self.assertEqual(relationships_at, relationships)
+
+    def test_index_labelled_with_its_own_version(self):
+        version = GraphDataVersion.objects.current()
+        # A write between the conditional GET and the build of its snapshot
+        GraphDataVersion.objects.bump()
+        with mock.patch.object(graph_index, '_index', None):
+            index = graph_index.get_graph_index(version)
+            self.assertEqual(index.version, version + 1)
+            # Requests still carrying the older version do not swap the index back
+            self.assertIs(graph_index.get_graph_index(version), index)
+            GraphDataVersion.objects.bump()
+            self.assertEqual(graph_index.get_graph_index(version + 2).version, version + 2)
+
+
+class GraphFilterTestCase(GraphDataTestCase):
+    def setUp(self):
+        self.index = GraphIndex.build()
+
+    def select(self, at, *disabled):
+        disabled = sum(graph_filter.filter_bit(name) for name in disabled)
+        nodes, edges = graph_filter.select(self.index, to_epoch_day(at), disabled)
+        return (
+            {self.index.people[node][0] for node in nodes},
+            {tuple(self.index.people[node][0] for node in self.index.edge_nodes[edge]) for edge in edges}
+        )
+
+    def test_seminars(self):
+        at = datetime.date(2016, 1, 1)
+        nodes, _ = self.select(at, 'isKSP')
+        self.assertEqual(nodes, {self.bob.pk, self.carol.pk})
+        nodes, _ = self.select(at, 'notTrojsten')
+        self.assertEqual(nodes, {self.alice.pk})
+
+    def test_relationships(self):
+        at = datetime.date(2016, 1, 1)
+        couple = (self.alice.pk, self.bob.pk)
+        family = (self.carol.pk, self.alice.pk)
+
+        self.assertEqual(self.select(at, 'isCurrentSerious')[1], {family})
+        self.assertEqual(self.select(at, 'isBloodBound')[1], {couple})
+        self.assertEqual(self.select(datetime.date(2010, 1, 1), 'isOldSerious')[1], {couple, family})
+        self.assertEqual(self.select(at, 'isKSP')[1], set())
+
+    def test_isolated(self):
+        at = datetime.date(2016, 1, 1)
+        self.assertEqual(self.select(at, 'isIsolated', 'isBloodBound'), ({self.alice.pk, self.bob.pk}, {
+            (self.alice.pk, self.bob.pk)
+        }))
+        self.assertEqual(self.select(at, 'isIsolated', 'isBloodBound', 'isCurrentSerious'), (set(), set()))
+
+
+class GraphChangesTestCase(TemporarySnapshotDirMixin, GraphDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.alice)
+        with translation.override('en'):
+            self.url = reverse('graph_changes')
+
+    def get_changes(self, since):
+        return self.client.get(self.url, {'since': since}).json()
+
+    def test_record(self):
+        version = GraphDataVersion.objects.current()
+        status = RelationshipStatus.objects.filter(status=RelationshipStatus.StatusChoices.MARRIED).get()
+        status.visible = False
+        status.save()
+        GroupMembership.objects.filter(person=self.bob).delete()
+
+        self.assertEqual(GraphDataVersion.objects.current(), version + 2)
+        self.assertEqual(list(GraphChange.objects.since(version).order_by('version').values_list(
+            'version', 'action', 'node', 'edge'
+        )), [
+            (version + 1, GraphChange.Actions.UPDATED, None, status.relationship_id),
+            (version + 2, GraphChange.Actions.DELETED, self.bob.pk, None),
+        ])
+
+    def test_bump_returns_own_version(self):
+        version = GraphDataVersion.objects.current()
+        self.assertEqual([GraphDataVersion.objects.bump() for _ in range(3)], [version + 1, version + 2, version + 3])
+
+    def test_delta(self):
+        version = GraphDataVersion.objects.current()
+        self.bob.nickname = 'bobby'
+        self.bob.save()
+        Relationship.objects.get(first_person=self.carol, second_person=self.alice).delete()
+
+        changes = self.get_changes(version)
+        self.assertEqual(changes['version'], GraphDataVersion.objects.current())
+        self.assertFalse(changes['full'])
+        self.assertEqual([person['nickname'] for person in changes['people']], ['bobby'])
+        # Bob's relationship with Alice is sent again with him, the one with his hidden sibling is not visible
+        self.assertEqual([relationship['source'] for relationship in changes['relationships']], [self.alice.pk])
+        self.assertEqual(len(changes['removedRelationships']), 2)
+        self.assertEqual(changes['removedPeople'], [])
+
+        self.assertEqual(self.get_changes(changes['version']), {
+            'version': changes['version'], 'full': False, 'people': [], 'removedPeople': [], 'relationships': [],
+            'removedRelationships': [],
+        })
+
+    def test_full_graph(self):
+        version = GraphDataVersion.objects.current()
+        for since in ('', 'yesterday', version + 1):
+            changes = self.get_changes(since)
+            self.assertTrue(changes['full'])
+            self.assertEqual({person['id'] for person in changes['people']}, {self.alice.pk, self.bob.pk, self.carol.pk})
+            self.assertEqual(len(changes['relationships']), 2)
+
+    def test_compact(self):
+        version = GraphDataVersion.objects.current()
+        GraphChange.objects.update(date_created=timezone.now() - datetime.timedelta(days=31))
+        self.bob.nickname = 'bobby'
+        self.bob.save()
+
+        out = io.StringIO()
+        call_command('compact_graph_changes', stdout=out)
+        self.assertIn(f'up to version {version}', out.getvalue())
+        self.assertEqual(GraphDataVersion.objects.compacted_version(), version)
+        self.assertEqual(list(GraphChange.objects.values_list('version', flat=True)), [version + 1])
+
+        self.assertTrue(self.get_changes(version - 1)['full'])
+        self.assertEqual([person['nickname'] for person in self.get_changes(version)['people']], ['bobby'])
+
+        out = io.StringIO()
+        call_command('compact_graph_changes', stdout=out)
+        self.assertEqual(out.getvalue(), 'Nothing to compact\n')
+
+
+class IntervalCoverageTestCase(SimpleTestCase):
+    def test_overlapping(self):
+        total = coverage([
+            (datetime.date(2010, 1, 1), datetime.date(2010, 3, 1)),
+            (datetime.date(2010, 2, 1), datetime.date(2010, 4, 1)),
+            (datetime.date(2011, 1, 1), datetime.date(2011, 1, 11)),
+        ])
+        self.assertEqual(total.days, 90 + 10)
+        self.assertEqual((total.relative.months, total.relative.days), (3, 10))
+        self.assertTrue(total.is_precise)
+
+    def test_imprecise(self):
+        total = coverage([(VariableDate(2010, 0, 0), VariableDate(2011, 6, 0))])
+        self.assertEqual(total.days, 365 + 151)
+        self.assertEqual(total.min_days, 1 + 151)
+        self.assertEqual(total.max_days, 365 + 180)
+        self.assertFalse(total.is_precise)
+
+    def test_imprecise_inside_precise(self):
+        total = coverage([
+            (datetime.date(2010, 1, 1), datetime.date(2012, 1, 1)),
+            (VariableDate(2010, 0, 0), VariableDate(2011, 0, 0)),
+        ])
+        self.assertEqual(total.days, 730)
+        self.assertTrue(total.is_precise)
+
+    def test_open_ended(self):
+        today = datetime.date(2020, 1, 11)
+        self.assertEqual(coverage([(datetime.date(2020, 1, 1), None)], today).days, 10)
+        self.assertEqual(coverage([], today).days, 0)
+
+
+class TimedeltasTestCase(SimpleTestCase):
+    def test_matches_timedelta(self):
+        dates = [
+            None, datetime.date(2000, 1, 31), datetime.date(2000, 2, 29), datetime.date(2001, 2, 28),
+            datetime.date(2001, 3, 31), datetime.date(2024, 12, 1), VariableDate(2000, 0, 0), VariableDate(2001, 2, 0),
+        ]
+        pairs = [(later, sooner) for later in dates for sooner in dates]
+        self.assertEqual(timedeltas(pairs), [timedelta(later, sooner) for later, sooner in pairs])
+
+
+class DateCompanionColumnsTestCase(GraphDataTestCase):
+    def test_generated_columns(self):
+        fields = ('date_start_earliest', 'date_start_latest', 'date_start_precision',
+                  'date_end_earliest', 'date_end_latest', 'date_end_precision')
+        for status in RelationshipStatus.objects.all():
+            self.assertEqual(
+                RelationshipStatus.objects.filter(pk=status.pk).values_list(*fields).get(),
+                tuple(getattr(status, field) for field in fields)
+            )
+        self.assertEqual(self.carol.death_date_latest, datetime.date(2015, 3, 31))
+        self.assertEqual(
+            Person.objects.filter(birth_date_latest=datetime.date(1990, 12, 31)).get(), self.alice
+        )
+
+    def test_for_date(self):
+        for date in (datetime.date(2007, 6, 1), datetime.date(2012, 1, 1), datetime.date(2015, 3, 1),
+                     datetime.date(2015, 3, 2), datetime.date(2022, 1, 1)):
+            day = to_epoch_day(date)
+            self.assertQuerysetEqual(
+                RelationshipStatus.objects.for_date(date).order_by('pk'),
+                [
+                    status for status in RelationshipStatus.objects.order_by('pk')
+                    if status.date_start is not None and to_epoch_day(status.date_start) <= day
+                    and (status.date_end is None or to_epoch_day(status.date_end) >= day)
+                ]
+            )
+
+    def test_active_ranges(self):
+        for model in (RelationshipStatus, GroupMembership):
+            for instance in model.objects.all():
+                self.assertEqual(model.objects.filter(pk=instance.pk).values_list('date_range', flat=True).get(),
+                                 instance.date_range)
+
+    def test_memberships_for_date(self):
+        self.assertEqual(GroupMembership.objects.for_date(datetime.date(2005, 8, 31)).count(), 1)
+        self.assertEqual(GroupMembership.objects.for_date(datetime.date(2009, 1, 1)).count(), 3)
+        self.assertEqual(GroupMembership.objects.for_date(datetime.date(2009, 1, 2)).count(), 2)
+
+    def test_unknown_start(self):
+        # Not known to have started, like the `date_start__lte` filters excluded them
+        relationship = Relationship.objects.create(first_person=self.carol, second_person=self.hidden)
+        status = RelationshipStatus.objects.create(relationship=relationship,
+                                                   status=RelationshipStatus.StatusChoices.DATING)
+        membership = GroupMembership.objects.create(person=self.carol, group=Group.objects.get(name='KSP'))
+        self.test_active_ranges()
+
+        self.assertNotIn(status, RelationshipStatus.objects.current())
+        self.assertNotIn(membership, GroupMembership.objects.current())
+        self.assertIn(self.carol, Person.qs.single())
+        self.assertNotIn(self.carol, Person.qs.in_romantic_relationship())
+        self.assertNotIn(self.carol, Person.qs.has_relationship_status([RelationshipStatus.StatusChoices.DATING]))
+
+
+class GraphEdgeViewTestCase(GraphDataTestCase):
+    def live_edges(self):
+        return list(iter_edges(Relationship.objects.for_graph_serialization(Person.qs.for_graph_serialization())))
+
+    def test_matches_live_edges(self):
+        # Visible and confirmed, but by different statuses
+        split = Relationship.objects.create(first_person=self.bob, second_person=self.carol)
+        RelationshipStatus.objects.create(relationship=split, status=RelationshipStatus.StatusChoices.RUMOUR,
+                                          confirmed_by=RelationshipStatus.ConfirmationBy.FIRST, visible=True)
+        RelationshipStatus.objects.create(relationship=split, status=RelationshipStatus.StatusChoices.DATING,
+                                          confirmed_by=RelationshipStatus.ConfirmationBy.BOTH, visible=False)
+        GraphEdgeStatus.objects.refresh()
+
+        edges = list(iter_view_edges())
+        self.assertEqual(edges, self.live_edges())
+        self.assertIn((split.pk, self.bob.pk, self.carol.pk, []), edges)
+
+    def test_stale_view(self):
+        GraphEdgeStatus.objects.refresh()
+        version = GraphDataVersion.objects.current()
+        self.assertEqual(GraphEdgeStatus.objects.view_version(), version)
+
+        status = RelationshipStatus.objects.get(status=RelationshipStatus.StatusChoices.MARRIED)
+        status.visible = False
+        status.save()
+        self.assertNotEqual(list(iter_view_edges()), self.live_edges())
+        self.assertEqual(list(iter_graph_edges()), self.live_edges())
+
+    def test_refresh_if_stale(self):
+        GraphEdgeStatus.objects.refresh()
+        self.assertFalse(GraphEdgeStatus.objects.refresh_if_stale())
+
+        # Saves leave the refresh to the watcher, bulk changes make the view stale as well
+        with self.captureOnCommitCallbacks(execute=True):
+            RelationshipStatus.objects.filter(status=RelationshipStatus.StatusChoices.RUMOUR).get().delete()
+        self.assertNotEqual(GraphEdgeStatus.objects.view_version(), GraphDataVersion.objects.current())
+        version = GraphDataVersion.objects.current()
+        Relationship.objects.bulk_get_or_create_for_people([(self.carol, self.bob)])
+        self.assertGreater(GraphDataVersion.objects.current(), version)
+
+        self.assertTrue(GraphEdgeStatus.objects.refresh_if_stale())
+        self.assertEqual(GraphEdgeStatus.objects.view_version(), GraphDataVersion.objects.current())
+        self.assertEqual(list(iter_view_edges()), self.live_edges())
+        self.assertFalse(GraphEdgeStatus.objects.refresh_if_stale())
+
+
+class PersonPairTestCase(GraphDataTestCase):
+    def test_between(self):
+        relationship = Relationship.objects.get(first_person=self.alice, second_person=self.bob)
+        self.assertEqual(Relationship.objects.between(self.bob, self.alice).get(), relationship)
+        self.assertEqual(Relationship.objects.get_or_create_for_people(self.bob, self.alice), relationship)
+        self.assertFalse(Relationship.objects.between(self.bob, self.carol).exists())
+
+    def test_reversed_pair_is_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Relationship.objects.create(first_person=self.bob, second_person=self.alice)
+
+    def test_bulk_get_or_create(self):
+        existing = Relationship.objects.get(first_person=self.carol, second_person=self.alice)
+        relationships = Relationship.objects.bulk_get_or_create_for_people([
+            (self.alice, self.carol), (self.bob, self.carol), (self.carol.pk, self.bob.pk), (self.hidden, self.alice),
+        ])
+        self.assertEqual(relationships[0], existing)
+        self.assertEqual(relationships[1], relationships[2])
+        self.assertEqual((relationships[1].first_person_id, relationships[1].second_person_id),
+                         (self.bob.pk, self.carol.pk))
+        self.assertEqual(Relationship.objects.between(self.alice, self.hidden).get(), relationships[3])
+        self.assertEqual(Relationship.objects.count(), 5)
+
+
+class PersonPairMigrationTestCase(TransactionTestCase):
+    def migrate(self, target=None):
+        executor = MigrationExecutor(connection)
+        targets = [('people', target)] if target else executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate()
+        super().tearDown()
+
+    def test_reversed_pairs_merged(self):
+        apps = self.migrate('0013_graphedgestatus')
+        person_model = apps.get_model('people', 'Person')
+        relationship_model = apps.get_model('people', 'Relationship')
+        status_model = apps.get_model('people', 'RelationshipStatus')
+        apps.get_model('people', 'GraphDataVersion').objects.update_or_create(pk=1, defaults={'version': 5})
+
+        alice = person_model.objects.create(email='alice@example.com', first_name='Alica', last_name='Nováková')
+        bob = person_model.objects.create(email='bob@example.com', first_name='Bob', last_name='Veľký')
+        kept = relationship_model.objects.create(first_person=alice, second_person=bob)
+        duplicate = relationship_model.objects.create(first_person=bob, second_person=alice)
+        status_model.objects.create(relationship=kept, status=RelationshipStatus.StatusChoices.DATING)
+        moved = status_model.objects.create(relationship=duplicate, status=RelationshipStatus.StatusChoices.MARRIED)
+        apps.get_model('people', 'RelationshipStatusNote').objects.create(status=moved, text='Svadba', type=1, reason=3)
+
+        apps = self.migrate('0014_relationship_person_pair')
+        self.assertEqual(list(apps.get_model('people', 'Relationship').objects.values_list('pk', flat=True)),
+                         [kept.pk])
+        self.assertEqual(
+            sorted(apps.get_model('people', 'RelationshipStatus').objects.values_list('relationship', 'status')),
+            [(kept.pk, RelationshipStatus.StatusChoices.MARRIED), (kept.pk, RelationshipStatus.StatusChoices.DATING)]
+        )
+        self.assertEqual(apps.get_model('people', 'RelationshipStatusNote').objects.get().status_id, moved.pk)
+        self.assertEqual(
+            sorted(apps.get_model('people', 'GraphChange').objects.values_list('version', 'action', 'edge')),
+            [(6, GraphChange.Actions.UPDATED, kept.pk), (6, GraphChange.Actions.DELETED, duplicate.pk)]
+        )
+
+
+class PersonStatusFlagsTestCase(GraphDataTestCase):
+    def assertFlagsMatch(self):
+        people = Person.qs.order_by('pk')
+        for status in RelationshipStatus.StatusChoices.values:
+            self.assertEqual(list(people.filter(status_flags__current_statuses__contains=[status])),
+                             list(people.has_relationship_status([status])))
+        self.assertEqual(list(people.filter(status_flags__romantic=False)), list(people.single()))
+        self.assertEqual(list(people.filter(status_flags__romantic=True)), list(people.in_romantic_relationship()))
+        for group in Group.objects.all():
+            self.assertEqual(list(people.filter(status_flags__group_ids__contains=[group.pk])),
+                             list(people.filter(memberships__group=group)))
+
+    def test_matches_live_filters(self):
+        PersonStatusFlags.objects.refresh()
+        self.assertEqual(PersonStatusFlags.objects.count(), Person.objects.count())
+        self.assertEqual(PersonStatusFlags.objects.get(person=self.alice).current_statuses, [
+            RelationshipStatus.StatusChoices.MARRIED, RelationshipStatus.StatusChoices.RUMOUR
+        ])
+        self.assertFlagsMatch()
+
+    def test_refresh_on_graph_change(self):
+        PersonStatusFlags.objects.refresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            RelationshipStatus.objects.filter(status=RelationshipStatus.StatusChoices.MARRIED).delete()
+            dave = Person.objects.create(first_name='Dave', last_name='Nový', visible=True)
+            GroupMembership.objects.create(person=dave, group=Group.objects.get(name='KSP'))
+        self.assertFalse(PersonStatusFlags.objects.get(person=self.bob).romantic)
+        self.assertFlagsMatch()
+
+    def test_refresh_of_some_people(self):
+        PersonStatusFlags.objects.refresh()
+        PersonStatusFlags.objects.update(romantic=False, current_statuses=[])
+        PersonStatusFlags.objects.refresh([self.alice.pk])
+        self.assertTrue(PersonStatusFlags.objects.get(person=self.alice).romantic)
+        self.assertFalse(PersonStatusFlags.objects.get(person=self.bob).romantic)
+
+    def test_daily_refresh(self):
+        PersonStatusFlags.objects.refresh()
+        PersonStatusFlags.objects.update(date=F('date') - datetime.timedelta(days=1))
+        call_command('refresh_person_status_flags', stdout=io.StringIO())
+        self.assertEqual(PersonStatusFlags.objects.refreshed_at(),
+                         (GraphDataVersion.objects.current(), timezone.localdate()))
+
+    def test_admin_filters(self):
+        PersonStatusFlags.objects.refresh()
+        admin = Person.objects.create_superuser(email='admin@example.com', password='admin')
+
+        def filtered(**params):
+            request = RequestFactory().get('/admin/people/person/', params)
+            request.user = admin
+            with CaptureQueriesContext(connection) as queries:
+                people = set(PersonAdmin(Person, admin_site).get_changelist_instance(request).get_queryset(request))
+            # The flags are only read
+            self.assertFalse([query for query in queries if PersonStatusFlags._meta.db_table in query['sql']
+                              and not query['sql'].startswith('SELECT')])
+            return people
+
+        self.assertEqual(filtered(dating_status='romantic', current_status='4'), {self.alice, self.bob})
+        self.assertEqual(filtered(group=Group.objects.get(name='KSP').pk), {self.alice, self.bob})
+        self.assertEqual(filtered(current_status='married'), set())
+
+
+class AdjacencyTestCase(GraphDataTestCase):
+    def test_matches_relationships(self):
+        adjacency = Adjacency.build(0)
+        for person in Person.objects.all():
+            relationships = Relationship.objects.filter(Q(first_person=person) | Q(second_person=person))
+            self.assertEqual(sorted(adjacency.relationship_ids(person.pk)),
+                             sorted(relationships.values_list('pk', flat=True)))
+            self.assertEqual(
+                sorted(adjacency.neighbor_ids(person.pk, RelationshipStatus.StatusChoices.SIBLING)),
+                sorted(
+                    relationship.second_person_id if relationship.first_person_id == person.pk
+                    else relationship.first_person_id
+                    for relationship in relationships.filter(statuses__status=RelationshipStatus.StatusChoices.SIBLING)
+                )
+            )
+
+    def test_unrelated_person(self):
+        loner = Person.objects.create(first_name='Lone', last_name='Wolf')
+        adjacency = Adjacency.build(0)
+        self.assertEqual(adjacency.neighbor_ids(loner.pk), [])
+        self.assertEqual(sorted(adjacency.neighbor_ids(self.alice.pk)), sorted([self.bob.pk, self.carol.pk]))
+
+
+class DateDecodingTestCase(SimpleTestCase):
+    def test_matches_parse(self):
+        for value in ('2015-00-00', '2015-09-00', '2016-02-29', '1989-05-17', '0000-00-00'):
+            self.assertEqual(decode(value), parse(value))
+            self.assertIs(decode(value), decode(value))
+
+    def test_invalid(self):
+        for value in ('2015-02-30', '2015-00-04', '2015-1-01', '2015/01/01', '２０１５-01-01x'):
+            with self.assertRaises(ValidationError):
+                parse(value)
+            with self.assertRaises(ValidationError):
+                decode(value)
+
+    def test_ordinal(self):
+        self.assertEqual(VariableDate(2015, 9, 0).ordinal, datetime.date(2015, 9, 1).toordinal())
+        self.assertEqual(VariableDate(2015, 0, 0), VariableDate(2015, 0, 0))
+        self.assertIsNone(VariableDate(0, 0, 0).ordinal)
+
+
+class ReadReceiptBufferTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = Person.objects.create(first_name='Alice', last_name='Smith')
+        cls.read_already = Person.objects.create(
+            first_name='Bob', last_name='Smith', apology_status=Person.ApologyStatus.READ
+        )
+        cls.tokens = [
+            Token.objects.create(user=person, type=Token.Types.AUTH, token=Token.get_random_token())
+            for person in (cls.reader, cls.read_already)
+        ]
+
+    def test_flush_coalesces_receipts(self):
+        buffer = ReadReceiptBuffer(max_size=10, interval=None)
+        version = GraphDataVersion.objects.current()
+        with self.assertNumQueries(0):
+            for token in (*self.tokens, self.tokens[0], Token.get_random_token()):
+                buffer.record(token.token if isinstance(token, Token) else token)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 1)
+        self.reader.refresh_from_db()
+        self.assertEqual(self.reader.apology_status, Person.ApologyStatus.READ)
+        self.assertEqual(GraphDataVersion.objects.current(), version)
+        with self.assertNumQueries(0):
+            self.assertEqual(buffer.flush(), 0)
+
+
+class ApologyMailTestCase(GraphDataTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for email in ('carol@example.com', 'carol@example.org'):
+            ContactEmail.objects.create(person=cls.carol, email=email, supplier_name='Alica', sure_its_active=False)
+        ManagementAuthority.objects.create(manager=cls.alice, subject=cls.carol)
+
+    def construct(self):
+        with CaptureQueriesContext(connection) as queries:
+            mails = Person.qs.order_by('pk').construct_apology_mails()
+        return mails, len(queries)
+
+    def test_mails(self):
+        mails, _ = self.construct()
+        self.assertEqual([recipients for *_, recipients in mails],
+                         [['alice@example.com'], ['bob@example.com'], ['carol@example.com', 'carol@example.org']])
+        self.assertEqual(Token.objects.filter(type=Token.Types.AUTH).count(), 3)
+
+        _, _, html, _, _ = mails[0]
+        token = Token.objects.get(user=self.alice)
+        self.assertIn(f'auth_token={token.token}&user_override={self.carol.pk}', html)
+        self.assertIn('Vzťah s Bob Veľký', html)
+        self.assertIn('Vzťah s Carol Stará', html)
+
+    def test_constant_queries(self):
+        _, queries = self.construct()
+        for i in range(3):
+            person = Person.objects.create(first_name='New', last_name=str(i), email=f'new{i}@example.com')
+            Relationship.objects.create(first_person=person, second_person=self.alice)
+        mails, more_queries = self.construct()
+        self.assertEqual(len(mails), 6)
+        self.assertEqual(more_queries, queries)
+
+    def test_parallel_rendering(self):
+        def without_tokens(mails):
+            pattern = re.compile('|'.join(Token.objects.values_list('token', flat=True)))
+            return [
+                (subject, pattern.sub('', text), pattern.sub('', html), recipients)
+                for subject, text, html, _, recipients in mails
+            ]
+
+        people = Person.qs.order_by('pk')
+        parallel = list(iter_apology_mails(people, chunk_size=1, processes=2))
+        self.assertEqual(len(parallel), 3)
+        self.assertEqual(without_tokens(parallel), without_tokens(people.construct_apology_mails()))
+        # The tokens minted for the first mails are reused
+        self.assertEqual(Token.objects.filter(type=Token.Types.AUTH).count(), 3)
+
+    def test_streamed_sending(self):
+        done = []
+        mails, _ = self.construct()
+        self.assertEqual(send_mass_html_mail(iter(mails), batch_size=2, progress=done.append), 3)
+        self.assertEqual(done, [2, 3])
+        self.assertEqual([message.to for message in mail.outbox], [recipients for *_, recipients in mails])
+
+    def test_command_marks_each_chunk(self):
+        enqueue = Outbox.objects.enqueue_mass_html
+        chunks = []
+
+        def fail_on_second_chunk(mails):
+            chunks.append(mails)
+            if len(chunks) == 2:
+                raise RuntimeError('Outbox unavailable')
+            return enqueue(mails)
+
+        with mock.patch.object(Outbox.objects, 'enqueue_mass_html', side_effect=fail_on_second_chunk), \
+                self.assertRaises(RuntimeError):
+            call_command('send_apology_mails', chunk_size=1, processes=1, stdout=io.StringIO())
+        self.assertEqual(list(Person.qs.filter(apology_status=Person.ApologyStatus.SENT)), [self.alice])
+        self.assertEqual(Outbox.objects.count(), 1)
+
+        # The rerun picks up where the failed one stopped, the unreachable person is left for later
+        call_command('send_apology_mails', chunk_size=1, processes=1, stdout=io.StringIO())
+        self.assertEqual(Outbox.objects.count(), 3)
+        self.assertEqual(list(Person.qs.filter(apology_status=Person.ApologyStatus.UNSENT)), [self.hidden])
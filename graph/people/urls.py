@@ -11,17 +11,22 @@ from .views.other import email_read
 from .views.graph import GraphView, GraphDataView, GraphViewV2
 from .views.graph_v2.user_info import PersonalInfoView
 from .views.graph_v2.relationships import RelationshipView
+from .views.graph_v2.changes import GraphChangesView
+from .views.graph_v2.columnar import ColumnarGraphView
 from .views.graph_v2.people import PeopleView
 from .views.contact_gathering import EmailGatheringView
+from .utils.graph_snapshot import graph_data_condition
 
 urlpatterns = [
     re_path(r'^$', login_required(GraphView.as_view()), name='graph'),
-    re_path(r'^graph-data/$', login_required(GraphDataView.as_view()), name='graph_data'),
+    re_path(r'^graph-data/$', login_required(graph_data_condition(GraphDataView.as_view())), name='graph_data'),
 
     re_path(r'^v2/$', login_required(GraphViewV2.as_view()), name='graphV2'),
-    re_path(r'people/$', login_required(PeopleView.as_view()), name='graph_people'),
-    re_path(r'relationships/$', login_required(RelationshipView.as_view()), name='graph_relationships'),
-    re_path(r'groups/$', login_required(get_groups), name='groups'),
+    re_path(r'people/$', login_required(graph_data_condition(PeopleView.as_view())), name='graph_people'),
+    re_path(r'relationships/$', login_required(graph_data_condition(RelationshipView.as_view())), name='graph_relationships'),
+    re_path(r'columnar/$', login_required(graph_data_condition(ColumnarGraphView.as_view())), name='graph_columnar'),
+    re_path(r'changes/$', login_required(graph_data_condition(GraphChangesView.as_view())), name='graph_changes'),
+    re_path(r'groups/$', login_required(graph_data_condition(get_groups)), name='groups'),
 
     re_path(r'user/info/$', login_required(PersonalInfoView.as_view()), name='user_info'),
     re_path(r'user/group-memberships/$', login_required(UserGroupsView.as_view()), name='user_groups'),
@@ -0,0 +1,101 @@
+"""
+Compressed sparse row adjacency of all relationships, regardless of their visibility, for neighbourhood queries
+answered in O(degree) without a database query. The neighbours of the person at row i take the slots
+`offsets[i]:offsets[i + 1]` of `neighbors`, `relationships` and `status_masks`.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from typing import List, Optional
+
+from people.utils.json_stream import ITERATOR_CHUNK_SIZE
+
+
+def status_bit(status: int) -> int:
+    return 1 << status
+
+
+class Adjacency:
+    def __init__(self, version: int):
+        self.version = version
+
+        # Ids of the people with a relationship, ascending, and the first slot of every one of them
+        self.person_ids = array('l')
+        self.offsets = array('l', [0])
+        # Per slot the neighbour's id, the relationship's id and the `status_bit`s of all of its statuses
+        self.neighbors = array('l')
+        self.relationships = array('l')
+        self.status_masks = array('H')
+
+    @classmethod
+    def build(cls, version: int) -> 'Adjacency':
+        from people.models import Relationship, RelationshipStatus
+
+        adjacency = cls(version)
+
+        status_masks = {}
+        for relationship_id, status in RelationshipStatus.objects.order_by().values_list(
+                'relationship_id', 'status').distinct().iterator(ITERATOR_CHUNK_SIZE):
+            status_masks[relationship_id] = status_masks.get(relationship_id, 0) | status_bit(status)
+
+        slots = []
+        for pk, first_person_id, second_person_id in Relationship.objects.order_by().values_list(
+                'id', 'first_person_id', 'second_person_id').iterator(ITERATOR_CHUNK_SIZE):
+            slots.append((first_person_id, second_person_id, pk))
+            slots.append((second_person_id, first_person_id, pk))
+        slots.sort()
+
+        for person_id, neighbor_id, pk in slots:
+            if not adjacency.person_ids or adjacency.person_ids[-1] != person_id:
+                if adjacency.person_ids:
+                    adjacency.offsets.append(len(adjacency.neighbors))
+                adjacency.person_ids.append(person_id)
+            adjacency.neighbors.append(neighbor_id)
+            adjacency.relationships.append(pk)
+            adjacency.status_masks.append(status_masks.get(pk, 0))
+        if adjacency.person_ids:
+            adjacency.offsets.append(len(adjacency.neighbors))
+
+        return adjacency
+
+    def slots(self, person_id: int) -> range:
+        row = bisect_left(self.person_ids, person_id)
+        if row == len(self.person_ids) or self.person_ids[row] != person_id:
+            return range(0)
+        return range(self.offsets[row], self.offsets[row + 1])
+
+    def neighbor_ids(self, person_id: int, status: Optional[int] = None) -> List[int]:
+        """
+        Ids of the people related to the person, only by a relationship that has ever had the given status if any.
+        """
+        if status is None:
+            return [self.neighbors[slot] for slot in self.slots(person_id)]
+        bit = status_bit(status)
+        return [self.neighbors[slot] for slot in self.slots(person_id) if self.status_masks[slot] & bit]
+
+    def relationship_ids(self, person_id: int) -> List[int]:
+        return [self.relationships[slot] for slot in self.slots(person_id)]
+
+
+_adjacency: Optional[Adjacency] = None
+_adjacency_lock = threading.Lock()
+
+
+def get_adjacency(version: Optional[int] = None) -> Adjacency:
+    """
+    Returns the adjacency of the given (by default current) graph data version, rebuilding it when the graph changed
+    since the last call in this process.
+    """
+    global _adjacency
+    if version is None:
+        from people.utils.graph_snapshot import get_data_version
+        version = get_data_version()
+
+    adjacency = _adjacency
+    if adjacency is not None and adjacency.version == version:
+        return adjacency
+
+    with _adjacency_lock:
+        if _adjacency is None or _adjacency.version != version:
+            _adjacency = Adjacency.build(version)
+        return _adjacency
@@ -0,0 +1,68 @@
+"""
+Streaming construction of apology mails for large campaigns. People are fetched and their tokens minted chunk by
+chunk in this process, the mails are rendered by a pool of forked processes that compile the template once each. At
+most one chunk per process plus one are held at a time, however many people there are.
+
+The rendering processes never touch the database, they get the plain template contexts of the people.
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from django.template.loader import get_template
+
+from people.models import APOLOGY_MAIL_TEMPLATE, Person, PersonQuerySet, render_apology_mail
+
+APOLOGY_CHUNK_SIZE = 100
+
+_template = None
+
+
+def compile_template():
+    global _template
+    _template = get_template(APOLOGY_MAIL_TEMPLATE)
+
+
+def render_chunk(chunk: List[Tuple[dict, List[str]]]) -> List[tuple]:
+    return [render_apology_mail(context, recipients, _template) for context, recipients in chunk]
+
+
+def iter_chunks(people: PersonQuerySet, chunk_size: int) -> Iterator[Tuple[List[int], List[Tuple[dict, List[str]]]]]:
+    pks = iter(people.values_list('pk', flat=True))
+    while chunk_pks := list(islice(pks, chunk_size)):
+        prepared = Person.qs.filter(pk__in=chunk_pks).order_by('pk').prepare_apology_mails()
+        yield [person.pk for person, _ in prepared], [
+            (person.get_apology_mail_context(token), person.get_apology_mail_recipients()) for person, token in prepared
+        ]
+
+
+def iter_apology_mail_chunks(people: PersonQuerySet, chunk_size: int = APOLOGY_CHUNK_SIZE,
+                             processes: Optional[int] = None) -> Iterator[Tuple[List[int], List[tuple]]]:
+    """
+    Yields the mail tuples of `PersonQuerySet.construct_apology_mails` rendered in parallel, a chunk at a time, along
+    with the pks of the people they are for. People that cannot be reached are left out of both.
+    """
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork'),
+                             initializer=compile_template) as pool:
+        rendering = deque()
+        for chunk_pks, chunk in iter_chunks(people, chunk_size):
+            rendering.append((chunk_pks, pool.submit(render_chunk, chunk)))
+            if len(rendering) > processes:
+                chunk_pks, mails = rendering.popleft()
+                yield chunk_pks, mails.result()
+        while rendering:
+            chunk_pks, mails = rendering.popleft()
+            yield chunk_pks, mails.result()
+
+
+def iter_apology_mails(people: PersonQuerySet, chunk_size: int = APOLOGY_CHUNK_SIZE,
+                       processes: Optional[int] = None) -> Iterator[tuple]:
+    """
+    Yields the mail tuples of `PersonQuerySet.construct_apology_mails`, rendered in parallel.
+    """
+    for _, mails in iter_apology_mail_chunks(people, chunk_size, processes):
+        yield from mails
@@ -0,0 +1,171 @@
+import math
+import threading
+from bisect import bisect_right
+from enum import IntFlag
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from people.utils.json_stream import ITERATOR_CHUNK_SIZE
+from people.utils.variable_res_date import to_epoch_day
+
+
+# Groups told apart by the graph filters, bit i of a seminar mask stands for SEMINARS[i]
+SEMINARS = ('KSP', 'KMS', 'FKS')
+
+
+class StatusClass(IntFlag):
+    SERIOUS = 1
+    BLOOD = 2
+    RUMOUR = 4
+
+
+def get_status_class(status: int) -> StatusClass:
+    from people.models import RelationshipStatus
+    choices = RelationshipStatus.StatusChoices
+    if status in (choices.DATING, choices.ENGAGED, choices.MARRIED):
+        return StatusClass.SERIOUS
+    if status in (choices.BLOOD_RELATIVE, choices.SIBLING, choices.PARENT_CHILD):
+        return StatusClass.BLOOD
+    return StatusClass.RUMOUR
+
+
+class GraphIndex:
+    """
+    In-memory copy of the visible graph for one graph data version, laid out for queries that would otherwise
+    need a scan of the whole graph. Nodes and edges are addressed by their position, ordered by primary key.
+    """
+
+    def __init__(self, version: int):
+        self.version = version
+
+        # Rows in the order of `row_serializers.PERSON_FIELDS`
+        self.people: List[tuple] = []
+        self.node_indices: Dict[int, int] = {}
+        self.birth_days: List[Optional[int]] = []
+        # Rows in the order of `row_serializers.MEMBERSHIP_FIELDS`, most recent first
+        self.memberships: List[List[tuple]] = []
+        # Seminars each person has been a visible member of, and the first day of every such membership
+        self.seminar_masks: List[int] = []
+        self.seminar_starts: List[List[float]] = []
+
+        self.edge_ids: List[int] = []
+        self.edge_nodes: List[Tuple[int, int]] = []
+        # Interval index of the statuses of every edge: rows in the order of `row_serializers.STATUS_FIELDS`
+        # sorted by their start, and the start as an epoch day to bisect on. Statuses with an unknown start
+        # are taken as the earliest ones.
+        self.statuses: List[List[tuple]] = []
+        self.status_starts: List[List[float]] = []
+        self.status_ends: List[List[Optional[int]]] = []
+        # Class of every status of the edge, and of all of them combined
+        self.status_classes: List[List[StatusClass]] = []
+        self.edge_classes: List[StatusClass] = []
+
+    @classmethod
+    def build(cls) -> 'GraphIndex':
+        """
+        Builds the index of the current graph data version. The version is read from the same snapshot of the
+        database as the data, so that the index never holds changes made after the version it is labelled with.
+        """
+        from people.models import GraphDataVersion, GroupMembership, Person
+        from people.views.graph_v2.row_serializers import MEMBERSHIP_FIELDS, PERSON_FIELDS, iter_graph_edges
+
+        outermost = not connection.in_atomic_block
+        with transaction.atomic():
+            if outermost:
+                # Every read of the transaction sees the database as of the first one
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            index = cls(GraphDataVersion.objects.current())
+            people = Person.qs.for_graph_serialization().prefetch_related(None)
+            for row in people.values_list(*PERSON_FIELDS).iterator(ITERATOR_CHUNK_SIZE):
+                index.node_indices[row[0]] = len(index.people)
+                index.people.append(row)
+                index.birth_days.append(to_epoch_day(row[6]))
+                index.memberships.append([])
+                index.seminar_masks.append(0)
+                index.seminar_starts.append([math.inf] * len(SEMINARS))
+
+            memberships = GroupMembership.objects.filter(visible=True, person__in=people.values('pk')).order_by(
+                'person_id', '-date_started', 'pk'
+            )
+            for row in memberships.values_list(*MEMBERSHIP_FIELDS).iterator(ITERATOR_CHUNK_SIZE):
+                if row[0] in index.node_indices:
+                    node = index.node_indices[row[0]]
+                    index.memberships[node].append(row)
+                    if row[3] in SEMINARS:
+                        seminar = SEMINARS.index(row[3])
+                        start = -math.inf if row[1] is None else to_epoch_day(row[1])
+                        index.seminar_masks[node] |= 1 << seminar
+                        index.seminar_starts[node][seminar] = min(index.seminar_starts[node][seminar], start)
+
+            for pk, source, target, statuses in iter_graph_edges(index.version):
+                if source not in index.node_indices or target not in index.node_indices:
+                    continue
+                index.edge_ids.append(pk)
+                index.edge_nodes.append((index.node_indices[source], index.node_indices[target]))
+                # Oldest first, the statuses without a start before all the others
+                statuses.reverse()
+                statuses.sort(key=lambda row: row[2] is not None)
+                index.statuses.append(statuses)
+                index.status_starts.append([
+                    -math.inf if row[2] is None else to_epoch_day(row[2]) for row in statuses
+                ])
+                index.status_ends.append([to_epoch_day(row[3]) for row in statuses])
+                status_classes = [get_status_class(row[1]) for row in statuses]
+                index.status_classes.append(status_classes)
+                edge_class = StatusClass(0)
+                for status_class in status_classes:
+                    edge_class |= status_class
+                index.edge_classes.append(edge_class)
+
+        return index
+
+    def count_started_by(self, edge: int, day: int) -> int:
+        return bisect_right(self.status_starts[edge], day)
+
+    def statuses_started_by(self, edge: int, day: int) -> List[tuple]:
+        """
+        Statuses of the edge that started on or before the epoch day, the most recent one last.
+        """
+        return self.statuses[edge][:self.count_started_by(edge, day)]
+
+    def seminar_mask_by(self, node: int, day: int) -> int:
+        mask = self.seminar_masks[node]
+        if mask:
+            for seminar, start in enumerate(self.seminar_starts[node]):
+                if start > day:
+                    mask &= ~(1 << seminar)
+        return mask
+
+    def is_ended_by(self, edge: int, status: int, day: int) -> bool:
+        end_day = self.status_ends[edge][status]
+        return end_day is not None and end_day < day
+
+    def is_born_by(self, node: int, day: int) -> bool:
+        birth_day = self.birth_days[node]
+        return birth_day is None or birth_day <= day
+
+
+_index: Optional[GraphIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_graph_index(version: Optional[int] = None) -> GraphIndex:
+    """
+    Returns the index of the given (by default current) graph data version, or of a newer one when the graph has
+    changed since. The index of this process is only ever replaced by a newer one.
+    """
+    global _index
+    if version is None:
+        from people.utils.graph_snapshot import get_data_version
+        version = get_data_version()
+
+    index = _index
+    if index is not None and index.version >= version:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.version < version:
+            _index = GraphIndex.build()
+        return _index
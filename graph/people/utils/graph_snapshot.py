@@ -0,0 +1,329 @@
+"""
+Serialized graph payloads, stored as files shared by all workers on the box. A snapshot is written chunk by chunk while
+it is streamed to the client that missed it and appears once complete, only one worker builds it at a time.
+"""
+import datetime
+import hashlib
+import os
+import tempfile
+import time
+from functools import partial, wraps
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.module_loading import import_string
+from django.views.decorators.http import condition
+
+# Bytes read from a stored snapshot at once
+SNAPSHOT_READ_SIZE = 64 * 1024
+# Seconds a worker waits for a snapshot being built by another, after which a build is presumed dead
+SNAPSHOT_BUILD_TIMEOUT = 60
+SNAPSHOT_WAIT_INTERVAL = 0.1
+
+JSON_FORMAT = 'json'
+COLUMNAR_FORMAT = 'columnar'
+COLUMNAR_MEDIA_TYPE = 'application/vnd.graph.columnar+json'
+
+# Snapshot name -> dotted path of a callable returning the serialized payload as an iterable of bytes chunks,
+# snapshots of a parametrized view of the graph get the parameters as keyword arguments
+SNAPSHOT_BUILDERS: Dict[str, str] = {
+    'graph-data': 'people.views.graph.build_graph_data_snapshot',
+    'people': 'people.views.graph_v2.people.build_people_snapshot',
+    'relationships': 'people.views.graph_v2.relationships.build_relationships_snapshot',
+    'graph-data.columnar': 'people.views.graph.build_graph_data_columnar_snapshot',
+    'columnar': 'people.views.graph_v2.columnar.build_columnar_snapshot',
+    'people.at': 'people.views.graph_v2.time_travel.build_people_at_snapshot',
+    'relationships.at': 'people.views.graph_v2.time_travel.build_relationships_at_snapshot',
+}
+
+# Snapshots built on demand only, one for every combination of parameters requested
+PARAMETRIZED_SNAPSHOTS = frozenset(('people.at', 'relationships.at'))
+
+# Snapshots built from the in-process graph index, their builders get the data version they are built for as `version`
+INDEXED_SNAPSHOTS = frozenset(('people.at', 'relationships.at'))
+
+# Snapshots counting ages and open-ended durations up to the day they are keyed by, which their builders get as `day`.
+# The parametrized ones count up to their `at` parameter instead.
+DATED_SNAPSHOTS = frozenset(('people', 'relationships'))
+
+
+def get_data_version() -> int:
+    from people.models import GraphDataVersion
+    return GraphDataVersion.objects.current()
+
+
+def get_request_data_version(request):
+    """
+    Returns the (version, date updated) pair of the graph data, loaded at most once per request.
+    """
+    if not hasattr(request, '_graph_data_version'):
+        from people.models import GraphDataVersion
+        request._graph_data_version = GraphDataVersion.objects.current_with_date()
+    return request._graph_data_version
+
+
+def get_request_day(request) -> datetime.date:
+    """
+    Returns the date ages and open-ended durations in the payloads of the request are counted up to, fixed for the
+    whole request.
+    """
+    if not hasattr(request, '_graph_data_day'):
+        request._graph_data_day = timezone.localdate()
+    return request._graph_data_day
+
+
+def get_request_format(request) -> str:
+    """
+    The columnar format is only sent to clients asking for it explicitly, either by the `Accept` header
+    or by the `format` query parameter.
+    """
+    if request.GET.get('format') == COLUMNAR_FORMAT:
+        return COLUMNAR_FORMAT
+    if any(f'{media_type.main_type}/{media_type.sub_type}' == COLUMNAR_MEDIA_TYPE
+           for media_type in request.accepted_types):
+        return COLUMNAR_FORMAT
+    return JSON_FORMAT
+
+
+def data_version_etag(request, *args, **kwargs):
+    # Invisible users get an error payload instead of the graph, which must not be revalidated as the graph
+    if not request.user.visible:
+        return None
+    version, _ = get_request_data_version(request)
+    day = get_request_day(request).isoformat()
+    request_format = get_request_format(request)
+    if request_format == JSON_FORMAT:
+        return f'"{version}-{day}"'
+    return f'"{version}-{day}-{request_format}"'
+
+
+def data_version_last_modified(request, *args, **kwargs):
+    if not request.user.visible:
+        return None
+    _, date_updated = get_request_data_version(request)
+    # Ages and durations change at midnight even when the data does not
+    day_started = timezone.make_aware(datetime.datetime.combine(get_request_day(request), datetime.time()))
+    return max(date_updated, day_started) if date_updated else day_started
+
+
+def graph_data_condition(view_func):
+    """
+    Answers conditional GETs of graph data views with a 304 based solely on the graph data version and the day
+    and makes browsers revalidate the payload on every use.
+    """
+    conditional_view = condition(etag_func=data_version_etag, last_modified_func=data_version_last_modified)(view_func)
+
+    @wraps(view_func)
+    def inner(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    return inner
+
+
+def cache_key(name: str, version: int, day: datetime.date, **params) -> str:
+    # Payloads count ages and durations up to the day they are built on, they are only valid on that day
+    return ':'.join((
+        f'snapshot:{name}:{version}:{day.isoformat()}', *(f'{key}={value}' for key, value in sorted(params.items()))
+    ))
+
+
+def build(name: str, version: int, day: datetime.date, **params) -> Iterable[bytes]:
+    if name in INDEXED_SNAPSHOTS:
+        params['version'] = version
+    if name in DATED_SNAPSHOTS:
+        params['day'] = day
+    return import_string(SNAPSHOT_BUILDERS[name])(**params)
+
+
+def snapshot_path(key: str) -> str:
+    return os.path.join(settings.GRAPH_SNAPSHOT_DIR, hashlib.md5(key.encode()).hexdigest())
+
+
+def lock_path(key: str) -> str:
+    # Files starting with a dot are never served nor pruned as snapshots
+    return os.path.join(settings.GRAPH_SNAPSHOT_DIR, f'.lock-{hashlib.md5(key.encode()).hexdigest()}')
+
+
+def open_snapshot(key: str) -> Optional[BinaryIO]:
+    """
+    Returns the stored snapshot opened for reading, None when there is none or it has expired.
+    """
+    try:
+        file = open(snapshot_path(key), 'rb')
+    except FileNotFoundError:
+        return None
+    if time.time() - os.fstat(file.fileno()).st_mtime > settings.GRAPH_SNAPSHOT_TIMEOUT:
+        file.close()
+        return None
+    return file
+
+
+def iter_file(file: BinaryIO) -> Iterator[bytes]:
+    with file:
+        yield from iter(partial(file.read, SNAPSHOT_READ_SIZE), b'')
+
+
+def lock(key: str) -> bool:
+    """
+    Takes the right to build the snapshot, returns False when another worker holds it. Locks of builds that have
+    taken longer than `SNAPSHOT_BUILD_TIMEOUT` are broken.
+    """
+    os.makedirs(settings.GRAPH_SNAPSHOT_DIR, exist_ok=True)
+    path = lock_path(key)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.stat(path).st_mtime <= SNAPSHOT_BUILD_TIMEOUT:
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def unlock(key: str):
+    try:
+        os.remove(lock_path(key))
+    except FileNotFoundError:
+        pass
+
+
+def wait_for_snapshot(key: str) -> Optional[BinaryIO]:
+    """
+    Waits for the snapshot being built by another worker, returns None when the build fails or times out.
+    """
+    deadline = time.monotonic() + SNAPSHOT_BUILD_TIMEOUT
+    while time.monotonic() < deadline:
+        file = open_snapshot(key)
+        if file is not None:
+            return file
+        if not os.path.exists(lock_path(key)):
+            return open_snapshot(key)
+        time.sleep(SNAPSHOT_WAIT_INTERVAL)
+    return None
+
+
+def prune():
+    """
+    Removes the expired snapshots and the oldest ones beyond `GRAPH_SNAPSHOT_MAX_ENTRIES`.
+    """
+    snapshots = []
+    with os.scandir(settings.GRAPH_SNAPSHOT_DIR) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                snapshots.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    snapshots.sort(reverse=True)
+    expired = time.time() - settings.GRAPH_SNAPSHOT_TIMEOUT
+    for i, (modified, path) in enumerate(snapshots):
+        if i >= settings.GRAPH_SNAPSHOT_MAX_ENTRIES or modified < expired:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def store(name: str, version: int, day: datetime.date, key: str, **params) -> Iterator[bytes]:
+    """
+    Yields the chunks of the snapshot while writing them to a temporary file, which replaces the stored snapshot
+    once complete. Nothing is stored when the build fails or the consumer stops early.
+    """
+    os.makedirs(settings.GRAPH_SNAPSHOT_DIR, exist_ok=True)
+    file = tempfile.NamedTemporaryFile(dir=settings.GRAPH_SNAPSHOT_DIR, prefix='.building-', delete=False)
+    try:
+        with file:
+            for chunk in build(name, version, day, **params):
+                file.write(chunk)
+                yield chunk
+        os.replace(file.name, snapshot_path(key))
+    finally:
+        if os.path.exists(file.name):
+            os.remove(file.name)
+    prune()
+
+
+def iter_snapshot(name: str, version: int, day: datetime.date, **params) -> Iterator[bytes]:
+    """
+    Yields the stored snapshot. On a miss, builds and stores it, or waits for the worker building it already.
+    When that worker does not finish in time the snapshot is built again, but not stored.
+    """
+    key = cache_key(name, version, day, **params)
+    file = open_snapshot(key)
+    if file is None:
+        if lock(key):
+            try:
+                # Might have been stored between the miss and taking the lock
+                file = open_snapshot(key)
+                if file is None:
+                    yield from store(name, version, day, key, **params)
+                    return
+            finally:
+                unlock(key)
+        else:
+            file = wait_for_snapshot(key)
+            if file is None:
+                yield from build(name, version, day, **params)
+                return
+    yield from iter_file(file)
+
+
+def get(name: str, version: Optional[int] = None, day: Optional[datetime.date] = None, **params) -> bytes:
+    """
+    Returns the serialized payload of the snapshot for the given (by default current) data version and day
+    (by default today), building and storing it on a miss.
+    """
+    if version is None:
+        version = get_data_version()
+    return b''.join(iter_snapshot(name, version, day or timezone.localdate(), **params))
+
+
+def get_response(name: str, version: int, day: datetime.date, content_type: str = 'application/json',
+                 **params) -> HttpResponse:
+    """
+    Streams the stored snapshot from its file, or streams it to the client while it is being built on a miss.
+    Neither holds more than a chunk of the payload in memory.
+    """
+    file = open_snapshot(cache_key(name, version, day, **params))
+    if file is not None:
+        response = StreamingHttpResponse(iter_file(file), content_type=content_type)
+        response['Content-Length'] = os.fstat(file.fileno()).st_size
+        return response
+    return StreamingHttpResponse(iter_snapshot(name, version, day, **params), content_type=content_type)
+
+
+def get_request_response(request, name: str, content_type: str = 'application/json') -> HttpResponse:
+    """
+    Responds with the snapshot `name` for the data version and the day of the request.
+    """
+    version, _ = get_request_data_version(request)
+    return get_response(name, version, get_request_day(request), content_type)
+
+
+def get_negotiated_response(request, name: str, columnar_name: str) -> HttpResponse:
+    """
+    Responds with the snapshot `name`, or with the snapshot `columnar_name` to requests for the columnar format.
+    """
+    if get_request_format(request) == COLUMNAR_FORMAT:
+        return get_request_response(request, columnar_name, COLUMNAR_MEDIA_TYPE)
+    return get_request_response(request, name)
+
+
+def rebuild(names: Optional[Iterable[str]] = None) -> int:
+    version = get_data_version()
+    day = timezone.localdate()
+    for name in names or (name for name in SNAPSHOT_BUILDERS if name not in PARAMETRIZED_SNAPSHOTS):
+        for _ in store(name, version, day, cache_key(name, version, day)):
+            pass
+    return version
@@ -0,0 +1,105 @@
+"""
+Coverage of sets of date intervals, e.g. of the statuses of a relationship. Overlapping intervals are merged before
+they are measured, so every day is counted once.
+
+An interval runs from its start up to (excluding) its end, a missing start or end stands for today. Dates of lower
+precision stand for any day of their month or year: the reported coverage takes them as the first such day, like
+`variable_res_date.timedelta` does, and is accompanied by the least and the most days the intervals may cover.
+"""
+import datetime
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+
+from people.utils.variable_res_date import EPOCH_ORDINAL, ordinal_delta, to_epoch_day_range
+
+
+class Coverage(NamedTuple):
+    relative: relativedelta
+    days: int
+    min_days: int
+    max_days: int
+
+    @property
+    def is_precise(self):
+        return self.min_days == self.max_days
+
+    def as_dict(self):
+        return dict(
+            years=self.relative.years,
+            months=self.relative.months,
+            days=self.relative.days,
+            total_days=self.days,
+            is_precise=self.is_precise,
+        )
+
+
+EMPTY_COVERAGE = Coverage(relativedelta(), 0, 0, 0)
+
+# (start, end) in epoch days
+Interval = Tuple[int, int]
+
+
+def merge(intervals: List[Interval]) -> Iterator[Interval]:
+    """
+    Yields the union of the intervals, which must be sorted by their start, as disjoint intervals.
+    """
+    current_start = current_end = None
+    for start, end in intervals:
+        if end <= start:
+            continue
+        if current_end is not None and start <= current_end:
+            current_end = max(current_end, end)
+            continue
+        if current_end is not None:
+            yield current_start, current_end
+        current_start, current_end = start, end
+    if current_end is not None:
+        yield current_start, current_end
+
+
+def measure(bounds: List[Tuple[int, int, int, int]]) -> Coverage:
+    """
+    Measures intervals given as (first start, last start, first end, last end) epoch days, sorted by the first start.
+    """
+    if not bounds:
+        return EMPTY_COVERAGE
+
+    relative = relativedelta()
+    days = 0
+    for start, end in merge([(first_start, first_end) for first_start, _, first_end, _ in bounds]):
+        years, months, relative_days, _ = ordinal_delta(start + EPOCH_ORDINAL, end + EPOCH_ORDINAL)
+        relative += relativedelta(years=years, months=months, days=relative_days)
+        days += end - start
+
+    if all(first_start == last_start and first_end == last_end
+           for first_start, last_start, first_end, last_end in bounds):
+        return Coverage(relative, days, days, days)
+
+    # Surely covered from the latest possible start to the earliest possible end, possibly the other way round
+    min_days = sum(end - start for start, end in merge(sorted(
+        (last_start, first_end) for _, last_start, first_end, _ in bounds
+    )))
+    max_days = sum(end - start for start, end in merge(
+        [(first_start, last_end) for first_start, _, _, last_end in bounds]
+    ))
+    return Coverage(relative, days, min_days, max_days)
+
+
+def to_bounds(date_start, date_end, today_range: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    start = today_range if date_start is None else to_epoch_day_range(date_start)
+    end = today_range if date_end is None else to_epoch_day_range(date_end)
+    return start[0], start[1], end[0], end[1]
+
+
+def get_today_range(today: Optional[datetime.date] = None) -> Tuple[int, int]:
+    return to_epoch_day_range(today or datetime.datetime.now().date())
+
+
+def coverage(intervals: Iterable[tuple], today: Optional[datetime.date] = None) -> Coverage:
+    """
+    Coverage of (date start, date end) pairs.
+    """
+    today_range = get_today_range(today)
+    return measure(sorted(to_bounds(date_start, date_end, today_range) for date_start, date_end in intervals))
+
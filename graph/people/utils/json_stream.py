@@ -0,0 +1,37 @@
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator
+
+# Rows fetched per round trip of a server-side cursor
+ITERATOR_CHUNK_SIZE = 500
+
+# Items encoded into a single chunk of the stream
+STREAM_BATCH_SIZE = 200
+
+
+def iter_json_array(items: Iterable, dumps: Callable[[object], bytes], item_separator=b',') -> Iterator[bytes]:
+    """
+    Encodes the items one by one into chunks of a JSON array, so that only a batch of them is held in memory at once.
+    """
+    items = iter(items)
+    yield b'['
+    first = True
+    while True:
+        batch = list(islice(items, STREAM_BATCH_SIZE))
+        if not batch:
+            break
+        chunk = item_separator.join(dumps(item) for item in batch)
+        yield chunk if first else item_separator + chunk
+        first = False
+    yield b']'
+
+
+def iter_json_object(members: Dict[str, Iterable[bytes]], dumps: Callable[[object], bytes], item_separator=b',',
+                     key_separator=b':') -> Iterator[bytes]:
+    """
+    Encodes a JSON object whose values are given as already encoded chunks.
+    """
+    yield b'{'
+    for index, (key, value_chunks) in enumerate(members.items()):
+        yield (item_separator if index else b'') + dumps(key) + key_separator
+        yield from value_chunks
+    yield b'}'
@@ -1,13 +1,22 @@
+from itertools import islice
+
 from django.core.mail import get_connection, EmailMultiAlternatives
 
+MAIL_BATCH_SIZE = 100
+
 
 def send_mass_html_mail(datatuple, fail_silently=False, user=None, password=None,
-                        connection=None):
+                        connection=None, batch_size=MAIL_BATCH_SIZE, progress=None):
     """
     Given a datatuple of (subject, text_content, html_content, from_email,
     recipient_list), sends each message to each recipient list. Returns the
     number of emails sent.
 
+    The datatuple may be any iterable, e.g. a generator: messages are built
+    lazily and sent `batch_size` at a time over a single connection, so only
+    one batch is held in memory. If `progress` is given, it is called with the
+    number of emails sent so far after every batch.
+
     If from_email is None, the DEFAULT_FROM_EMAIL setting is used.
     If auth_user and auth_password are set, they're used to log in.
     If auth_user is None, the EMAIL_HOST_USER setting is used.
@@ -16,9 +25,21 @@ def send_mass_html_mail(datatuple, fail_silently=False, user=None, password=None
     """
     connection = connection or get_connection(
         username=user, password=password, fail_silently=fail_silently)
-    messages = []
-    for subject, text, html, from_email, recipient in datatuple:
-        message = EmailMultiAlternatives(subject, text, from_email, recipient)
-        message.attach_alternative(html, 'text/html')
-        messages.append(message)
-    return connection.send_messages(messages)
+    datatuple = iter(datatuple)
+    sent = 0
+
+    new_connection = connection.open()
+    try:
+        while batch := list(islice(datatuple, batch_size)):
+            messages = []
+            for subject, text, html, from_email, recipient in batch:
+                message = EmailMultiAlternatives(subject, text, from_email, recipient)
+                message.attach_alternative(html, 'text/html')
+                messages.append(message)
+            sent += connection.send_messages(messages) or 0
+            if progress:
+                progress(sent)
+    finally:
+        if new_connection:
+            connection.close()
+    return sent
@@ -0,0 +1,80 @@
+"""
+Write-behind recording of apology mail reads. The tracking pixel only adds the token to an in-memory set, a background
+thread marks the people of all buffered tokens as having read the mail in a single UPDATE, every
+`READ_RECEIPT_FLUSH_INTERVAL` seconds or as soon as `READ_RECEIPT_BUFFER_SIZE` distinct tokens are waiting. Repeated
+loads of the pixel are coalesced, and requests of the pixel never wait for or hold a database connection.
+
+Receipts are best-effort: the ones buffered when a process is killed, or when a flush fails, are lost.
+"""
+import atexit
+import logging
+import threading
+from typing import Optional, Set
+
+from django.conf import settings
+from django.db import connections
+
+from people.models import Person
+from users.models import Token, token_digest
+
+logger = logging.getLogger(__name__)
+
+
+def mark_read(digests: Set[bytes]) -> int:
+    """
+    Marks the people of the given auth token digests as having read the apology mail, returns how many changed.
+    """
+    return Person.objects.filter(
+        pk__in=Token.objects.filter(type=Token.Types.AUTH, token_digest__in=digests).values('user_id')
+    ).exclude(
+        apology_status=Person.ApologyStatus.READ
+    ).update(apology_status=Person.ApologyStatus.READ)
+
+
+class ReadReceiptBuffer:
+    """
+    Pending receipts, flushed by a worker thread started with the first of them. Without an interval, receipts are
+    flushed only by calling `flush`.
+    """
+
+    def __init__(self, max_size: int, interval: Optional[float]):
+        self.max_size = max_size
+        self.interval = interval
+        self._pending: Set[bytes] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+
+    def record(self, token: str):
+        digest = token_digest(token)
+        with self._lock:
+            self._pending.add(digest)
+            full = len(self._pending) >= self.max_size
+            if self.interval is not None and self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='read-receipts', daemon=True)
+                self._worker.start()
+                atexit.register(self.flush)
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        with self._lock:
+            digests, self._pending = self._pending, set()
+        if not digests:
+            return 0
+        return mark_read(digests)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not record read receipts')
+            finally:
+                # Only this thread's connection, it is not kept open between flushes
+                connections.close_all()
+
+
+read_receipts = ReadReceiptBuffer(settings.READ_RECEIPT_BUFFER_SIZE, settings.READ_RECEIPT_FLUSH_INTERVAL)
@@ -4,6 +4,7 @@ from typing import Type, List
 from django.db.models import Model, Q
 from rest_framework import serializers
 
+from people.models import GraphChange, PersonStatusFlags
 from people.utils.variable_res_date import VariableResolutionDateField, VariableResolutionDateSerializerField
 
 
@@ -48,6 +49,13 @@ class BulkListSerializer(serializers.ListSerializer, ABC):
             fields=[field.name for field in get_updatable_fields(self.model_cls)]
         )
 
+        # Bulk operations bypass model signals, so the graph change log has to be written here
+        if created:
+            GraphChange.objects.record(created, GraphChange.Actions.CREATED)
+        if for_update:
+            GraphChange.objects.record(for_update, GraphChange.Actions.UPDATED)
+        PersonStatusFlags.objects.refresh_on_commit([*created, *for_update])
+
         return created, updated
 
 
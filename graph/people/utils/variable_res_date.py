@@ -1,26 +1,44 @@
+import calendar
 import datetime
 import re
-from dataclasses import dataclass
-from typing import Union
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple, Union
 
 from dateutil.relativedelta import relativedelta
 from django.contrib.admin.options import FORMFIELD_FOR_DBFIELD_DEFAULTS
+from django.contrib.postgres.fields import DateRangeField
 from django.core.exceptions import ValidationError
 from django.db import models
 from django import forms
 from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _
+from psycopg2.extras import DateRange
 from rest_framework.fields import Field
 
 VARIABLE_RESOLUTION_DATE_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
 VARIABLE_RESOLUTION_DATE_LENGTH = 10
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class VariableDate:
     year: int
     month: int
     day: int
+    # Ordinal of the first day the date can stand for, None for dates out of the range of `datetime.date`
+    ordinal: Optional[int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        try:
+            ordinal = datetime.date(self.year, self.month or 1, self.day or 1).toordinal()
+        except ValueError:
+            ordinal = None
+        object.__setattr__(self, 'ordinal', ordinal)
+
+    def __reduce__(self):
+        # Rebuilt from the date parts, frozen slotted instances can not be restored attribute by attribute everywhere
+        return VariableDate, (self.year, self.month, self.day)
 
     def __str__(self):
         return f'{self.year}-{self.month:02}-{self.day:02}'
@@ -30,16 +48,57 @@ class VariableDate:
         return self.year != 0 and self.month != 0 and self.day != 0
 
 
+class DatePrecision(IntEnum):
+    UNKNOWN = 0
+    YEAR = 1
+    MONTH = 2
+    DAY = 3
+
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
 def ensure_date(obj):
     if isinstance(obj, datetime.date):
         return obj
 
-    if isinstance(obj, VariableDate):
-        return datetime.date(obj.year, obj.month or 1, obj.day or 1)
+    if isinstance(obj, VariableDate) and obj.ordinal is not None:
+        return datetime.date.fromordinal(obj.ordinal)
 
     raise ValueError()
 
 
+def get_precision(value: Union[VariableDate, datetime.date, None]) -> DatePrecision:
+    if value is None:
+        return DatePrecision.UNKNOWN
+    if isinstance(value, datetime.date) or value.day != 0:
+        return DatePrecision.DAY
+    if value.month != 0:
+        return DatePrecision.MONTH
+    return DatePrecision.YEAR
+
+
+def to_epoch_day(value: Union[VariableDate, datetime.date, None]):
+    """
+    Number of days between the Unix epoch and the date, missing month and day are taken as the first one.
+    """
+    if value is None:
+        return None
+    return to_ordinal(value) - EPOCH_ORDINAL
+
+
+def to_epoch_day_range(value: Union[VariableDate, datetime.date]):
+    """
+    First and last epoch day the date can stand for, e.g. the first and the last day of the year of a year-only date.
+    """
+    first = to_epoch_day(value)
+    if isinstance(value, datetime.date) or value.day != 0:
+        return first, first
+    if value.month != 0:
+        return first, first + calendar.monthrange(value.year, value.month)[1] - 1
+    return first, first + (366 if calendar.isleap(value.year) else 365) - 1
+
+
 def parse(value) -> Union[VariableDate, datetime.date]:
     match = VARIABLE_RESOLUTION_DATE_RE.match(force_str(value))
     if match:
@@ -62,7 +121,129 @@ def parse(value) -> Union[VariableDate, datetime.date]:
     raise ValidationError(_('Must be a valid year, year-month, or year-month-day'))
 
 
+@lru_cache(maxsize=2 ** 14)
+def decode(value: str) -> Union[VariableDate, datetime.date]:
+    """
+    `parse` of a stored date string. Well-formed strings are sliced at their fixed offsets instead of matched, and the
+    immutable results are shared between the recurring strings, anything else is left to `parse`.
+    """
+    year, month, day = value[:4], value[5:7], value[8:]
+    # Decimal digits are exactly what `\d` of the regular expression matches
+    if len(value) != VARIABLE_RESOLUTION_DATE_LENGTH or value[4] != '-' or value[7] != '-' \
+            or not (year + month + day).isdecimal():
+        return parse(value)
+
+    year, month, day = int(year), int(month), int(day)
+    if month != 0 and day != 0:
+        try:
+            return datetime.date(year, month, day)
+        except ValueError:
+            return parse(value)
+    if month == 0 and day != 0:
+        return parse(value)
+    return VariableDate(year, month, day)
+
+
+# Precisions of dates that stand for any day of a month or a year
+IMPRECISE_PRECISIONS = (DatePrecision.YEAR, DatePrecision.MONTH)
+
+
+class CompanionDescriptor:
+    """
+    Computes the value of a companion column from the date it accompanies, the column itself is written by the
+    database only.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        return self.field.value_from_instance(instance)
+
+    def __set__(self, instance, value):
+        pass
+
+
+class CompanionFieldMixin:
+    """
+    Read-only field over a column generated by the database, e.g. from a `VariableResolutionDateField`. The field can
+    be filtered and ordered by, but is never selected or written by Django and is left out of the migration state, the
+    column is created by raw SQL in a migration. Its value on instances is computed in Python.
+    """
+    descriptor_class = CompanionDescriptor
+
+    def __init__(self, source, *args, **kwargs):
+        self.source = source
+        super().__init__(*args, null=True, blank=True, editable=False, serialize=False, **kwargs)
+
+    def set_attributes_from_name(self, name):
+        super().set_attributes_from_name(name)
+        self.concrete = False
+
+    def contribute_to_class(self, cls, name, private_only=False):
+        super().contribute_to_class(cls, name, private_only=True)
+
+    def value_from_instance(self, instance):
+        return self.compute(self.source.to_python(getattr(instance, self.source.attname)))
+
+
+class EarliestDateField(CompanionFieldMixin, models.DateField):
+    def compute(self, value):
+        return None if value is None else ensure_date(value)
+
+
+class LatestDateField(CompanionFieldMixin, models.DateField):
+    def compute(self, value):
+        if value is None:
+            return None
+        return datetime.date.fromordinal(to_epoch_day_range(value)[1] + EPOCH_ORDINAL)
+
+
+class PrecisionField(CompanionFieldMixin, models.SmallIntegerField):
+    def compute(self, value):
+        return get_precision(value)
+
+
+# Suffixes of the companion columns of every `VariableResolutionDateField`
+COMPANION_FIELDS = (
+    ('earliest', EarliestDateField),
+    ('latest', LatestDateField),
+    ('precision', PrecisionField),
+)
+
+
+class ActiveRangeField(CompanionFieldMixin, DateRangeField):
+    """
+    Read-only range of the days a record with a start and an end `VariableResolutionDateField` is active, i.e. from
+    the earliest day of the start to the earliest day of the end, both included. A missing end leaves the range
+    unbounded above. A record with a missing start is not known to have started, its range is empty, as is the range of
+    an end before the start. The column is created by raw SQL in a migration.
+    """
+
+    def __init__(self, start: str, end: str, *args, **kwargs):
+        self.start_name = start
+        self.end_name = end
+        super().__init__(None, *args, **kwargs)
+
+    def value_from_instance(self, instance):
+        start = getattr(instance, f'{self.start_name}_earliest')
+        end = getattr(instance, f'{self.end_name}_earliest')
+        if start is None or (end is not None and end < start):
+            return DateRange(empty=True)
+        # Canonical form of the range, as the database returns it
+        if end is not None:
+            end += datetime.timedelta(days=1)
+        return DateRange(start, end, '[)')
+
+
 class VariableResolutionDateField(models.CharField):
+    """
+    Besides the date string, the database keeps the earliest and the latest day the date can stand for and its
+    `DatePrecision` in the indexed companion columns `<column>_earliest`, `<column>_latest` and `<column>_precision`,
+    available for lookups as the fields `<name>_earliest`, `<name>_latest` and `<name>_precision`.
+    """
     description = 'A year, year-month, or year-month-day date'
 
     def __init__(self, *args, **kwargs):
@@ -75,10 +256,16 @@ class VariableResolutionDateField(models.CharField):
             del kwargs['max_length']
         return name, path, args, kwargs
 
+    def contribute_to_class(self, cls, name, private_only=False):
+        super().contribute_to_class(cls, name, private_only)
+        if not cls._meta.abstract:
+            for suffix, field_class in COMPANION_FIELDS:
+                field_class(self, db_column=f'{self.column}_{suffix}').contribute_to_class(cls, f'{name}_{suffix}')
+
     def from_db_value(self, value, expression, connection):
         if value is None:
             return value
-        return parse(value)
+        return decode(value)
 
     def to_python(self, value):
         if isinstance(value, VariableDate) or isinstance(value, datetime.date):
@@ -255,3 +442,76 @@ def timedelta(later, sooner, raw = False):
         total_days=delta.days,
         is_precise=(sooner is None or isinstance(sooner, datetime.date) or sooner.is_precise) and (later is None or isinstance(later, datetime.date) or later.is_precise)
     )
+
+
+def add_months(date: datetime.date, months: int) -> datetime.date:
+    year, month = divmod(date.month - 1 + months, 12)
+    year += date.year
+    return date.replace(year=year, month=month + 1, day=min(date.day, calendar.monthrange(year, month + 1)[1]))
+
+
+@lru_cache(maxsize=2 ** 16)
+def ordinal_delta(sooner: int, later: int) -> Tuple[int, int, int, int]:
+    """
+    Years, months, days and total days between two day ordinals, the same as `relativedelta` gives for the dates.
+    """
+    first_day = datetime.date.fromordinal(sooner)
+    final_day = datetime.date.fromordinal(later)
+
+    months = (final_day.year - first_day.year) * 12 + final_day.month - first_day.month
+    step = 1 if later < sooner else -1
+    moved = add_months(first_day, months)
+    while (final_day < moved) if step == -1 else (final_day > moved):
+        months += step
+        moved = add_months(first_day, months)
+
+    sign = -1 if months < 0 else 1
+    years, months = divmod(abs(months), 12)
+    return sign * years, sign * months, later - moved.toordinal(), later - sooner
+
+
+def timedelta_columns(later_ordinals: Sequence[Optional[int]], later_precisions: Sequence[int],
+                      sooner_ordinals: Sequence[Optional[int]], sooner_precisions: Sequence[int],
+                      today: Optional[datetime.date] = None) -> List[dict]:
+    """
+    Batch version of `timedelta` for columns of day ordinals and `DatePrecision` codes, a missing ordinal stands
+    for today. Results are memoized per pair of ordinals, so with today resolved per (start, end, today).
+    """
+    today_ordinal = (today or datetime.datetime.now().date()).toordinal()
+    precise = (DatePrecision.UNKNOWN, DatePrecision.DAY)
+
+    deltas = []
+    for later, later_precision, sooner, sooner_precision in zip(
+            later_ordinals, later_precisions, sooner_ordinals, sooner_precisions):
+        years, months, days, total_days = ordinal_delta(
+            today_ordinal if sooner is None else sooner, today_ordinal if later is None else later
+        )
+        deltas.append(dict(
+            years=years,
+            months=months,
+            days=days,
+            total_days=total_days,
+            is_precise=later_precision in precise and sooner_precision in precise
+        ))
+    return deltas
+
+
+def to_ordinal(value: Union[VariableDate, datetime.date, None]) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, VariableDate) and value.ordinal is not None:
+        return value.ordinal
+    return ensure_date(value).toordinal()
+
+
+def timedeltas(pairs: Sequence[tuple], today: Optional[datetime.date] = None) -> List[dict]:
+    """
+    `timedelta` of every (later, sooner) pair of dates, computed in one batch.
+    """
+    later = [later for later, _ in pairs]
+    sooner = [sooner for _, sooner in pairs]
+    return timedelta_columns(
+        [to_ordinal(value) for value in later], [get_precision(value) for value in later],
+        [to_ordinal(value) for value in sooner], [get_precision(value) for value in sooner],
+        today
+    )
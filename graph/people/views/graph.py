@@ -1,4 +1,7 @@
+import json
+
 from django.contrib import messages
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Exists, OuterRef, Q
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -8,6 +11,11 @@ from django.views.generic import TemplateView
 
 from people.models import Person, Relationship, RelationshipStatus
 from people.serializers import PeopleSerializer, RelationshipSerializer
+from people.utils import graph_snapshot
+from people.utils.json_stream import iter_json_array, iter_json_object, ITERATOR_CHUNK_SIZE
+from people.utils.variable_res_date import IMPRECISE_PRECISIONS
+from people.views.graph_v2.columnar import build_columnar
+from people.views.graph_v2.row_serializers import iter_edges
 
 
 class GraphView(TemplateView):
@@ -21,22 +29,51 @@ class GraphView(TemplateView):
         return super().dispatch(request, *args, **kwargs)
 
 
+def dumps_graph_data(obj):
+    # Same encoding as JsonResponse
+    return json.dumps(obj, cls=DjangoJSONEncoder).encode()
+
+
+def get_graph_data_querysets():
+    people = Person.qs.for_graph_serialization()
+    relationships = Relationship.objects.for_graph_serialization(people).exclude(
+        Exists(
+            RelationshipStatus.objects.filter(relationship=OuterRef('pk')).filter(
+                Q(date_start_precision__in=IMPRECISE_PRECISIONS) | Q(date_end_precision__in=IMPRECISE_PRECISIONS)
+            )
+        )
+    )
+    return people, relationships
+
+
+def build_graph_data_snapshot():
+    people, relationships = get_graph_data_querysets()
+    return iter_json_object(
+        {
+            'nodes': iter_json_array(
+                (PeopleSerializer(person).data for person in people.iterator(ITERATOR_CHUNK_SIZE)),
+                dumps_graph_data, b', '
+            ),
+            'edges': iter_json_array(
+                (RelationshipSerializer(relationship).data for relationship in relationships.iterator(ITERATOR_CHUNK_SIZE)),
+                dumps_graph_data, b', '
+            ),
+        },
+        dumps_graph_data, b', ', b': '
+    )
+
+
+def build_graph_data_columnar_snapshot():
+    people, relationships = get_graph_data_querysets()
+    return [build_columnar(people, iter_edges(relationships))]
+
+
 class GraphDataView(View):
     def get(self, request, *args, **kwargs):
         if not request.user.visible:
             return JsonResponse({'error': 'You must set yourself to visible first'})
 
-        people = Person.qs.for_graph_serialization()
-        relationships = Relationship.objects.for_graph_serialization(people).exclude(
-            Exists(
-                RelationshipStatus.objects.filter(relationship=OuterRef('pk')).filter(Q(date_start__contains='-00') | Q(date_end__contains='-00'))
-            )
-        )
-        response_data = {
-            'nodes': PeopleSerializer(people, many=True).data,
-            'edges': RelationshipSerializer(relationships, many=True).data
-        }
-        return JsonResponse(response_data)
+        return graph_snapshot.get_negotiated_response(request, 'graph-data', 'graph-data.columnar')
 
 
 class AboutView(TemplateView):
@@ -0,0 +1,68 @@
+from django.db.models import Q
+from django.http import HttpResponse
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from people.models import GraphChange, GraphDataVersion, Person, Relationship
+from people.utils import graph_snapshot
+from people.views.graph_v2.row_serializers import serialize_people, serialize_relationships
+
+
+class GraphChangesView(APIView):
+    """
+    Returns the people and relationships changed since the version given in the `since` query parameter,
+    or the full graph when the change log no longer reaches back that far or the version is unknown.
+    """
+
+    def get_full_response(self, request, version):
+        day = graph_snapshot.get_request_day(request)
+        return HttpResponse(
+            b'{"version":%d,"full":true,"people":%s,"relationships":%s}' % (
+                version,
+                graph_snapshot.get('people', version, day),
+                graph_snapshot.get('relationships', version, day)
+            ),
+            content_type='application/json'
+        )
+
+    def get(self, request):
+        if not request.user.visible:
+            return Response({'error': 'You must set yourself to visible first'})
+
+        version, _ = graph_snapshot.get_request_data_version(request)
+        try:
+            since = int(request.query_params['since'])
+        except (KeyError, ValueError):
+            return self.get_full_response(request, version)
+
+        # The change log no longer reaches back that far, or the version is not one this server ever had
+        if since < GraphDataVersion.objects.compacted_version() or since > version:
+            return self.get_full_response(request, version)
+
+        node_ids, edge_ids = set(), set()
+        for node, edge in GraphChange.objects.since(since).values_list('node', 'edge'):
+            if node is not None:
+                node_ids.add(node)
+            if edge is not None:
+                edge_ids.add(edge)
+
+        # Visibility of a person decides the visibility of all of their relationships
+        edge_ids.update(Relationship.objects.filter(
+            Q(first_person__in=node_ids) | Q(second_person__in=node_ids)
+        ).values_list('pk', flat=True))
+
+        day = graph_snapshot.get_request_day(request)
+        visible_people = Person.qs.for_graph_serialization()
+        people = serialize_people(visible_people.filter(pk__in=node_ids), day)
+        relationships = serialize_relationships(
+            Relationship.objects.for_graph_serialization(visible_people).filter(pk__in=edge_ids), day
+        )
+
+        return Response({
+            'version': version,
+            'full': False,
+            'people': people,
+            'removed_people': sorted(node_ids - {person['id'] for person in people}),
+            'relationships': relationships,
+            'removed_relationships': sorted(edge_ids - {relationship['id'] for relationship in relationships}),
+        })
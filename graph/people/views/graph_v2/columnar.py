@@ -0,0 +1,140 @@
+"""
+Struct-of-arrays representation of the whole graph, served by the columnar endpoint and by the graph data endpoint to
+clients that ask for `COLUMNAR_MEDIA_TYPE`. Every table is an object of columns with one entry per row, except for
+the offsets columns, which have one entry more than their table has rows:
+
+- `nodes`: people, `membershipOffsets[i]:membershipOffsets[i + 1]` are the rows of `memberships` of the i-th person
+- `memberships`: `group` is a row index into `groups`
+- `groups`: the groups referenced by the memberships
+- `edges`: relationships, `source` and `target` are row indices into `nodes`,
+  `statusOffsets[i]:statusOffsets[i + 1]` are the rows of `statuses` of the i-th relationship
+- `statuses`: relationship statuses
+
+Dates are sent as the number of days since 1970-01-01 with a separate `DatePrecision` column, durations are left
+for the client to compute from them.
+"""
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from people.models import GroupMembership, Person
+from people.utils import graph_snapshot
+from people.utils.graph_snapshot import COLUMNAR_FORMAT, COLUMNAR_MEDIA_TYPE
+from people.utils.json_stream import ITERATOR_CHUNK_SIZE
+from people.utils.variable_res_date import get_precision, to_epoch_day
+from people.views.graph_v2.row_serializers import MEMBERSHIP_FIELDS, PERSON_FIELDS, iter_graph_edges
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Lets DRF views negotiate the columnar format, the payload itself is produced by `build_columnar`.
+    """
+    media_type = COLUMNAR_MEDIA_TYPE
+    format = COLUMNAR_FORMAT
+
+
+def date_columns(table, name):
+    return table.setdefault(name, []), table.setdefault(f'{name}Precision', [])
+
+
+def append_date(columns, value):
+    days, precisions = columns
+    days.append(to_epoch_day(value))
+    precisions.append(get_precision(value))
+
+
+def build_columnar(people, relationship_edges):
+    """
+    Encodes a queryset of `Person.qs.for_graph_serialization()` and the relationships between them as given by
+    `row_serializers.iter_edges`. Unlike the JSON of objects the columns can only be written out once all rows have
+    been read.
+    """
+    people = people.prefetch_related(None).order_by('pk')
+
+    nodes = {
+        'id': [], 'firstName': [], 'lastName': [], 'maidenName': [], 'nickname': [], 'gender': [],
+        'membershipOffsets': [0],
+    }
+    birth_dates, death_dates = date_columns(nodes, 'birthDate'), date_columns(nodes, 'deathDate')
+    memberships = {'group': []}
+    started_dates, ended_dates = date_columns(memberships, 'dateStarted'), date_columns(memberships, 'dateEnded')
+    groups = {'id': [], 'name': [], 'category': []}
+    group_indices = {}
+
+    membership_rows = GroupMembership.objects.filter(
+        visible=True, person__in=people.values('pk')
+    ).order_by('person_id', '-date_started', 'pk').values_list(*MEMBERSHIP_FIELDS).iterator(ITERATOR_CHUNK_SIZE)
+    membership = next(membership_rows, None)
+
+    node_indices = {}
+    person_rows = people.values_list(*PERSON_FIELDS).iterator(ITERATOR_CHUNK_SIZE)
+    for pk, first_name, last_name, maiden_name, nickname, gender, birth_date, death_date in person_rows:
+        node_indices[pk] = len(nodes['id'])
+        nodes['id'].append(pk)
+        nodes['firstName'].append(first_name)
+        nodes['lastName'].append(last_name)
+        nodes['maidenName'].append(maiden_name)
+        nodes['nickname'].append(nickname)
+        nodes['gender'].append(gender)
+        append_date(birth_dates, birth_date)
+        append_date(death_dates, death_date)
+
+        while membership is not None and membership[0] <= pk:
+            person_id, date_started, date_ended, group_name, group_category, group_id = membership
+            if person_id == pk:
+                if group_id not in group_indices:
+                    group_indices[group_id] = len(groups['id'])
+                    groups['id'].append(group_id)
+                    groups['name'].append(group_name)
+                    groups['category'].append(group_category)
+                memberships['group'].append(group_indices[group_id])
+                append_date(started_dates, date_started)
+                append_date(ended_dates, date_ended)
+            membership = next(membership_rows, None)
+        nodes['membershipOffsets'].append(len(memberships['group']))
+
+    edges = {'id': [], 'source': [], 'target': [], 'statusOffsets': [0]}
+    statuses = {'status': []}
+    start_dates, end_dates = date_columns(statuses, 'dateStart'), date_columns(statuses, 'dateEnd')
+
+    for pk, source, target, status_rows in relationship_edges:
+        # People who turned invisible after their rows were read take their relationships with them
+        if source not in node_indices or target not in node_indices:
+            continue
+        edges['id'].append(pk)
+        edges['source'].append(node_indices[source])
+        edges['target'].append(node_indices[target])
+        for _, status, date_start, date_end in status_rows:
+            statuses['status'].append(status)
+            append_date(start_dates, date_start)
+            append_date(end_dates, date_end)
+        edges['statusOffsets'].append(len(statuses['status']))
+
+    return json.dumps({
+        'nodes': nodes,
+        'memberships': memberships,
+        'groups': groups,
+        'edges': edges,
+        'statuses': statuses,
+    }, separators=(',', ':')).encode()
+
+
+def build_columnar_snapshot():
+    return [build_columnar(Person.qs.for_graph_serialization(), iter_graph_edges())]
+
+
+class ColumnarGraphView(APIView):
+    """
+    The people and the relationships between them in a single columnar payload, the edges refer to the rows of
+    the nodes.
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
+
+    def get(self, request):
+        if not request.user.visible:
+            return Response({'error': 'You must set yourself to visible first'})
+
+        return graph_snapshot.get_request_response(request, 'columnar', COLUMNAR_MEDIA_TYPE)
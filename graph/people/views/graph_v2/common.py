@@ -1,9 +1,7 @@
-import operator
-from functools import reduce
-
 from rest_framework import serializers
 
 from people.models import GroupMembership, Person, RelationshipStatus, Relationship
+from people.utils.intervals import coverage
 from people.utils.serializers import ModelSerializer
 from people.utils.variable_res_date import timedelta
 
@@ -45,18 +43,7 @@ class RelationshipSerializer(serializers.ModelSerializer):
     duration = serializers.SerializerMethodField()
 
     def get_duration(self, instance):
-        # TODO do proper interval coverage instead
-        deltas = [timedelta(status.date_end, status.date_start, raw=True) for status in instance.recent_statuses]
-        total_relative = reduce(operator.add, [d[0] for d in deltas])
-        total_delta = reduce(operator.add, [d[1] for d in deltas])
-
-        return dict(
-            years=total_relative.years,
-            months=total_relative.months,
-            days=total_relative.days,
-            total_days=total_delta.days,
-            is_precise=False
-        )
+        return coverage((status.date_start, status.date_end) for status in instance.recent_statuses).as_dict()
 
     def get_statuses(self, instance):
         return RelationshipStatusSerializer(instance.recent_statuses, many=True).data
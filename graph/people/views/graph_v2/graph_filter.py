@@ -0,0 +1,98 @@
+"""
+Server-side counterpart of `GraphFilter` in graph_utils.js. Every filter is a boolean query parameter named like the
+client side filter, filters left out are on. The filters are evaluated against the seminar masks and status classes
+precomputed in the graph index, on the graph as of the requested date: only memberships started by then count and
+relationships are judged by their current status on that date.
+"""
+from typing import Optional, Set, Tuple
+
+from rest_framework.exceptions import ValidationError
+
+from people.utils.graph_index import SEMINARS, GraphIndex, StatusClass
+
+FILTERS = (
+    'isKSP', 'isKMS', 'isFKS', 'notTrojsten', 'isIsolated',
+    'isCurrentSerious', 'isOldSerious', 'isBloodBound', 'isCurrentRumour', 'isOldRumour',
+)
+SEMINAR_FILTERS = {'isKSP': 'KSP', 'isKMS': 'KMS', 'isFKS': 'FKS'}
+
+TRUE_VALUES = ('true', '1')
+FALSE_VALUES = ('false', '0')
+
+
+def filter_bit(name: str) -> int:
+    return 1 << FILTERS.index(name)
+
+
+def get_request_filters(request) -> int:
+    """
+    Returns the mask of the filters turned off by the query parameters, zero when the graph is not to be filtered.
+    """
+    disabled = 0
+    for name in FILTERS:
+        value = request.query_params.get(name)
+        if value is None or value.lower() in TRUE_VALUES:
+            continue
+        if value.lower() not in FALSE_VALUES:
+            raise ValidationError({name: 'Must be true or false'})
+        disabled |= filter_bit(name)
+    return disabled
+
+
+def is_enabled(disabled: int, name: str) -> bool:
+    return not disabled & filter_bit(name)
+
+
+def select(index: GraphIndex, at_day: int, disabled: int) -> Tuple[Optional[Set[int]], Optional[Set[int]]]:
+    """
+    Returns the indices of the nodes and the edges passing the filters, None meaning all of them.
+    """
+    if not disabled:
+        return None, None
+
+    seminar_mask = 0
+    for name, seminar in SEMINAR_FILTERS.items():
+        if is_enabled(disabled, name):
+            seminar_mask |= 1 << SEMINARS.index(seminar)
+    not_trojsten = is_enabled(disabled, 'notTrojsten')
+
+    nodes = set()
+    for node in range(len(index.people)):
+        if not index.is_born_by(node, at_day):
+            continue
+        mask = index.seminar_mask_by(node, at_day)
+        if mask & seminar_mask if mask else not_trojsten:
+            nodes.add(node)
+
+    # Classes of statuses passing the filters while current and once ended
+    current_classes = StatusClass(0)
+    ended_classes = StatusClass(0)
+    if is_enabled(disabled, 'isCurrentSerious'):
+        current_classes |= StatusClass.SERIOUS
+    if is_enabled(disabled, 'isOldSerious'):
+        ended_classes |= StatusClass.SERIOUS
+    if is_enabled(disabled, 'isCurrentRumour'):
+        current_classes |= StatusClass.RUMOUR
+    if is_enabled(disabled, 'isOldRumour'):
+        ended_classes |= StatusClass.RUMOUR
+    if is_enabled(disabled, 'isBloodBound'):
+        current_classes |= StatusClass.BLOOD
+        ended_classes |= StatusClass.BLOOD
+    wanted_classes = current_classes | ended_classes
+
+    edges = set()
+    for edge, (source, target) in enumerate(index.edge_nodes):
+        if not index.edge_classes[edge] & wanted_classes or source not in nodes or target not in nodes:
+            continue
+        started = index.count_started_by(edge, at_day)
+        if not started:
+            continue
+        current = started - 1
+        is_ended = index.is_ended_by(edge, current, at_day)
+        if index.status_classes[edge][current] & (ended_classes if is_ended else current_classes):
+            edges.add(edge)
+
+    if not is_enabled(disabled, 'isIsolated'):
+        nodes = {node for edge in edges for node in index.edge_nodes[edge]}
+
+    return nodes, edges
@@ -1,11 +1,16 @@
 from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from people.models import Person
+from people.utils import graph_snapshot
 from people.utils.serializers import ModelSerializer
 from people.utils.variable_res_date import timedelta
 from people.views.graph_v2.common import GroupMembershipSerializer
+from people.utils.json_stream import iter_json_array
+from people.views.graph_v2.time_travel import get_time_travel_response
+from people.views.graph_v2.row_serializers import iter_people
 
 
 class PeopleSerializer(ModelSerializer):
@@ -23,10 +28,16 @@ class PeopleSerializer(ModelSerializer):
         fields = ('id', 'first_name', 'last_name', 'maiden_name', 'nickname', 'gender', 'birth_date', 'death_date', 'age', 'memberships')
 
 
+def build_people_snapshot(day=None):
+    return iter_json_array(iter_people(Person.qs.for_graph_serialization(), day), JSONRenderer().render)
+
+
 class PeopleView(APIView):
     def get(self, request):
         if not request.user.visible:
             return Response({'error': 'You must set yourself to visible first'})
-        people = Person.qs.for_graph_serialization()
-        serializer = PeopleSerializer(people, many=True)
-        return Response(serializer.data)
+
+        response = get_time_travel_response(request, 'people')
+        if response is not None:
+            return response
+        return graph_snapshot.get_request_response(request, 'people')
@@ -1,8 +1,15 @@
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from people.models import Relationship, Person
-from people.views.graph_v2.common import RelationshipSerializer
+from people.utils import graph_snapshot
+from people.utils.json_stream import iter_json_array
+from people.views.graph_v2.time_travel import get_time_travel_response
+from people.views.graph_v2.row_serializers import iter_graph_edges, iter_serialized_edges
+
+
+def build_relationships_snapshot(day=None):
+    return iter_json_array(iter_serialized_edges(iter_graph_edges(), day), JSONRenderer().render)
 
 
 class RelationshipView(APIView):
@@ -10,7 +17,7 @@ class RelationshipView(APIView):
         if not request.user.visible:
             return Response({'error': 'You must set yourself to visible first'})
 
-        people = Person.qs.for_graph_serialization()
-        relationships = Relationship.objects.for_graph_serialization(people)
-        serializer = RelationshipSerializer(relationships, many=True)
-        return Response(serializer.data)
+        response = get_time_travel_response(request, 'relationships')
+        if response is not None:
+            return response
+        return graph_snapshot.get_request_response(request, 'relationships')
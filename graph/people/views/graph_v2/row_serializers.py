@@ -0,0 +1,219 @@
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Optional
+
+from people.models import GraphEdgeStatus, GroupMembership, Person, Relationship, RelationshipStatus
+from people.utils import graph_snapshot
+from people.utils.intervals import coverage
+from people.utils.json_stream import ITERATOR_CHUNK_SIZE, STREAM_BATCH_SIZE
+from people.utils.variable_res_date import timedeltas
+
+PERSON_FIELDS = ('id', 'first_name', 'last_name', 'maiden_name', 'nickname', 'gender', 'birth_date', 'death_date')
+MEMBERSHIP_FIELDS = ('person_id', 'date_started', 'date_ended', 'group__name', 'group__category', 'group_id')
+STATUS_FIELDS = ('relationship_id', 'status', 'date_start', 'date_end')
+
+
+def serialize_date(value):
+    if value is None:
+        return None
+    return {'year': value.year, 'month': value.month, 'day': value.day}
+
+
+def format_duration(delta):
+    return {
+        'years': delta['years'],
+        'months': delta['months'],
+        'days': delta['days'],
+        'totalDays': delta['total_days'],
+        'isPrecise': delta['is_precise'],
+    }
+
+
+def serialize_duration(later, sooner, today=None):
+    return format_duration(timedeltas([(later, sooner)], today)[0])
+
+
+class DurationBatch:
+    """
+    Collects the durations of a batch of serialized objects, so that they are computed by a single `timedeltas` call.
+    Open-ended durations are counted up to `today`.
+    """
+
+    def __init__(self, today=None):
+        self.today = today
+        self.targets = []
+        self.pairs = []
+
+    def add(self, target: dict, key: str, later, sooner):
+        target[key] = None
+        self.targets.append((target, key))
+        self.pairs.append((later, sooner))
+
+    def resolve(self):
+        for (target, key), delta in zip(self.targets, timedeltas(self.pairs, self.today)):
+            target[key] = format_duration(delta)
+        self.targets, self.pairs = [], []
+
+
+def serialize_coverage(intervals, today=None):
+    total = coverage(intervals, today)
+    return {
+        'years': total.relative.years,
+        'months': total.relative.months,
+        'days': total.relative.days,
+        'totalDays': total.days,
+        'isPrecise': total.is_precise,
+    }
+
+
+def iter_people(people, today=None):
+    """
+    Equivalent of `PeopleSerializer(people, many=True)` for a queryset of `Person.qs.for_graph_serialization()`,
+    yielding one person at a time. People and their memberships are read from server-side cursors in the order of
+    the person's id and merged on the fly. Ages and durations are counted up to `today`, the current date by default.
+    """
+    people = people.prefetch_related(None).order_by('pk')
+
+    membership_rows = GroupMembership.objects.filter(
+        visible=True, person__in=people.values('pk')
+    ).order_by('person_id', '-date_started', 'pk').values_list(*MEMBERSHIP_FIELDS).iterator(ITERATOR_CHUNK_SIZE)
+    membership = next(membership_rows, None)
+
+    person_rows = people.values_list(*PERSON_FIELDS).iterator(ITERATOR_CHUNK_SIZE)
+    durations = DurationBatch(today)
+    while batch := list(islice(person_rows, STREAM_BATCH_SIZE)):
+        serialized = []
+        for pk, first_name, last_name, maiden_name, nickname, gender, birth_date, death_date in batch:
+            memberships = []
+            # Both cursors read their own snapshot, rows of people missing from the other one are skipped
+            while membership is not None and membership[0] <= pk:
+                person_id, date_started, date_ended, group_name, group_category, group_id = membership
+                if person_id == pk:
+                    serialized_membership = {
+                        'dateStarted': serialize_date(date_started),
+                        'dateEnded': serialize_date(date_ended),
+                        'groupName': group_name,
+                        'groupCategory': group_category,
+                    }
+                    durations.add(serialized_membership, 'duration', date_ended, date_started)
+                    serialized_membership['groupId'] = group_id
+                    memberships.append(serialized_membership)
+                membership = next(membership_rows, None)
+
+            person = {
+                'id': pk,
+                'firstName': first_name,
+                'lastName': last_name,
+                'maidenName': maiden_name,
+                'nickname': nickname,
+                'gender': gender,
+                'birthDate': serialize_date(birth_date),
+                'deathDate': serialize_date(death_date),
+            }
+            durations.add(person, 'age', death_date, birth_date)
+            person['memberships'] = memberships
+            serialized.append(person)
+
+        durations.resolve()
+        yield from serialized
+
+
+def serialize_people(people, today=None):
+    return list(iter_people(people, today))
+
+
+def iter_edges(relationships):
+    """
+    Yields (id, first person id, second person id, statuses) of a queryset of
+    `Relationship.objects.for_graph_serialization(people)` in the order of the id, the statuses being rows in the order
+    of `STATUS_FIELDS`, the most recent first. Relationships and statuses are read from server-side cursors and merged
+    on the fly.
+    """
+    relationships = relationships.select_related(None).prefetch_related(None).order_by('pk')
+
+    status_rows = RelationshipStatus.objects.visible().confirmed().filter(
+        relationship__in=relationships.values('pk')
+    ).order_by('relationship', '-date_start', 'pk').values_list(*STATUS_FIELDS).iterator(ITERATOR_CHUNK_SIZE)
+    status_row = next(status_rows, None)
+
+    relationship_rows = relationships.values_list('id', 'first_person_id', 'second_person_id').iterator(
+        ITERATOR_CHUNK_SIZE
+    )
+    for pk, source, target in relationship_rows:
+        statuses = []
+        while status_row is not None and status_row[0] <= pk:
+            if status_row[0] == pk:
+                statuses.append(status_row)
+            status_row = next(status_rows, None)
+        yield pk, source, target, statuses
+
+
+def iter_view_edges():
+    """
+    `iter_edges` of the visible graph read from the `GraphEdgeStatus` materialized view in a single scan.
+    """
+    rows = GraphEdgeStatus.objects.order_by('relationship_id', '-date_start', 'relationship_status_id').values_list(
+        'relationship_id', 'first_person_id', 'second_person_id', 'relationship_status_id', *STATUS_FIELDS[1:]
+    ).iterator(ITERATOR_CHUNK_SIZE)
+    for (pk, source, target), group in groupby(rows, key=itemgetter(0, 1, 2)):
+        yield pk, source, target, [
+            (pk, status, date_start, date_end)
+            for _, _, _, status_pk, status, date_start, date_end in group if status_pk is not None
+        ]
+
+
+def iter_graph_edges(version: Optional[int] = None):
+    """
+    `iter_edges` of the visible graph as of the given (by default current) graph data version, read from the
+    materialized view unless it has not been refreshed since the version.
+    """
+    if version is None:
+        version = graph_snapshot.get_data_version()
+    if GraphEdgeStatus.objects.view_version() == version:
+        return iter_view_edges()
+    return iter_edges(Relationship.objects.for_graph_serialization(Person.qs.for_graph_serialization()))
+
+
+def iter_serialized_edges(edges, today=None):
+    """
+    Serializes the output of `iter_edges` like `RelationshipSerializer` does, yielding one relationship at a time.
+    Durations are counted up to `today`, the current date by default.
+    """
+    durations = DurationBatch(today)
+    while batch := list(islice(edges, STREAM_BATCH_SIZE)):
+        serialized = []
+        for pk, source, target, status_rows in batch:
+            statuses = []
+            intervals = []
+            for _, status, date_start, date_end in status_rows:
+                serialized_status = {
+                    'status': status,
+                    'dateStart': serialize_date(date_start),
+                    'dateEnd': serialize_date(date_end),
+                }
+                durations.add(serialized_status, 'duration', date_end, date_start)
+                statuses.append(serialized_status)
+                intervals.append((date_start, date_end))
+
+            serialized.append({
+                'id': pk,
+                'source': source,
+                'target': target,
+                'statuses': statuses,
+                'duration': serialize_coverage(intervals, today),
+            })
+
+        durations.resolve()
+        yield from serialized
+
+
+def iter_relationships(relationships, today=None):
+    """
+    Equivalent of `RelationshipSerializer(relationships, many=True)` for a queryset of
+    `Relationship.objects.for_graph_serialization(people)`, yielding one relationship at a time.
+    """
+    return iter_serialized_edges(iter_edges(relationships), today)
+
+
+def serialize_relationships(relationships, today=None):
+    return list(iter_relationships(relationships, today))
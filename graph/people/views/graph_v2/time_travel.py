@@ -0,0 +1,142 @@
+"""
+The graph as it was on a given date (`?at=YYYY-MM-DD`): people born by then, the statuses of relationships that had
+started by then, the current status of every relationship and durations counted up to that date. The graph filters
+are evaluated on the graph of the date, today by default.
+"""
+import datetime
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from people.utils import graph_snapshot
+from people.utils.graph_index import get_graph_index
+from people.utils.json_stream import iter_json_array
+from people.utils.variable_res_date import to_epoch_day
+from people.views.graph_v2 import graph_filter
+from people.views.graph_v2.row_serializers import serialize_coverage, serialize_date, serialize_duration
+
+
+def get_request_date(request):
+    """
+    Returns the date of the `at` query parameter, or None when it is missing.
+    """
+    value = request.query_params.get('at')
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({'at': 'Must be a date in the YYYY-MM-DD format'})
+
+
+def until(date, default, at_day):
+    # Dates after the day are not known yet on that day
+    if date is None or to_epoch_day(date) > at_day:
+        return default
+    return date
+
+
+def has_started(date, at_day):
+    return date is None or to_epoch_day(date) <= at_day
+
+
+def iter_people_at(index, at, nodes=None):
+    """
+    Serializes the people of the index as of the date, limited to the given node indices.
+    """
+    at_day = to_epoch_day(at)
+    for node, row in enumerate(index.people):
+        if not index.is_born_by(node, at_day) or (nodes is not None and node not in nodes):
+            continue
+
+        pk, first_name, last_name, maiden_name, nickname, gender, birth_date, death_date = row
+        yield {
+            'id': pk,
+            'firstName': first_name,
+            'lastName': last_name,
+            'maidenName': maiden_name,
+            'nickname': nickname,
+            'gender': gender,
+            'birthDate': serialize_date(birth_date),
+            'deathDate': serialize_date(until(death_date, None, at_day)),
+            'age': serialize_duration(until(death_date, at, at_day), birth_date),
+            'memberships': [
+                {
+                    'dateStarted': serialize_date(date_started),
+                    'dateEnded': serialize_date(until(date_ended, None, at_day)),
+                    'groupName': group_name,
+                    'groupCategory': group_category,
+                    'duration': serialize_duration(until(date_ended, at, at_day), date_started),
+                    'groupId': group_id,
+                }
+                for _, date_started, date_ended, group_name, group_category, group_id in index.memberships[node]
+                if has_started(date_started, at_day)
+            ],
+        }
+
+
+def iter_relationships_at(index, at, edges=None):
+    """
+    Serializes the relationships of the index as of the date, limited to the given edge indices.
+    """
+    at_day = to_epoch_day(at)
+    for edge, (source, target) in enumerate(index.edge_nodes):
+        if edges is not None and edge not in edges:
+            continue
+        started = index.statuses_started_by(edge, at_day)
+        if not started or not index.is_born_by(source, at_day) or not index.is_born_by(target, at_day):
+            continue
+
+        statuses = []
+        intervals = []
+        for _, status, date_start, date_end in reversed(started):
+            date_end_at = until(date_end, at, at_day)
+            statuses.append({
+                'status': status,
+                'dateStart': serialize_date(date_start),
+                'dateEnd': serialize_date(until(date_end, None, at_day)),
+                'duration': serialize_duration(date_end_at, date_start),
+            })
+            intervals.append((date_start, date_end_at))
+
+        yield {
+            'id': index.edge_ids[edge],
+            'source': index.people[source][0],
+            'target': index.people[target][0],
+            'statuses': statuses,
+            'currentStatus': {
+                **statuses[0],
+                'isEnded': index.is_ended_by(edge, len(started) - 1, at_day),
+            },
+            'duration': serialize_coverage(intervals, at),
+        }
+
+
+def build_people_at_snapshot(version: int, at: str, disabled_filters: int = 0):
+    index = get_graph_index(version)
+    at = datetime.date.fromisoformat(at)
+    nodes, _ = graph_filter.select(index, to_epoch_day(at), disabled_filters)
+    return iter_json_array(iter_people_at(index, at, nodes), JSONRenderer().render)
+
+
+def build_relationships_at_snapshot(version: int, at: str, disabled_filters: int = 0):
+    index = get_graph_index(version)
+    at = datetime.date.fromisoformat(at)
+    _, edges = graph_filter.select(index, to_epoch_day(at), disabled_filters)
+    return iter_json_array(iter_relationships_at(index, at, edges), JSONRenderer().render)
+
+
+def get_time_travel_response(request, name: str):
+    """
+    Responds with the snapshot `<name>.at` to requests for a date or for a filtered graph, returns None otherwise.
+    """
+    at = get_request_date(request)
+    disabled_filters = graph_filter.get_request_filters(request)
+    if at is None and not disabled_filters:
+        return None
+
+    version, _ = graph_snapshot.get_request_data_version(request)
+    day = graph_snapshot.get_request_day(request)
+    return graph_snapshot.get_response(
+        f'{name}.at', version, day, at=(at or day).isoformat(), disabled_filters=disabled_filters
+    )
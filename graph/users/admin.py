@@ -4,7 +4,7 @@ from django.http import HttpResponseRedirect
 from django.template.loader import get_template
 from django.urls import reverse
 
-from users.models import ContentUpdateRequest, EmailPatternWhitelist, InviteCode, Token
+from users.models import ContentUpdateRequest, EmailPatternWhitelist, InviteCode, Outbox, Token
 
 
 @admin.register(ContentUpdateRequest)
@@ -59,3 +59,10 @@ class InviteCodeAdmin(admin.ModelAdmin):
 @admin.register(Token)
 class TokenAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(Outbox)
+class OutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'date_created', 'date_sent')
+    list_filter = ('status',)
+    readonly_fields = ('attempts', 'last_error', 'date_created', 'date_sent')
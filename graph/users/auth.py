@@ -1,12 +1,63 @@
+from typing import Optional
+
+from django.conf import settings
 from django.contrib import auth
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import caches
 
 from people.models import Person
-from users.models import Token
+from users.models import Token, token_digest
 
 TOKEN_QUERY_PARAM = "auth_token"
 
+# Shared cache of resolved auth tokens, see `resolve_auth_token`
+TOKEN_CACHE_ALIAS = 'auth_tokens'
+# Cached in place of the user id of tokens that are unknown or revoked
+NO_USER = 0
+
+
+def token_cache_key(token: str) -> str:
+    return f'auth-token:{token_digest(token).hex()}'
+
+
+def get_token_cache():
+    """
+    The shared cache of resolved auth tokens, None when there is none configured.
+    """
+    if TOKEN_CACHE_ALIAS not in settings.CACHES:
+        return None
+    return caches[TOKEN_CACHE_ALIAS]
+
+
+def lookup_auth_token(token: str) -> int:
+    return Token.objects.usable().by_value(token).filter(
+        type=Token.Types.AUTH
+    ).values_list('user_id', flat=True).first() or NO_USER
+
+
+def resolve_auth_token(token: str) -> Optional[int]:
+    """
+    Returns the id of the user of a valid auth token, None for unknown and revoked tokens. Results are cached until
+    the token is saved or deleted.
+    """
+    cache = get_token_cache()
+    if cache is None:
+        return lookup_auth_token(token) or None
+
+    key = token_cache_key(token)
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = lookup_auth_token(token)
+        cache.set(key, user_id)
+    return user_id or None
+
+
+def invalidate_auth_token(token: str):
+    cache = get_token_cache()
+    if cache is not None:
+        cache.delete(token_cache_key(token))
+
 
 class AuthTokenMiddleware(AuthenticationMiddleware):
     def process_request(self, request):
@@ -15,25 +66,12 @@ class AuthTokenMiddleware(AuthenticationMiddleware):
         except KeyError:
             return
 
-        try:
-            auth_token = Token.objects.select_related('user').get(
-                type=Token.Types.AUTH,
-                token=token,
-                valid=True
-            )
-        except Token.DoesNotExist:
+        if resolve_auth_token(token) is None or request.user.is_authenticated:
             return
 
-        if request.user.is_authenticated:
-            if auth_token.token == token:
-                return
-            else:
-                auth.logout(request)
-
-        user: Person = auth.authenticate(request, token=auth_token)
+        user: Person = auth.authenticate(request, token=token)
         if user:
-            user.apology_status = Person.ApologyStatus.READ
-            user.save()
+            user.mark_apology_read()
 
             request.user = user
             auth.login(request, user)
@@ -44,4 +82,7 @@ class AuthTokenBackend(ModelBackend):
         if not token:
             return None
 
-        return token.user
+        user_id = resolve_auth_token(token)
+        if user_id is None:
+            return None
+        return Person.objects.filter(pk=user_id).first()
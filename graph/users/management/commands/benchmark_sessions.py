@@ -0,0 +1,65 @@
+import timeit
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import caches
+from django.core.management import BaseCommand
+
+from users import sessions
+
+STOCK_ENGINE = 'django.contrib.sessions.backends.db'
+
+
+class Command(BaseCommand):
+    help = 'Compares loading (and optionally saving) sessions with the stock database engine and the tiered one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=200, help='Number of sessions to create')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs, the best one is reported')
+        parser.add_argument('--save', action='store_true',
+                            help='Save every session after loading it, as with SESSION_SAVE_EVERY_REQUEST')
+
+    def handle(self, *args, **options):
+        stock = import_module(STOCK_ENGINE).SessionStore
+        tiered = sessions.SessionStore
+        session_keys = [self.create(stock) for _ in range(options['sessions'])]
+
+        def run(engine):
+            def request():
+                for session_key in session_keys:
+                    session = engine(session_key)
+                    session.get(SESSION_KEY)
+                    session.get_expiry_date()
+                    if options['save']:
+                        session.save()
+            return request
+
+        def clear_tiers():
+            sessions.local_sessions.clear()
+            caches[settings.SESSION_CACHE_ALIAS].clear()
+
+        try:
+            self.stdout.write(f'{len(session_keys)} sessions, per request:')
+            for name, request, setup in (
+                    ('stock database', run(stock), None),
+                    ('tiered, cold', run(tiered), clear_tiers),
+                    ('tiered, warm', run(tiered), None),
+            ):
+                if setup:
+                    best = min(timeit.repeat(request, setup=setup, number=1, repeat=options['repeat']))
+                else:
+                    best = min(timeit.repeat(request, number=1, repeat=options['repeat']))
+                self.stdout.write(f'{name:>16}: {best / len(session_keys) * 1e6:8.1f} µs')
+        finally:
+            for session_key in session_keys:
+                tiered(session_key).delete()
+
+    @staticmethod
+    def create(engine):
+        session = engine()
+        session[SESSION_KEY] = '1'
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = '0' * 64
+        session.create()
+        return session.session_key
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from users.models import Token
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired tokens in bounded batches, each in its own short transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of tokens deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to wait between batches')
+
+    def handle(self, *args, **options):
+        purged = 0
+        while True:
+            with transaction.atomic():
+                # Rows locked by concurrent requests are left for the next run
+                pks = list(
+                    Token.objects.expired().select_for_update(skip_locked=True).order_by('date_expires')
+                    .values_list('pk', flat=True)[:options['batch_size']]
+                )
+                if not pks:
+                    break
+                Token.objects.filter(pk__in=pks).delete()
+            purged += len(pks)
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired tokens'))
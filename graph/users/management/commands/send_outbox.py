@@ -0,0 +1,115 @@
+import threading
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management import BaseCommand
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import Outbox
+
+
+class Command(BaseCommand):
+    help = 'Sends the mail waiting in the outbox with a number of workers, each over its own reused mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of mails sent concurrently')
+        parser.add_argument('--batch-size', type=int, default=10, help='Number of mails a worker claims at once')
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help='Seconds to wait before looking for new mail when there is none')
+        parser.add_argument('--once', action='store_true', help='Exit once there is no mail due')
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.sent = self.retried = self.failed = 0
+
+        if options['workers'] <= 1:
+            self.work(options)
+        else:
+            workers = [
+                threading.Thread(target=self.work, args=(options,), name=f'outbox-{i}', daemon=True)
+                for i in range(options['workers'])
+            ]
+            for worker in workers:
+                worker.start()
+            try:
+                for worker in workers:
+                    worker.join()
+            except KeyboardInterrupt:
+                # Mail being sent is finished, the rest of the claimed mail is retried once its claim times out
+                self.stopping.set()
+                for worker in workers:
+                    worker.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {self.sent} mails, {self.retried} to be retried, {self.failed} failed'
+        ))
+
+    def work(self, options):
+        connection = get_connection()
+        try:
+            while not self.stopping.is_set():
+                mails = self.claim(options['batch_size'])
+                if not mails:
+                    if options['once']:
+                        break
+                    self.stopping.wait(options['poll_interval'])
+                    continue
+                for mail in mails:
+                    if self.stopping.is_set():
+                        break
+                    self.send(connection, mail)
+        finally:
+            connection.close()
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    @staticmethod
+    def claim(batch_size):
+        """
+        Takes due mail off the queue for the claim timeout, mail claimed by other workers is skipped.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            mails = list(
+                Outbox.objects.due().select_for_update(skip_locked=True).order_by('date_next_attempt')[:batch_size]
+            )
+            Outbox.objects.filter(pk__in=[mail.pk for mail in mails]).update(
+                attempts=F('attempts') + 1,
+                date_next_attempt=now + Outbox.CLAIM_TIMEOUT
+            )
+        for mail in mails:
+            mail.attempts += 1
+        return mails
+
+    def send(self, connection, mail: Outbox):
+        message = EmailMultiAlternatives(mail.subject, mail.body, mail.from_email, mail.recipients,
+                                         connection=connection)
+        if mail.html_body:
+            message.attach_alternative(mail.html_body, 'text/html')
+
+        try:
+            # Opens the connection unless it is open already, it is then kept open for the next mails
+            connection.open()
+            connection.send_messages([message])
+        except Exception as e:
+            connection.close()
+            mail.last_error = f'{type(e).__name__}: {e}'
+            if mail.attempts >= Outbox.MAX_ATTEMPTS:
+                mail.status = Outbox.Statuses.FAILED
+            else:
+                mail.date_next_attempt = mail.get_retry_date(timezone.now())
+            mail.save(update_fields=['status', 'last_error', 'date_next_attempt'])
+            with self.lock:
+                if mail.status == Outbox.Statuses.FAILED:
+                    self.failed += 1
+                else:
+                    self.retried += 1
+            return
+
+        mail.status = Outbox.Statuses.SENT
+        mail.date_sent = timezone.now()
+        mail.save(update_fields=['status', 'date_sent'])
+        with self.lock:
+            self.sent += 1
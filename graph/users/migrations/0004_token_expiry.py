@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_token_extra_data_alter_token_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='token',
+            name='date_expires',
+            field=models.DateTimeField(db_index=True, null=True, verbose_name='date expires'),
+        ),
+        # Existing tokens get their full lifetime from now on, links that are already out keep working
+        migrations.RunSQL(
+            "UPDATE users_token SET date_expires = now() + CASE type "
+            "WHEN 1 THEN interval '7 days' "
+            "WHEN 2 THEN interval '1 day' "
+            "WHEN 3 THEN interval '365 days' "
+            "ELSE interval '1 day' END",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='token',
+            name='date_expires',
+            field=models.DateTimeField(db_index=True, verbose_name='date expires'),
+        ),
+        # The token is hashed as its UTF-8 bytes, backslashes are escaped for the text to bytea conversion
+        migrations.RunSQL(
+            [
+                "ALTER TABLE users_token ADD COLUMN token_digest bytea "
+                "GENERATED ALWAYS AS (sha256(replace(token, '\\', '\\\\')::bytea)) STORED",
+                'CREATE INDEX users_token_token_digest ON users_token USING hash (token_digest)',
+            ],
+            'ALTER TABLE users_token DROP COLUMN token_digest',
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:42
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_token_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Outbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.TextField(verbose_name='subject')),
+                ('body', models.TextField(verbose_name='body')),
+                ('html_body', models.TextField(blank=True, verbose_name='HTML body')),
+                ('from_email', models.CharField(blank=True, max_length=254, null=True, verbose_name='from email')),
+                ('recipients', models.JSONField(default=list, verbose_name='recipients')),
+                ('status', models.IntegerField(choices=[(1, 'Pending'), (2, 'Sent'), (3, 'Failed')], default=1, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='date created')),
+                ('date_next_attempt', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date of next attempt')),
+                ('date_sent', models.DateTimeField(blank=True, null=True, verbose_name='date sent')),
+            ],
+            options={
+                'verbose_name_plural': 'outbox',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outbox',
+            index=models.Index(fields=['status', 'date_next_attempt'], name='users_outbox_due_idx'),
+        ),
+    ]
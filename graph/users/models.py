@@ -1,10 +1,16 @@
+import hashlib
 import random
 import string
+from datetime import timedelta
+from typing import Dict, Iterable, List
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from people.utils.variable_res_date import CompanionFieldMixin
+
 
 class ContentUpdateRequest(models.Model):
     class Statuses(models.IntegerChoices):
@@ -45,6 +51,63 @@ class EmailPatternWhitelist(models.Model):
         return f'Pattern {self.pattern}'
 
 
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenDigestField(CompanionFieldMixin, models.BinaryField):
+    """
+    SHA-256 digest of the token, generated by the database and hash indexed, so that looking up a token by its value
+    takes constant time however many tokens there are.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(None, *args, **kwargs)
+
+    def value_from_instance(self, instance):
+        return None if instance.token is None else token_digest(instance.token)
+
+
+class TokenQuerySet(models.QuerySet):
+    def by_value(self, token: str):
+        return self.filter(token_digest=token_digest(token))
+
+    def usable(self):
+        return self.filter(valid=True, date_expires__gt=timezone.now())
+
+    def expired(self):
+        return self.filter(date_expires__lte=timezone.now())
+
+    def get_or_create_for_users(self, user_ids: Iterable[int], token_type) -> Dict[int, 'Token']:
+        """
+        Usable tokens of the type by the id of their user, reusing the ones that have at least half of their lifetime
+        left, minting the rest in bulk. New token values that happen to collide with existing ones are minted again.
+        """
+        now = timezone.now()
+        missing = set(user_ids)
+        tokens = {}
+        # The token that expires last of every user
+        for token in self.filter(
+                type=token_type, valid=True, user_id__in=missing,
+                date_expires__gt=now + Token.LIFETIMES[token_type] / 2
+        ).order_by('date_expires'):
+            tokens[token.user_id] = token
+        missing -= tokens.keys()
+
+        while missing:
+            minted = {Token.get_random_token(): user_id for user_id in missing}
+            self.bulk_create([
+                Token(user_id=user_id, type=token_type, token=value,
+                      date_expires=Token.get_expiry_date(token_type, now))
+                for value, user_id in minted.items()
+            ], ignore_conflicts=True)
+            for token in self.filter(type=token_type, token__in=minted):
+                if minted[token.token] == token.user_id:
+                    tokens[token.user_id] = token
+            missing -= tokens.keys()
+        return tokens
+
+
 class Token(models.Model):
     class Types(models.IntegerChoices):
         ACCOUNT_ACTIVATION = 1, _('Account activation')
@@ -57,23 +120,106 @@ class Token(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='token', on_delete=models.CASCADE, verbose_name=_('user'))
     valid = models.BooleanField(default=True, verbose_name=_('valid'))
     date_created = models.DateTimeField(auto_now_add=True, verbose_name=_('date created'))
+    date_expires = models.DateTimeField(db_index=True, verbose_name=_('date expires'))
+    token_digest = TokenDigestField(verbose_name=_('token digest'))
 
     extra_data = models.JSONField(default=dict)
 
+    objects = TokenQuerySet.as_manager()
+
+    LIFETIMES = {
+        Types.ACCOUNT_ACTIVATION: timedelta(days=7),
+        Types.PASSWORD_RESET: timedelta(days=1),
+        Types.AUTH: timedelta(days=365),
+        Types.EMAIL_CHANGE: timedelta(days=1),
+    }
+
     @staticmethod
     def get_random_token():
         return ''.join(random.sample(string.ascii_uppercase + string.ascii_lowercase + string.digits, 50))
 
+    @classmethod
+    def get_expiry_date(cls, token_type, now=None):
+        return (now or timezone.now()) + cls.LIFETIMES[token_type]
+
     @classmethod
     def create_for_user(cls, user, token_type=Types.ACCOUNT_ACTIVATION):
         return cls(
             token=cls.get_random_token(),
             user=user,
-            type=token_type
+            type=token_type,
+            date_expires=cls.get_expiry_date(token_type)
         )
 
+    def save(self, *args, **kwargs):
+        if self.date_expires is None:
+            self.date_expires = self.get_expiry_date(self.type)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.get_type_display()} token {self.token} for {self.user}'
 
     class Meta:
         unique_together = ('type', 'token')
+
+
+class OutboxQuerySet(models.QuerySet):
+    def enqueue(self, subject, body, recipients, html_body='', from_email=None) -> 'Outbox':
+        return self.create(subject=subject, body=body, html_body=html_body, from_email=from_email,
+                           recipients=list(recipients))
+
+    def enqueue_mass_html(self, datatuple) -> List['Outbox']:
+        """
+        Enqueues (subject, text_content, html_content, from_email, recipient_list) tuples of `send_mass_html_mail`.
+        """
+        return self.bulk_create([
+            self.model(subject=subject, body=text, html_body=html, from_email=from_email, recipients=list(recipients))
+            for subject, text, html, from_email, recipients in datatuple
+        ])
+
+    def due(self):
+        return self.filter(status=Outbox.Statuses.PENDING, date_next_attempt__lte=timezone.now())
+
+
+class Outbox(models.Model):
+    """
+    Mail waiting to be sent by the `send_outbox` worker, so that requests never wait for the mail server.
+    """
+
+    class Statuses(models.IntegerChoices):
+        PENDING = 1, _('Pending')
+        SENT = 2, _('Sent')
+        FAILED = 3, _('Failed')
+
+    subject = models.TextField(verbose_name=_('subject'))
+    body = models.TextField(verbose_name=_('body'))
+    html_body = models.TextField(blank=True, verbose_name=_('HTML body'))
+    from_email = models.CharField(max_length=254, null=True, blank=True, verbose_name=_('from email'))
+    recipients = models.JSONField(default=list, verbose_name=_('recipients'))
+
+    status = models.IntegerField(choices=Statuses.choices, default=Statuses.PENDING, verbose_name=_('status'))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_('attempts'))
+    last_error = models.TextField(blank=True, verbose_name=_('last error'))
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name=_('date created'))
+    date_next_attempt = models.DateTimeField(default=timezone.now, verbose_name=_('date of next attempt'))
+    date_sent = models.DateTimeField(null=True, blank=True, verbose_name=_('date sent'))
+
+    objects = OutboxQuerySet.as_manager()
+
+    MAX_ATTEMPTS = 6
+    # Delay before the first retry, doubled with every further one
+    RETRY_DELAY = timedelta(minutes=1)
+    # Claimed mail is retried after this long should its worker die while sending it
+    CLAIM_TIMEOUT = timedelta(minutes=10)
+
+    def __str__(self):
+        return f'{self.subject} to {", ".join(self.recipients)}'
+
+    def get_retry_date(self, now):
+        return now + self.RETRY_DELAY * 2 ** (self.attempts - 1)
+
+    class Meta:
+        verbose_name_plural = _('outbox')
+        indexes = [
+            models.Index(fields=['status', 'date_next_attempt'], name='users_outbox_due_idx'),
+        ]
@@ -0,0 +1,157 @@
+"""
+Session engine reading through three tiers: a bounded LRU of the sessions recently used by this process, the shared
+`SESSION_CACHE_ALIAS` cache and the database. Writes go to all of them, except for saves that only push the expiry
+further, which reach the database once it lags behind by `SESSION_EXPIRY_WRITE_BEHIND` seconds - until then a session
+is stored as expiring up to that much earlier than it does in the caches.
+
+The LRU is not shared between processes, a session changed or deleted by another process is served from it for at
+most `SESSION_LRU_TIMEOUT` seconds. The other cache has to be shared, the engine is therefore only used when
+`SESSION_CACHE_LOCATION` is configured.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.utils import timezone
+
+KEY_PREFIX = 'users.sessions.'
+
+
+def cache_key(session_key: str) -> str:
+    return KEY_PREFIX + session_key
+
+
+class SessionLRU:
+    """
+    Least recently used sessions of this process, pickled so that requests do not share the loaded objects.
+    """
+
+    def __init__(self, max_size: int, timeout: float):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            deadline, payload = entry
+            if deadline < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key: str, value: tuple):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_sessions = SessionLRU(settings.SESSION_LRU_SIZE, settings.SESSION_LRU_TIMEOUT)
+
+
+class SessionStore(DBStore):
+    """
+    Both caches hold (session, expire date) pairs, the expire date being the one stored in the database.
+    """
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        # The pickled session and its expire date as last read from or written to the database
+        self._stored = None
+        super().__init__(session_key)
+
+    def _get_stored(self, key: str) -> Optional[tuple]:
+        stored = local_sessions.get(key)
+        if stored is not None:
+            return stored
+
+        try:
+            stored = self._cache.get(key)
+        except Exception:
+            # Some backends raise an exception on invalid cache keys, the session is then read from the database
+            stored = None
+        if stored is None:
+            s = self._get_session_from_db()
+            if s is None:
+                return None
+            stored = (self.decode(s.session_data), s.expire_date)
+            self._cache.set(key, stored, self.get_expiry_age(expiry=s.expire_date))
+        local_sessions.set(key, stored)
+        return stored
+
+    def _set_stored(self, data: dict, expire_date):
+        key = cache_key(self.session_key)
+        self._stored = (pickle.dumps(data, pickle.HIGHEST_PROTOCOL), expire_date)
+        self._cache.set(key, (data, expire_date), self.get_expiry_age(expiry=expire_date))
+        local_sessions.set(key, (data, expire_date))
+
+    def load(self):
+        if self.session_key is None:
+            return {}
+
+        stored = self._get_stored(cache_key(self.session_key))
+        if stored is None or stored[1] <= timezone.now():
+            self._session_key = None
+            return {}
+
+        data, expire_date = stored
+        self._stored = (pickle.dumps(data, pickle.HIGHEST_PROTOCOL), expire_date)
+        return data
+
+    def exists(self, session_key):
+        if session_key and (local_sessions.get(cache_key(session_key)) or cache_key(session_key) in self._cache):
+            return True
+        return super().exists(session_key)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+
+        data = self._get_session(no_load=must_create)
+        expire_date = self.get_expiry_date()
+        if not must_create and self._stored is not None:
+            stored_data, stored_expire_date = self._stored
+            if expire_date - stored_expire_date < timedelta(seconds=settings.SESSION_EXPIRY_WRITE_BEHIND) \
+                    and pickle.dumps(data, pickle.HIGHEST_PROTOCOL) == stored_data:
+                return
+
+        super().save(must_create)
+        self._set_stored(data, expire_date)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if session_key is None:
+            return
+
+        super().delete(session_key)
+        self._cache.delete(cache_key(session_key))
+        local_sessions.delete(cache_key(session_key))
+        if session_key == self.session_key:
+            self._stored = None
+
+    def flush(self):
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
@@ -0,0 +1,17 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from users.auth import invalidate_auth_token
+from users.models import Token
+
+
+def invalidate_auth_token_cache(sender, instance, **kwargs):
+    invalidate_auth_token(instance.token)
+    # Another worker may cache the token as it was before the change until it commits
+    transaction.on_commit(partial(invalidate_auth_token, instance.token))
+
+
+post_save.connect(invalidate_auth_token_cache, sender=Token)
+post_delete.connect(invalidate_auth_token_cache, sender=Token)
@@ -1,3 +1,206 @@
-from django.test import TestCase
+import datetime
+import io
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from people.models import GraphDataVersion, Person
+from users import sessions
+from users.auth import TOKEN_CACHE_ALIAS, AuthTokenMiddleware, resolve_auth_token
+from users.models import Outbox, Token, token_digest
+
+
+# Instances of an in-process cache with the same location stand in for the shared cache of several workers
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'auth_tokens': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'auth-tokens'},
+})
+class AuthTokenMiddlewareTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.person = Person.objects.create(first_name='Alice', last_name='Smith', email='alice@example.com')
+        cls.token = Token.create_for_user(cls.person, Token.Types.AUTH)
+        cls.token.save()
+
+    def setUp(self):
+        caches[TOKEN_CACHE_ALIAS].clear()
+
+    def process(self, token):
+        request = RequestFactory().get('/', {'auth_token': token})
+        SessionMiddleware(lambda r: None).process_request(request)
+        request.user = AnonymousUser()
+        with CaptureQueriesContext(connection) as queries:
+            AuthTokenMiddleware(lambda r: None).process_request(request)
+        return request, [query['sql'] for query in queries]
+
+    def test_logs_in_and_marks_read(self):
+        version = GraphDataVersion.objects.current()
+        request, _ = self.process(self.token.token)
+        self.assertEqual(request.user, self.person)
+        self.person.refresh_from_db()
+        self.assertEqual(self.person.apology_status, Person.ApologyStatus.READ)
+        self.assertEqual(GraphDataVersion.objects.current(), version)
+
+    def test_repeated_requests_skip_token_lookup_and_writes(self):
+        self.process(self.token.token)
+        request, queries = self.process(self.token.token)
+        self.assertEqual(request.user, self.person)
+        self.assertFalse([sql for sql in queries if Token._meta.db_table in sql or 'apology_status" =' in sql])
+
+    def test_revoked_token(self):
+        self.assertEqual(resolve_auth_token(self.token.token), self.person.pk)
+        self.token.valid = False
+        self.token.save()
+        request, _ = self.process(self.token.token)
+        self.assertFalse(request.user.is_authenticated)
+        self.assertIsNone(resolve_auth_token(self.token.token))
+
+    def test_revoked_in_another_worker(self):
+        other_worker = {TOKEN_CACHE_ALIAS: caches.create_connection(TOKEN_CACHE_ALIAS)}
+        with mock.patch('users.auth.caches', other_worker):
+            self.assertEqual(resolve_auth_token(self.token.token), self.person.pk)
+        self.token.delete()
+        with mock.patch('users.auth.caches', other_worker):
+            self.assertIsNone(resolve_auth_token(self.token.token))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_without_shared_cache(self):
+        self.assertEqual(resolve_auth_token(self.token.token), self.person.pk)
+        Token.objects.filter(pk=self.token.pk).update(valid=False)
+        self.assertIsNone(resolve_auth_token(self.token.token))
+
+
+# An in-process cache stands in for the shared one
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'},
+}, SESSION_ENGINE='users.sessions', SESSION_CACHE_ALIAS='sessions')
+class TieredSessionStoreTestCase(TestCase):
+    def setUp(self):
+        session = sessions.SessionStore()
+        session['answer'] = 42
+        session.create()
+        self.session_key = session.session_key
+
+    def load(self, queries=0):
+        session = sessions.SessionStore(self.session_key)
+        with self.assertNumQueries(queries):
+            self.assertEqual(session['answer'], 42)
+        return session
+
+    def assertWrites(self, session, writes):
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), writes)
+
+    def test_read_through(self):
+        self.load()
+        sessions.local_sessions.clear()
+        self.load()
+        sessions.local_sessions.clear()
+        caches['sessions'].clear()
+        self.load(queries=1)
+        self.load()
+
+    def test_expiry_refresh_is_written_behind(self):
+        session = self.load()
+        self.assertWrites(session, 0)
+        session['answer'] = 43
+        self.assertWrites(session, 1)
+        self.assertEqual(sessions.SessionStore(self.session_key)['answer'], 43)
+
+        session = sessions.SessionStore(self.session_key)
+        session.set_expiry(timezone.now() + datetime.timedelta(days=30))
+        self.assertWrites(session, 1)
+
+    def test_delete(self):
+        session = self.load()
+        session.flush()
+        self.assertFalse(sessions.SessionStore().exists(self.session_key))
+        self.assertNotIn('answer', sessions.SessionStore(self.session_key))
+
+
+class TokenLifecycleTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.person = Person.objects.create(first_name='Alice', last_name='Smith', email='alice@example.com')
+        cls.token = Token.create_for_user(cls.person, Token.Types.PASSWORD_RESET)
+        cls.token.save()
+        cls.expired = Token.objects.create(
+            user=cls.person, type=Token.Types.AUTH, token=Token.get_random_token(),
+            date_expires=timezone.now() - datetime.timedelta(days=1)
+        )
+
+    def test_lookup_by_digest(self):
+        self.assertEqual(
+            bytes(Token.objects.filter(pk=self.token.pk).values_list('token_digest', flat=True).get()),
+            token_digest(self.token.token)
+        )
+        self.assertEqual(Token.objects.usable().by_value(self.token.token).get(), self.token)
+        self.assertFalse(Token.objects.usable().by_value(self.expired.token).exists())
+
+    def test_default_expiry(self):
+        token = Token.objects.create(user=self.person, type=Token.Types.EMAIL_CHANGE, token=Token.get_random_token())
+        self.assertAlmostEqual(token.date_expires, timezone.now() + Token.LIFETIMES[Token.Types.EMAIL_CHANGE],
+                               delta=datetime.timedelta(minutes=1))
+
+    def test_get_or_create_for_users(self):
+        people = [Person.objects.create(first_name='Person', last_name=str(i)) for i in range(4)]
+        fresh, *_ = [
+            Token.objects.create(user=person, type=Token.Types.AUTH, token=Token.get_random_token(), **kwargs)
+            for person, kwargs in zip(people, (
+                {},
+                {'valid': False},
+                {'date_expires': timezone.now() + datetime.timedelta(days=1)},
+            ))
+        ]
+        with self.assertNumQueries(3):
+            tokens = Token.objects.get_or_create_for_users([person.pk for person in people], Token.Types.AUTH)
+        self.assertEqual(set(tokens), {person.pk for person in people})
+        self.assertEqual(tokens[people[0].pk], fresh)
+        for person in people:
+            self.assertEqual(tokens[person.pk].user_id, person.pk)
+            self.assertTrue(Token.objects.usable().filter(pk=tokens[person.pk].pk).exists())
+        self.assertEqual(Token.objects.filter(user__in=people).count(), 3 + 3)
+
+    def test_purge(self):
+        for _ in range(2):
+            Token.objects.create(user=self.person, type=Token.Types.ACCOUNT_ACTIVATION, token=Token.get_random_token(),
+                                 date_expires=timezone.now())
+        call_command('purge_expired_tokens', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(list(Token.objects.all()), [self.token])
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.mails = Outbox.objects.enqueue_mass_html([
+            ('Subject', 'Text', '<p>Text</p>', None, ['alice@example.com']),
+            ('Subject', 'Text', '<p>Text</p>', None, ['bob@example.com', 'bob@example.org']),
+        ])
+
+    def test_send(self):
+        call_command('send_outbox', workers=1, once=True, stdout=io.StringIO())
+        self.assertEqual([message.to for message in mail.outbox],
+                         [['alice@example.com'], ['bob@example.com', 'bob@example.org']])
+        self.assertEqual(mail.outbox[0].alternatives, [('<p>Text</p>', 'text/html')])
+        self.assertFalse(Outbox.objects.exclude(status=Outbox.Statuses.SENT).exists())
+        self.assertFalse(Outbox.objects.due().exists())
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+                       EMAIL_PORT=1, EMAIL_TIMEOUT=1)
+    def test_retry(self):
+        call_command('send_outbox', workers=1, once=True, stdout=io.StringIO())
+        for outbox_mail in Outbox.objects.all():
+            self.assertEqual(outbox_mail.status, Outbox.Statuses.PENDING)
+            self.assertEqual(outbox_mail.attempts, 1)
+            self.assertTrue(outbox_mail.last_error)
+            self.assertGreater(outbox_mail.date_next_attempt, timezone.now())
+        self.assertFalse(Outbox.objects.due().exists())
@@ -4,7 +4,6 @@ from django.contrib import messages
 from django.contrib.auth import login, logout, get_user_model
 from django.contrib.auth.views import LoginView as Login
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
 from django.db import transaction
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.template.loader import get_template
@@ -16,7 +15,7 @@ from django.views.generic import FormView
 from people.models import Person
 from users.forms import LoginOverrideForm, LoginForm, PasswordResetRequestForm, PasswordResetForm, RegistrationForm, \
     ContentUpdateRequestForm
-from users.models import InviteCode, Token, EmailPatternWhitelist
+from users.models import InviteCode, Outbox, Token, EmailPatternWhitelist
 
 UserModel = get_user_model()
 
@@ -43,15 +42,16 @@ class PasswordResetRequestView(FormView):
     def form_valid(self, form):
         user = form.cleaned_data['person']
         try:
-            token = Token.objects.get(user=form.cleaned_data['person'], valid=True, type=Token.Types.PASSWORD_RESET)
+            token = Token.objects.usable().get(user=form.cleaned_data['person'], type=Token.Types.PASSWORD_RESET)
         except Token.DoesNotExist:
             token = Token.create_for_user(form.cleaned_data['person'], token_type=Token.Types.PASSWORD_RESET)
             token.save()
 
         if settings.PRODUCTION:
-            user.email_user(
+            Outbox.objects.enqueue(
                 _('Trihedron Graph - password reset'),
-                get_template('people/email/password_reset_mail.html').render({'token': token.token})
+                get_template('people/email/password_reset_mail.html').render({'token': token.token}),
+                [user.email]
             )
         else:
             print('Trihedron Graph - password reset')
@@ -69,8 +69,9 @@ class PasswordResetView(FormView):
     @transaction.atomic
     def dispatch(self, request, *args, **kwargs):
         try:
-            self.token = Token.objects.select_related('user').get(token=kwargs['token'], valid=True,
-                                                                  type=Token.Types.PASSWORD_RESET)
+            self.token = Token.objects.usable().by_value(kwargs['token']).select_related('user').get(
+                type=Token.Types.PASSWORD_RESET
+            )
         except Token.DoesNotExist:
             return HttpResponseForbidden()
 
@@ -97,7 +98,7 @@ class ChangePasswordView(View):
     @transaction.atomic
     def dispatch(self, request, *args, **kwargs):
         try:
-            token = Token.objects.get(user=request.user, valid=True, type=Token.Types.PASSWORD_RESET)
+            token = Token.objects.usable().get(user=request.user, type=Token.Types.PASSWORD_RESET)
         except Token.DoesNotExist:
             token = Token.create_for_user(request.user, token_type=Token.Types.PASSWORD_RESET)
             token.save()
@@ -136,9 +137,8 @@ class ChangeEmailView(FormView):
     @transaction.atomic
     def form_valid(self, form):
         try:
-            token = Token.objects.get(
+            token = Token.objects.usable().get(
                 user=self.request.user,
-                valid=True,
                 type=Token.Types.EMAIL_CHANGE,
                 extra_data__email=form.cleaned_data['new_email']
             )
@@ -150,10 +150,9 @@ class ChangeEmailView(FormView):
             token.save()
 
         if settings.PRODUCTION:
-            send_mail(
+            Outbox.objects.enqueue(
                 _('Trihedron Graph - email change'),
                 get_template('people/email/change_email.html').render({'token': token.token}),
-                None,
                 [form.cleaned_data['new_email']]
             )
         else:
@@ -168,9 +167,7 @@ class ChangeEmailConfirmView(View):
     @transaction.atomic
     def dispatch(self, request, *args, **kwargs):
         try:
-            token = Token.objects.select_related('user').get(
-                token=kwargs['token'],
-                valid=True,
+            token = Token.objects.usable().by_value(kwargs['token']).select_related('user').get(
                 type=Token.Types.EMAIL_CHANGE
             )
 
@@ -248,9 +245,10 @@ class RegistrationView(FormView):
         token.save()
 
         if settings.PRODUCTION:
-            user.email_user(
+            Outbox.objects.enqueue(
                 _('Trihedron Graph - registration confirmation'),
-                get_template('people/email/activation_email.html').render({'token': token.token})
+                get_template('people/email/activation_email.html').render({'token': token.token}),
+                [user.email]
             )
         else:
             print('Trihedron Graph - registration confirmation')
@@ -263,7 +261,7 @@ class RegistrationView(FormView):
 class AccountActivationView(View):
     def get(self, request, *args, **kwargs):
         try:
-            token = Token.objects.get(token=kwargs['token'], valid=True, type=Token.Types.ACCOUNT_ACTIVATION)
+            token = Token.objects.usable().by_value(kwargs['token']).get(type=Token.Types.ACCOUNT_ACTIVATION)
         except Token.DoesNotExist:
             return HttpResponseRedirect(reverse('registration'))
 